@@ -0,0 +1,83 @@
+import uuid
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from typing import Optional
+from app.db.client import (
+    ChatSessionNotFound,
+    get_chat_session,
+    get_session_messages_page,
+    get_user_chat_session_summaries_page,
+)
+from app.db.models import ChatSession, ChatSessionSummaryPage, MessagePage
+
+router = APIRouter(
+    prefix="/chat",
+    tags=["chat"],
+    responses={404: {"description": "Not found"}},
+)
+
+MAX_SESSIONS_PAGE = 100
+MAX_MESSAGES_PAGE = 200
+
+def get_optional_user(x_user_id: Optional[str] = Header(None)) -> Optional[str]:
+    """
+    The caller's user id (X-User-Id header), or None for an anonymous caller.
+
+    Trusting the header is deliberate: the API has no authentication of its
+    own yet, and every endpoint identifies the caller through this dependency
+    (or get_current_user), so it is the one place to swap in the verified id.
+    """
+    return x_user_id or None
+
+def get_current_user(x_user_id: Optional[str] = Depends(get_optional_user)) -> uuid.UUID:
+    """The caller's user id; 422 without a valid X-User-Id header"""
+    try:
+        return uuid.UUID(x_user_id or "")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="A valid X-User-Id header is required"
+        )
+
+async def get_owned_session(session_id: uuid.UUID, user_id: uuid.UUID) -> ChatSession:
+    """The chat session, or 404 if it does not exist and 403 if it belongs to another user"""
+    try:
+        session = await get_chat_session(session_id)
+    except ChatSessionNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not found")
+    if session.user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Chat session belongs to another user")
+    return session
+
+@router.get("/sessions", response_model=ChatSessionSummaryPage)
+async def list_sessions(
+    limit: int = Query(20, ge=1, le=MAX_SESSIONS_PAGE),
+    before: Optional[str] = None,
+    user_id: uuid.UUID = Depends(get_current_user),
+):
+    """
+    List the caller's chat sessions, newest first, each with its message
+    count and a preview of its latest message.
+
+    Pass the returned `next_cursor` as `before` to get the next page.
+    """
+    try:
+        return await get_user_chat_session_summaries_page(user_id, limit=limit, before=before)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/sessions/{session_id}/messages", response_model=MessagePage)
+async def list_messages(
+    session_id: uuid.UUID,
+    limit: int = Query(50, ge=1, le=MAX_MESSAGES_PAGE),
+    before: Optional[str] = None,
+    user_id: uuid.UUID = Depends(get_current_user),
+):
+    """
+    Messages of one of the caller's chat sessions in chronological order, latest page first.
+
+    Pass the returned `next_cursor` as `before` to page back through older history.
+    """
+    await get_owned_session(session_id, user_id)
+    try:
+        return await get_session_messages_page(session_id, limit=limit, before=before)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import time
+import uuid
+import weakref
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+from typing import Optional
+from app.api.chat import get_current_user, get_owned_session
+from app.core.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
+from app.core import health_agent
+from app.core.rate_limit import RateLimiter, RateLimitExceeded, request_llm_tokens
+from app.core.health_agent import get_coach_agent, HISTORY_LOAD_LAST
+from app.db.client import create_chat_session, create_messages, get_latest_messages
+
+router = APIRouter(
+    prefix="/coach",
+    tags=["coach"],
+    responses={404: {"description": "Not found"}},
+)
+
+class CoachRequest(BaseModel):
+    message: str
+    session_id: Optional[uuid.UUID] = None  # omit to start a new chat session
+
+class CoachResponse(BaseModel):
+    reply: str
+    session_id: uuid.UUID
+
+# Bounds on in-flight health coach LLM calls (global, per user, and waiting)
+coach_limiter = ConcurrencyLimiter(
+    max_concurrent=int(os.environ.get("HEALTH_COACH_MAX_CONCURRENCY", 64)),
+    max_per_user=int(os.environ.get("HEALTH_COACH_MAX_PER_USER", 2)),
+    max_queue=int(os.environ.get("HEALTH_COACH_MAX_QUEUE", 256)),
+    queue_timeout=float(os.environ.get("HEALTH_COACH_QUEUE_TIMEOUT", 30)),
+)
+
+# Per-user budgets of health coach LLM calls and the tokens they use
+coach_rate_limiter = RateLimiter(
+    "coach",
+    requests_per_minute=float(os.environ.get("HEALTH_COACH_RATE_LIMIT_RPM", 30)),
+    request_burst=float(os.environ.get("HEALTH_COACH_RATE_LIMIT_BURST", 10)),
+    tokens_per_minute=float(os.environ.get("HEALTH_COACH_RATE_LIMIT_TPM", 60000)),
+    max_wait=float(os.environ.get("HEALTH_COACH_RATE_LIMIT_MAX_WAIT", 2)),
+)
+
+# Turns of one session run one at a time, so each sees the previous reply
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def _session_lock(session_id: uuid.UUID) -> asyncio.Lock:
+    lock = _session_locks.get(str(session_id))
+    if lock is None:
+        lock = asyncio.Lock()
+        _session_locks[str(session_id)] = lock
+    return lock
+
+def _thread_config(session_id: uuid.UUID) -> dict:
+    """Agent config that loads/saves the checkpointed state of a chat session"""
+    return {"configurable": {"thread_id": str(session_id)}}
+
+async def _restore_history(session_id: uuid.UUID) -> list:
+    """Recent messages from the database when the session has no checkpoint (e.g. after a restart)"""
+    snapshot = await get_coach_agent().aget_state(_thread_config(session_id))
+    if snapshot.values.get("messages"):
+        return []
+    stored = await get_latest_messages(session_id, HISTORY_LOAD_LAST)
+    return [
+        HumanMessage(content=m.content) if m.role == "user" else AIMessage(content=m.content)
+        for m in stored
+    ]
+
+async def coach_turn(user_id: uuid.UUID, message: str, session_id: Optional[uuid.UUID] = None) -> CoachResponse:
+    """Run one health coach turn for a session and persist both messages"""
+    if session_id is None:
+        session = await create_chat_session(user_id, message[:40] or "New Chat")
+        session_id = session.id
+    else:
+        # before the lock, so another user's session cannot be read, written or held up
+        await get_owned_session(session_id, user_id)
+
+    async with _session_lock(session_id):
+        history = await _restore_history(session_id)
+        await coach_rate_limiter.admit(str(user_id))
+        await coach_limiter.acquire(str(user_id))
+        start = time.monotonic()
+        tokens_before = request_llm_tokens()
+        try:
+            state = await get_coach_agent().ainvoke(
+                {"messages": history + [HumanMessage(content=message)]},
+                _thread_config(session_id),
+            )
+        finally:
+            coach_limiter.release(str(user_id), time.monotonic() - start)
+            # tokens are metered per HTTP request, so WebSocket turns are limited by count only
+            await coach_rate_limiter.charge_tokens(str(user_id), request_llm_tokens() - tokens_before)
+        reply = state["messages"][-1].content
+
+        # user + assistant message and the session bump in one round trip
+        await create_messages(session_id, [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": reply},
+        ])
+    return CoachResponse(reply=reply, session_id=session_id)
+
+@router.post("/chat", response_model=CoachResponse)
+async def chat(request: CoachRequest, user_id: uuid.UUID = Depends(get_current_user)):
+    """
+    Send a message to the health coach.
+
+    Starts a new chat session when `session_id` is omitted; the conversation is
+    stored in the chat session's messages.
+    """
+    try:
+        return await coach_turn(user_id, request.message, request.session_id)
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except ConcurrencyLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after), "X-Queue-Depth": str(e.queue_depth)},
+        )
+
+@router.get("/capacity")
+def capacity():
+    """Current health coach load: in-flight and queued LLM calls, rejections so far, rate limits"""
+    return {**coach_limiter.stats(), "rate_limit": coach_rate_limiter.stats()}
+
+@router.get("/routing")
+def routing():
+    """Per-route model, call count, latency percentiles, tokens and estimated cost"""
+    return health_agent.llm.stats()
+
+@router.websocket("/ws")
+async def chat_ws(websocket: WebSocket, user_id: uuid.UUID = Depends(get_current_user)):
+    """
+    WebSocket variant of `/chat`: send `{"message", "session_id"?}` frames,
+    receive `{"reply", "session_id"}` (or `{"error", "retry_after"?}`) frames.
+    """
+    await websocket.accept()
+    session_id = None
+    try:
+        while True:
+            request = CoachRequest(**await websocket.receive_json())
+            try:
+                response = await coach_turn(user_id, request.message, request.session_id or session_id)
+            except (ConcurrencyLimitExceeded, RateLimitExceeded) as e:
+                await websocket.send_json({"error": e.reason, "retry_after": e.retry_after})
+                continue
+            except HTTPException as e:
+                await websocket.send_json({"error": e.detail})
+                continue
+            session_id = response.session_id
+            await websocket.send_json(response.model_dump(mode="json"))
+    except WebSocketDisconnect:
+        pass
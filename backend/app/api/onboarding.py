@@ -1,7 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import logging
+import os
+import time
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
 from pydantic import BaseModel
-from typing import Optional 
-from app.core.onboarding_agent import onboarding_agent
+from typing import Optional, AsyncIterator, Tuple
+from app.api.chat import get_optional_user
+from app.core.onboarding_agent import get_onboarding_agent, usage_tracker
+from app.core.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
+from app.core.envelope import (
+    CORRECTION_PROMPT,
+    EnvelopeParseError,
+    delta_adapter,
+    envelope_data,
+    envelope_json,
+    parse_envelope,
+    parse_or_repair,
+)
+from app.core.metrics import serialization_timer
+from app.core.onboarding_steps import STATE_DEPENDENT_STEPS, OnboardingProgress
+from app.core.onboarding_validation import validate_answer, validation_error_envelope
+from app.core.prompt import ONBOARDING_PROMPT_VERSION
+from app.core.rate_limit import RateLimiter, RateLimitExceeded, request_llm_tokens
+from app.core.response_cache import ResponseCache, make_cache_key, normalize_answer
+from app.core.serialization import dumps_str
+from app.core.single_flight import SingleFlight
+from app.models.onboarding import OnboardingDelta, OnboardingEnvelope
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/onboarding",
@@ -16,25 +45,406 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
+    step_id: Optional[str] = None  # step the message answers (currentStepId of the last envelope)
 
 class ChatResponse(BaseModel):
-    data: str
+    data: OnboardingEnvelope
+    conversation_id: Optional[str] = None
+
+# Bounds on in-flight onboarding LLM calls (global, per user, and waiting)
+onboarding_limiter = ConcurrencyLimiter(
+    max_concurrent=int(os.environ.get("ONBOARDING_MAX_CONCURRENCY", 64)),
+    max_per_user=int(os.environ.get("ONBOARDING_MAX_PER_USER", 2)),
+    max_queue=int(os.environ.get("ONBOARDING_MAX_QUEUE", 128)),
+    queue_timeout=float(os.environ.get("ONBOARDING_QUEUE_TIMEOUT", 10)),
+)
+
+# Per-client budgets of onboarding LLM calls and the tokens they use
+onboarding_rate_limiter = RateLimiter(
+    "onboarding",
+    requests_per_minute=float(os.environ.get("ONBOARDING_RATE_LIMIT_RPM", 30)),
+    request_burst=float(os.environ.get("ONBOARDING_RATE_LIMIT_BURST", 10)),
+    tokens_per_minute=float(os.environ.get("ONBOARDING_RATE_LIMIT_TPM", 60000)),
+    max_wait=float(os.environ.get("ONBOARDING_RATE_LIMIT_MAX_WAIT", 2)),
+)
+
+# Deltas for repeated turns (same prompt, step and answer, across users; the review step also keys on the earlier answers)
+onboarding_cache = ResponseCache(
+    max_entries=int(os.environ.get("ONBOARDING_CACHE_SIZE", 2048)),
+    ttl=float(os.environ.get("ONBOARDING_CACHE_TTL", 3600)),
+    max_bytes=int(os.environ.get("ONBOARDING_CACHE_MAX_BYTES", 8 * 1024 * 1024)),
+    version=ONBOARDING_PROMPT_VERSION,
+)
+# Duplicate submits of a turn (double click, effect re-run, client retry) share one run;
+# turns sent with an Idempotency-Key are also replayed to retries within the window
+onboarding_flights = SingleFlight(
+    "onboarding",
+    window=float(os.environ.get("ONBOARDING_REPLAY_WINDOW", 10)),
+)
+
+# the `complete` envelope follows tool side effects, so it is never replayed
+CACHEABLE_STATUSES = ("question", "validationError")
+# times the agent is asked to correct an envelope that could not be parsed or repaired
+ENVELOPE_RETRIES = int(os.environ.get("ONBOARDING_ENVELOPE_RETRIES", 1))
+
+def get_client_id(request: Request, user_id: Optional[str] = Depends(get_optional_user)) -> str:
+    """Identify the caller for per-user limits (user id, else client IP)"""
+    if user_id:
+        return user_id
+    return request.client.host if request.client else "anonymous"
+
+def get_idempotency_key(request: Request) -> Optional[str]:
+    """Client-chosen key shared by retries of one turn (Idempotency-Key header)"""
+    return request.headers.get("Idempotency-Key")
+
+def _flight_key(
+    request: ChatRequest, client_id: str, idempotency_key: Optional[str]
+) -> Tuple[Optional[str], bool]:
+    """Single-flight key of a turn (None: run it on its own) and whether its result may be replayed"""
+    if idempotency_key:
+        # names one turn: its duplicates may share the run and its result
+        owner = request.conversation_id or f"new:{client_id}"
+        return make_cache_key("onboarding-turn", owner, idempotency_key), True
+    if request.conversation_id:
+        # a same-looking message may be a new answer to the next step, so only
+        # duplicates sent while the turn is still running share it
+        return make_cache_key("onboarding-turn", request.conversation_id, request.step_id, request.message), False
+    # a new conversation without a key cannot be told apart from another
+    # client's (several users may share one IP)
+    return None, False
 
-@router.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest):
+def _turn_body(envelope: OnboardingEnvelope, conversation_id: str) -> str:
+    """JSON of a turn's result: the `/chat` response body and the stream's `done` event data"""
+    with serialization_timer():
+        return dumps_str({"data": envelope_data(envelope), "conversation_id": conversation_id})
+
+async def _acquire_onboarding_slot(client_id: str) -> int:
+    """Take an onboarding slot or answer 429 with a Retry-After hint; returns the request's LLM tokens so far"""
+    try:
+        await onboarding_rate_limiter.admit(client_id)
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    try:
+        await onboarding_limiter.acquire(client_id)
+    except ConcurrencyLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after), "X-Queue-Depth": str(e.queue_depth)},
+        )
+    return request_llm_tokens()
+
+async def _release_onboarding_slot(client_id: str, start: float, tokens_before: int) -> None:
+    """Give back the slot and charge the LLM tokens used since it was taken to the client"""
+    onboarding_limiter.release(client_id, time.monotonic() - start)
+    await onboarding_rate_limiter.charge_tokens(client_id, request_llm_tokens() - tokens_before)
+
+def _thread_config(conversation_id: str, user_id: Optional[str] = None) -> dict:
+    """Agent config that loads/saves the checkpointed history of a conversation"""
+    configurable = {"thread_id": conversation_id}
+    if user_id:
+        # read by the create_user_profile / finish_onboarding tools
+        configurable["user_id"] = user_id
+    return {"configurable": configurable}
+
+async def _load_progress(conversation_id: Optional[str]) -> OnboardingProgress:
+    """STEP MAP progress of this conversation, rebuilt from the agent's earlier replies"""
+    if not conversation_id:
+        return OnboardingProgress()
+    try:
+        state = await get_onboarding_agent().aget_state(_thread_config(conversation_id))
+    except Exception:
+        return OnboardingProgress()
+    return OnboardingProgress.from_history(state.values.get("messages", []))
+
+def _response_cache_key(message: str, step_id: Optional[str], progress: OnboardingProgress) -> str:
+    """Cache key for a turn: the answer to a step, shared across users unless the reply repeats earlier answers"""
+    onboarding_cache.ensure_version(ONBOARDING_PROMPT_VERSION)
+    prior = progress.state() if step_id in STATE_DEPENDENT_STEPS else None
+    return make_cache_key(ONBOARDING_PROMPT_VERSION, step_id, normalize_answer(message), prior)
+
+async def _cached_response(cache_key: str, message: str, conversation_id: str) -> Optional[OnboardingDelta]:
+    """Replay a cached delta for this conversation and record the turn in its history"""
+    cached = onboarding_cache.get(cache_key)
+    if cached is None:
+        return None
+    try:
+        await get_onboarding_agent().aupdate_state(
+            _thread_config(conversation_id),
+            {"messages": [HumanMessage(content=message), AIMessage(content=cached)]},
+            as_node="agent",
+        )
+    except Exception:
+        # without the turn in the history the next one would go wrong; ask the agent instead
+        return None
+    return parse_envelope(cached, delta_adapter)
+
+def _store_response(cache_key: str, delta: OnboardingDelta) -> None:
+    """Cache the agent's delta if it is safe to replay for other sessions"""
+    if delta.status in CACHEABLE_STATUSES:
+        onboarding_cache.set(cache_key, envelope_json(delta))
+
+async def _answer_locally(
+    request: ChatRequest, conversation_id: str
+) -> Tuple[Optional[OnboardingEnvelope], str, OnboardingProgress]:
+    """Envelope for turns that need no LLM call (invalid answer or cache hit), the cache key and the progress"""
+    progress = await _load_progress(request.conversation_id)
+    step_id = request.step_id or progress.current_step_id
+
+    # Answers that clearly break a STEP MAP rule are rejected without an LLM call
+    error = validate_answer(step_id, request.message)
+    cache_key = _response_cache_key(request.message, step_id, progress)
+    if error is not None:
+        delta = delta_adapter.validate_python(validation_error_envelope(None, step_id, error))
+        return progress.envelope(delta, conversation_id), cache_key, progress
+
+    delta = await _cached_response(cache_key, request.message, conversation_id)
+    if delta is None:
+        return None, cache_key, progress
+    return progress.envelope(delta, conversation_id), cache_key, progress
+
+async def _corrected_delta(
+    error: EnvelopeParseError, conversation_id: str, user_id: Optional[str] = None
+) -> OnboardingDelta:
+    """Ask the agent to resend a reply that could not be parsed or repaired"""
+    for _ in range(ENVELOPE_RETRIES):
+        logger.warning("invalid_envelope conversation=%s error=%s retrying=true", conversation_id, error)
+        response = await get_onboarding_agent().ainvoke(
+            {"messages": [{"role": "user", "content": CORRECTION_PROMPT.format(error=error)}]},
+            _thread_config(conversation_id, user_id),
+        )
+        try:
+            return parse_or_repair(response['messages'][-1].content, delta_adapter)[0]
+        except EnvelopeParseError as e:
+            error = e
+    logger.error("invalid_envelope conversation=%s error=%s retrying=false", conversation_id, error)
+    raise error
+
+async def _validated_delta(content: str, conversation_id: str, user_id: Optional[str] = None) -> OnboardingDelta:
+    """Typed delta for the agent's reply: parsed, else repaired, else re-requested"""
+    try:
+        return parse_or_repair(content, delta_adapter)[0]
+    except EnvelopeParseError as e:
+        return await _corrected_delta(e, conversation_id, user_id)
+
+async def _chat_turn(request: ChatRequest, client_id: str, user_id: Optional[str]) -> str:
+    """Run one onboarding turn and return the response body"""
+    # The agent's checkpointer restores the conversation history for conversation_id,
+    # so only the new user message is sent. A new conversation gets a fresh id.
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+    
+    local_envelope, cache_key, progress = await _answer_locally(request, conversation_id)
+    if local_envelope is not None:
+        return _turn_body(local_envelope, conversation_id)
+    
+    tokens_before = await _acquire_onboarding_slot(client_id)
+    start = time.monotonic()
+    try:
+        response = await get_onboarding_agent().ainvoke(
+            { "messages": [{"role": "user", "content": request.message}]},
+            _thread_config(conversation_id, user_id),
+        )
+        logger.debug("onboarding_response conversation=%s data=%s", conversation_id, response['messages'][-1].content)
+        delta = await _validated_delta(response['messages'][-1].content, conversation_id, user_id)
+    except EnvelopeParseError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"The onboarding agent returned an invalid envelope: {e}",
+        )
+    finally:
+        await _release_onboarding_slot(client_id, start, tokens_before)
+    _store_response(cache_key, delta)
+    
+    return _turn_body(progress.envelope(delta, conversation_id), conversation_id)
+
+# the body is ChatResponse serialized with exclude_unset: the envelope keeps the keys the
+# agent sent, without null-filled optional ones
+@router.post("/chat", response_model=ChatResponse, response_model_exclude_unset=True)
+async def chat(
+    request: ChatRequest,
+    client_id: str = Depends(get_client_id),
+    user_id: Optional[str] = Depends(get_optional_user),
+    idempotency_key: Optional[str] = Depends(get_idempotency_key),
+):
     """
     Endpoint for handling onboarding chat interactions.
     
     This endpoint receives messages from the user during the onboarding process
     and returns appropriate responses based on the conversation context.
+    Duplicates of a turn get the same response: those with the same `Idempotency-Key`
+    header while it runs or shortly after, and those with the same conversation,
+    step and message while it runs.
     """
-    
-    # when message comes in, for every user, there'd be only one onboarding converstion history that's needed.
-    # so we need to load the conversation history that matches the user_id from the database and pass it to the agent.
-    
-    response = onboarding_agent.invoke({ "messages": [{"role": "user", "content": request.message}]})
-    print(f"Response: {response['messages'][-1].content}")
-    
-    return ChatResponse(
-        data=response['messages'][-1].content,
+    key, replay = _flight_key(request, client_id, idempotency_key)
+    if key is None:
+        body = await _chat_turn(request, client_id, user_id)
+    else:
+        body = await onboarding_flights.do(key, lambda: _chat_turn(request, client_id, user_id), replay)
+    return Response(content=body, media_type="application/json")
+
+@router.get("/capacity")
+def capacity():
+    """Current onboarding load: in-flight and queued LLM calls, rejections so far, rate limits"""
+    return {**onboarding_limiter.stats(), "rate_limit": onboarding_rate_limiter.stats()}
+
+@router.get("/usage")
+def usage():
+    """Token totals for onboarding LLM calls, including prompt-cache hits"""
+    return usage_tracker.stats()
+
+@router.get("/cache")
+def cache():
+    """Onboarding response cache size and hit rate"""
+    return onboarding_cache.stats()
+
+@router.get("/duplicates")
+def duplicates():
+    """Turns run, and duplicate submits that shared an in-flight or recent run"""
+    return onboarding_flights.stats()
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format a single Server-Sent Event"""
+    with serialization_timer():
+        return _sse_frame(event, dumps_str(data))
+
+
+def _sse_frame(event: str, data: str) -> str:
+    """Format a single Server-Sent Event whose data is already JSON"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def _settle(
+    flight: Optional["asyncio.Future[str]"], body: Optional[str] = None, error: Optional[BaseException] = None
+) -> None:
+    """Hand a streaming leader's result (or failure) to the duplicates waiting on it"""
+    if flight is None or flight.done():
+        return
+    if error is not None:
+        flight.set_exception(error)
+    else:
+        flight.set_result(body)
+
+
+async def _shared_events(flight: "asyncio.Future[str]") -> AsyncIterator[str]:
+    """`done` event of the run a duplicate submit joined, or an `error` event if it failed"""
+    try:
+        body = await asyncio.shield(flight)
+    except HTTPException as e:
+        yield _sse_event("error", {"detail": e.detail})
+        return
+    except Exception as e:
+        yield _sse_event("error", {"detail": str(e)})
+        return
+    yield _sse_frame("done", body)
+
+
+async def _stream_onboarding_events(
+    message: str,
+    conversation_id: str,
+    client_id: str,
+    cache_key: str,
+    progress: OnboardingProgress,
+    user_id: Optional[str] = None,
+    tokens_before: int = 0,
+    flight: Optional["asyncio.Future[str]"] = None,
+) -> AsyncIterator[str]:
+    """Relay the agent's tokens as they are generated, then the full envelope"""
+    start = time.monotonic()
+    done = False
+    parse_error: Optional[EnvelopeParseError] = None
+    try:
+        async for mode, payload in get_onboarding_agent().astream(
+            {"messages": [{"role": "user", "content": message}]},
+            _thread_config(conversation_id, user_id),
+            stream_mode=["messages", "updates"],
+        ):
+            if done:
+                # keep draining so the run finishes and its checkpoint is saved
+                continue
+            if mode == "messages":
+                chunk, metadata = payload
+                if metadata.get("langgraph_node") != "agent" or not isinstance(chunk, AIMessageChunk):
+                    continue
+                if isinstance(chunk.content, str) and chunk.content:
+                    yield _sse_event("token", {"delta": chunk.content})
+            elif "agent" in payload:
+                final_message = payload["agent"]["messages"][-1]
+                if getattr(final_message, "tool_calls", None):
+                    continue
+                # The agent node holds the complete reply; the structured-response
+                # pass that follows it adds nothing the client needs, so answer now.
+                done = True
+                try:
+                    delta = parse_or_repair(final_message.content, delta_adapter)[0]
+                except EnvelopeParseError as e:
+                    # corrected once the run (and its checkpoint) has finished
+                    parse_error = e
+                    continue
+                body = _turn_body(progress.envelope(delta, conversation_id), conversation_id)
+                _settle(flight, body)
+                yield _sse_frame("done", body)
+                _store_response(cache_key, delta)
+        if parse_error is not None:
+            delta = await _corrected_delta(parse_error, conversation_id, user_id)
+            body = _turn_body(progress.envelope(delta, conversation_id), conversation_id)
+            _settle(flight, body)
+            yield _sse_frame("done", body)
+            _store_response(cache_key, delta)
+    except Exception as e:
+        _settle(flight, error=e)
+        yield _sse_event("error", {"detail": str(e)})
+    finally:
+        # e.g. the client went away before the reply was complete
+        _settle(flight, error=RuntimeError("The original request ended before the reply was complete"))
+        # the slot was taken by chat_stream before the response started
+        await _release_onboarding_slot(client_id, start, tokens_before)
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    client_id: str = Depends(get_client_id),
+    user_id: Optional[str] = Depends(get_optional_user),
+    idempotency_key: Optional[str] = Depends(get_idempotency_key),
+):
+    """
+    Streaming variant of the onboarding chat endpoint (Server-Sent Events).
+
+    Emits a `token` event per generated chunk of the agent's delta, followed by a `done` event with
+    the same `data` and `conversation_id` fields `/chat` returns, or an `error` event. A duplicate
+    of a turn that is running or just ran (see `/chat`) gets only its `done` event.
+    """
+    key, replay = _flight_key(request, client_id, idempotency_key)
+    shared = onboarding_flights.join(key, replay) if key is not None else None
+    if shared is not None:
+        return StreamingResponse(_shared_events(shared), media_type="text/event-stream")
+
+    flight = onboarding_flights.start(key, replay) if key is not None else None
+    try:
+        conversation_id = request.conversation_id or str(uuid.uuid4())
+        local_envelope, cache_key, progress = await _answer_locally(request, conversation_id)
+        if local_envelope is not None:
+            body = _turn_body(local_envelope, conversation_id)
+            _settle(flight, body)
+            return StreamingResponse(iter([_sse_frame("done", body)]), media_type="text/event-stream")
+
+        tokens_before = await _acquire_onboarding_slot(client_id)
+    except Exception as e:
+        _settle(flight, error=e)
+        raise
+    except BaseException:
+        if flight is not None:
+            flight.cancel()
+        raise
+    return StreamingResponse(
+        _stream_onboarding_events(
+            request.message, conversation_id, client_id, cache_key, progress, user_id, tokens_before, flight,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
@@ -0,0 +1,329 @@
+"""
+Per-conversation LangGraph checkpointer for the onboarding agent.
+
+Only the latest checkpoint of each conversation (thread) is kept - that is
+all a chat needs to continue. It is persisted to SQLite in two parts:
+
+- one ``checkpoints`` row per thread holding the checkpoint minus its
+  ``messages`` channel (small, rewritten each step);
+- an append-only ``checkpoint_messages`` log, to which each step only adds the
+  messages that are new since the previous checkpoint.
+
+So a turn never re-serializes the whole transcript, and loading a thread is a
+fixed number of queries. An in-memory LRU of recently used threads sits in
+front of SQLite, so an active conversation is served without touching disk.
+"""
+
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+MESSAGES_CHANNEL = "messages"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (thread_id, checkpoint_ns)
+);
+CREATE TABLE IF NOT EXISTS checkpoint_messages (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    seq INTEGER NOT NULL,
+    message_type TEXT NOT NULL,
+    message BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, seq)
+);
+"""
+
+
+@dataclass
+class _ThreadState:
+    """Latest checkpoint of one thread, as cached in memory"""
+    checkpoint: Checkpoint
+    metadata: CheckpointMetadata
+    parent_checkpoint_id: Optional[str]
+    message_ids: List[Optional[str]] = field(default_factory=list)
+    pending_writes: List[Tuple[str, str, Any]] = field(default_factory=list)
+
+
+class ConversationCheckpointer(BaseCheckpointSaver):
+    """SQLite-backed, LRU-fronted checkpointer storing message deltas per turn"""
+
+    def __init__(self, path: str = ":memory:", cache_size: int = 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], _ThreadState]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    # ---- storage helpers ----
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.executescript(_SCHEMA)
+                    self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._cache.clear()
+
+    def _remember(self, key: Tuple[str, str], state: _ThreadState) -> None:
+        self._cache[key] = state
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _load(self, key: Tuple[str, str]) -> Optional[_ThreadState]:
+        """Cached thread state, falling back to SQLite on a miss"""
+        with self._lock:
+            state = self._cache.get(key)
+            if state is not None:
+                self._cache.move_to_end(key)
+                return state
+
+            row = self.conn.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint, "
+                "metadata_type, metadata, message_count FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            _, parent_id, checkpoint_type, checkpoint_blob, metadata_type, metadata_blob, count = row
+
+            checkpoint: Checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint_blob))
+            if MESSAGES_CHANNEL in checkpoint["channel_versions"]:
+                rows = self.conn.execute(
+                    "SELECT message_type, message FROM checkpoint_messages "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND seq < ? ORDER BY seq",
+                    (*key, count),
+                ).fetchall()
+                messages = [self.serde.loads_typed(r) for r in rows]
+                checkpoint["channel_values"][MESSAGES_CHANNEL] = messages
+            else:
+                messages = []
+
+            state = _ThreadState(
+                checkpoint=checkpoint,
+                metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+                parent_checkpoint_id=parent_id,
+                message_ids=[getattr(m, "id", None) for m in messages],
+            )
+            self._remember(key, state)
+            return state
+
+    def _persist(self, key: Tuple[str, str], previous: Optional[_ThreadState], state: _ThreadState) -> None:
+        values = dict(state.checkpoint["channel_values"])
+        messages = list(values.pop(MESSAGES_CHANNEL, None) or [])
+        stored_checkpoint = {**state.checkpoint, "channel_values": values}
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(stored_checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(state.metadata)
+
+        old_ids = previous.message_ids if previous is not None else []
+        is_append = len(old_ids) <= len(messages) and (
+            not old_ids or getattr(messages[len(old_ids) - 1], "id", None) == old_ids[-1]
+        )
+        start = len(old_ids) if is_append else 0
+
+        with self._lock, self.conn:
+            if not is_append:
+                self.conn.execute(
+                    "DELETE FROM checkpoint_messages WHERE thread_id = ? AND checkpoint_ns = ?", key
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO checkpoint_messages "
+                "(thread_id, checkpoint_ns, seq, message_type, message) VALUES (?, ?, ?, ?, ?)",
+                [(*key, seq, *self.serde.dumps_typed(messages[seq])) for seq in range(start, len(messages))],
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+                "parent_checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata, message_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, state.checkpoint["id"], state.parent_checkpoint_id, checkpoint_type,
+                 checkpoint_blob, metadata_type, metadata_blob, len(messages)),
+            )
+        state.message_ids = [getattr(m, "id", None) for m in messages]
+
+    def _to_tuple(self, key: Tuple[str, str], state: _ThreadState) -> CheckpointTuple:
+        thread_id, checkpoint_ns = key
+        checkpoint = {**state.checkpoint, "channel_values": dict(state.checkpoint["channel_values"])}
+        parent_config = None
+        if state.parent_checkpoint_id:
+            parent_config = {"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": state.parent_checkpoint_id,
+            }}
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": state.checkpoint["id"],
+            }},
+            checkpoint=checkpoint,
+            metadata=state.metadata,
+            parent_config=parent_config,
+            pending_writes=list(state.pending_writes),
+        )
+
+    @staticmethod
+    def _key(config: RunnableConfig) -> Tuple[str, str]:
+        configurable = config["configurable"]
+        return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+    # ---- BaseCheckpointSaver API ----
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = self._key(config)
+        state = self._load(key)
+        if state is None:
+            return None
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id and checkpoint_id != state.checkpoint["id"]:
+            # only the latest checkpoint of a thread is retained
+            return None
+        return self._to_tuple(key, state)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config is not None:
+            keys = [self._key(config)]
+        else:
+            with self._lock:
+                keys = self.conn.execute("SELECT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+
+        returned = 0
+        for key in keys:
+            if limit is not None and returned >= limit:
+                return
+            checkpoint_tuple = self.get_tuple({"configurable": {"thread_id": key[0], "checkpoint_ns": key[1]}})
+            if checkpoint_tuple is None:
+                continue
+            if filter and any(checkpoint_tuple.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            if before is not None and checkpoint_tuple.checkpoint["id"] >= get_checkpoint_id(before):
+                continue
+            returned += 1
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        key = self._key(config)
+        previous = self._load(key)
+        state = _ThreadState(
+            checkpoint={**checkpoint, "channel_values": dict(checkpoint["channel_values"])},
+            metadata=get_checkpoint_metadata(config, metadata),
+            parent_checkpoint_id=config["configurable"].get("checkpoint_id"),
+        )
+        self._persist(key, previous, state)
+        with self._lock:
+            self._remember(key, state)
+        return {"configurable": {
+            "thread_id": key[0],
+            "checkpoint_ns": key[1],
+            "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        # Pending writes only matter while a run is in progress, so they live
+        # with the cached latest checkpoint and are not persisted.
+        state = self._load(self._key(config))
+        if state is None or state.checkpoint["id"] != get_checkpoint_id(config):
+            return
+        with self._lock:
+            state.pending_writes.extend((task_id, channel, value) for channel, value in writes)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM checkpoint_messages WHERE thread_id = ?", (thread_id,))
+            for key in [k for k in self._cache if k[0] == thread_id]:
+                del self._cache[key]
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if self._key(config) in self._cache:
+            return self.get_tuple(config)
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
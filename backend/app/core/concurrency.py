@@ -0,0 +1,163 @@
+"""
+Concurrency limits for LLM-backed endpoints.
+
+Each in-flight agent call holds a slot. Slots are bounded globally and per
+user; callers beyond the global limit wait in a bounded queue. Freed slots go
+to the waiting users in turn (round robin, FIFO within a user), so a user with
+several queued calls does not get ahead of others who arrived later. When the
+queue is full (or the wait times out, or the user is already at their limit)
+the call is rejected with a Retry-After estimate so the API can answer 429
+instead of piling up work it cannot finish.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when a slot cannot be granted"""
+
+    def __init__(self, reason: str, retry_after: int, queue_depth: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.queue_depth = queue_depth
+
+
+class ConcurrencyLimiter:
+    """Global + per-user slot limiter with a bounded wait queue"""
+
+    def __init__(
+        self,
+        max_concurrent: int = 64,
+        max_per_user: int = 2,
+        max_queue: int = 128,
+        queue_timeout: float = 10.0,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self.rejected = 0
+        self._per_user: Dict[str, int] = {}
+        # user -> their waiting calls; the first user is next to get a slot
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._queued = 0
+        # moving average of how long a slot is held, used for Retry-After
+        self._avg_hold = 1.0
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def retry_after(self) -> int:
+        """Estimated seconds until a new caller would get a slot"""
+        waves = (self.queued + 1) / self.max_concurrent
+        return max(1, math.ceil(self._avg_hold * waves))
+
+    def _reject(self, reason: str) -> ConcurrencyLimitExceeded:
+        self.rejected += 1
+        return ConcurrencyLimitExceeded(reason, self.retry_after(), self.queued)
+
+    async def acquire(self, user_id: str) -> None:
+        """Wait for a slot for `user_id`, or raise ConcurrencyLimitExceeded"""
+        if self._per_user.get(user_id, 0) >= self.max_per_user:
+            raise self._reject("Too many concurrent requests for this user")
+
+        # reserve the per-user slot up front so a user cannot flood the queue
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        try:
+            if self.in_flight < self.max_concurrent and not self._waiters:
+                self.in_flight += 1
+            else:
+                await self._wait_for_slot(user_id)
+        except BaseException:
+            self._release_user(user_id)
+            raise
+
+    async def _wait_for_slot(self, user_id: str) -> None:
+        if self.queued >= self.max_queue:
+            raise self._reject("Server is at capacity")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_id, deque()).append(waiter)
+        self._queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just as we timed out; keep it
+                return
+            waiter.cancel()
+            raise self._reject("Timed out waiting for capacity")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            waiter.cancel()
+            raise
+        finally:
+            self._remove_waiter(user_id, waiter)
+
+    def _remove_waiter(self, user_id: str, waiter: asyncio.Future) -> None:
+        queue = self._waiters.get(user_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._waiters[user_id]
+
+    def _release_user(self, user_id: str) -> None:
+        remaining = self._per_user.get(user_id, 0) - 1
+        if remaining > 0:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+
+    def _release_slot(self) -> None:
+        # hand the slot straight to the next live waiter, otherwise free it
+        while self._waiters:
+            user_id, queue = next(iter(self._waiters.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                # this user's next call waits for the other users' turns
+                self._waiters.move_to_end(user_id)
+            else:
+                del self._waiters[user_id]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def release(self, user_id: str, held_for: Optional[float] = None) -> None:
+        """Give back a slot acquired for `user_id`"""
+        if held_for is not None:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held_for
+        self._release_user(user_id)
+        self._release_slot()
+
+    @asynccontextmanager
+    async def slot(self, user_id: str):
+        """Hold a slot for the duration of the block"""
+        await self.acquire(user_id)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "max_concurrent": self.max_concurrent,
+            "max_per_user": self.max_per_user,
+            "max_queue": self.max_queue,
+        }
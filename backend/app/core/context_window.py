@@ -0,0 +1,139 @@
+"""
+Bounded conversation context for the health coach.
+
+Sending the whole conversation on every turn makes prompts (and latency and
+cost) grow without limit. ContextWindow keeps the prompt under a token budget:
+the most recent messages are sent verbatim and older ones are folded into a
+running summary that is sent as a system message.
+
+Folding happens in batches: once the prompt would exceed ``max_tokens``, the
+oldest messages are summarised until the window is back under
+``target_ratio * max_tokens``, so the summariser runs every few turns rather
+than on each one. Each summarisation only sees the previous summary plus the
+newly folded messages, so its cost does not grow with the conversation either.
+"""
+
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.core.tokens import count_message_tokens, truncate_to_tokens
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a user and their health coach.
+Update the summary with the new messages. Keep the user's goals, stats, preferences,
+injuries and limitations, the plans agreed so far and any open questions. Drop small talk.
+Answer with the updated summary only, at most {max_tokens} tokens.
+"""
+
+SUMMARY_HEADER = "Summary of the conversation so far:\n"
+
+
+class PreparedContext(NamedTuple):
+    """Prompt for this turn and the updated summary state"""
+    prompt: List[BaseMessage]
+    summary: str
+    summarized: int  # messages (from the start of the conversation) folded into the summary
+
+
+class ContextWindow:
+    """Token-budgeted rolling window plus an incrementally updated summary"""
+
+    def __init__(
+        self,
+        summarizer: Any,
+        max_tokens: int = 4000,
+        summary_max_tokens: int = 500,
+        target_ratio: float = 0.6,
+        model: str = "gpt-4o",
+    ):
+        self.summarizer = summarizer
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.target_ratio = target_ratio
+        self.model = model
+        self.summarizations = 0
+
+    def _summary_messages(self, summary: str) -> List[BaseMessage]:
+        if not summary:
+            return []
+        return [SystemMessage(content=f"{SUMMARY_HEADER}{summary}")]
+
+    def _prompt_tokens(self, system: List[BaseMessage], summary: str, window: Sequence[BaseMessage]) -> int:
+        return count_message_tokens(list(system) + self._summary_messages(summary) + list(window), self.model)
+
+    def _summary_request(self, summary: str, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        transcript = "\n".join(f"{m.type}: {m.content}" for m in messages)
+        return [
+            SystemMessage(content=SUMMARY_PROMPT.format(max_tokens=self.summary_max_tokens)),
+            HumanMessage(content=f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"),
+        ]
+
+    def _fold_count(self, system: List[BaseMessage], summary: str, window: List[BaseMessage]) -> int:
+        """How many of the oldest `window` messages to fold into the summary (0 if it fits)"""
+        if self._prompt_tokens(system, summary, window) <= self.max_tokens:
+            return 0
+        # budget for verbatim messages once a full-size summary is in place
+        target = self.target_ratio * self.max_tokens - self._prompt_tokens(system, "", []) \
+            - self.summary_max_tokens - count_message_tokens([SystemMessage(content=SUMMARY_HEADER)], self.model)
+        # walk back from the newest message, keeping as many as fit the target
+        keep = len(window) - 1
+        kept_tokens = count_message_tokens([window[-1]], self.model)
+        while keep > 0:
+            cost = count_message_tokens([window[keep - 1]], self.model)
+            if kept_tokens + cost > target:
+                break
+            kept_tokens += cost
+            keep -= 1
+        # never start the window with an assistant reply to a dropped question
+        while keep < len(window) - 1 and window[keep].type != "human":
+            keep += 1
+        return keep
+
+    def _prepared(self, system, window, summary, summarized, folded) -> PreparedContext:
+        window = window[folded:]
+        return PreparedContext(
+            prompt=system + self._summary_messages(summary) + window,
+            summary=summary,
+            summarized=summarized + folded,
+        )
+
+    def prepare(
+        self,
+        system: Sequence[BaseMessage],
+        messages: Sequence[BaseMessage],
+        summary: str = "",
+        summarized: int = 0,
+    ) -> PreparedContext:
+        """
+        Build the prompt for the next model call.
+
+        `messages` is the whole conversation including the new user message;
+        the first `summarized` of them are already covered by `summary`. The
+        newest message is always kept, even if it alone exceeds the budget.
+        """
+        system, window = list(system), list(messages[summarized:])
+        folded = self._fold_count(system, summary, window)
+        if folded:
+            response = self.summarizer.invoke(self._summary_request(summary, window[:folded]))
+            summary = self._new_summary(response)
+        return self._prepared(system, window, summary, summarized, folded)
+
+    async def aprepare(
+        self,
+        system: Sequence[BaseMessage],
+        messages: Sequence[BaseMessage],
+        summary: str = "",
+        summarized: int = 0,
+    ) -> PreparedContext:
+        """Async version of `prepare`"""
+        system, window = list(system), list(messages[summarized:])
+        folded = self._fold_count(system, summary, window)
+        if folded:
+            response = await self.summarizer.ainvoke(self._summary_request(summary, window[:folded]))
+            summary = self._new_summary(response)
+        return self._prepared(system, window, summary, summarized, folded)
+
+    def _new_summary(self, response: BaseMessage) -> str:
+        self.summarizations += 1
+        return truncate_to_tokens(response.content.strip(), self.summary_max_tokens, self.model)
@@ -0,0 +1,162 @@
+"""
+Append-only conversation log for the CLI health agent.
+
+Messages are stored one JSON object per line (JSONL), so multi-line content
+round-trips intact and a new turn only appends to the end of the file instead
+of rewriting it. A sidecar index (``<log>.idx``) holds the byte offset of every
+record as a fixed-width integer, which lets ``load_last(n)`` seek straight to
+the last n records without reading the rest of the history.
+
+Writes go to the OS on every append; ``fsync`` is batched (every
+``fsync_every`` records or ``fsync_interval`` seconds, and on ``close``). The
+log is written before the index, so after a crash the index can only lag
+behind the log: on open, any records past the last indexed offset are
+re-indexed and a torn final line is dropped.
+"""
+
+import json
+import os
+import struct
+import time
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+_OFFSET = struct.Struct("<Q")
+
+_ROLES = {"human": "user", "ai": "assistant"}
+_MESSAGE_TYPES = {"user": HumanMessage, "assistant": AIMessage}
+
+
+def message_to_record(message: BaseMessage) -> Optional[Dict[str, str]]:
+    """JSON record for a user/assistant message (None for other message types)"""
+    role = _ROLES.get(message.type)
+    if role is None:
+        return None
+    return {"role": role, "content": message.content}
+
+
+def record_to_message(record: Dict[str, str]) -> BaseMessage:
+    return _MESSAGE_TYPES[record["role"]](content=record["content"])
+
+
+class ConversationLog:
+    """JSONL message log with an offset index and batched fsync"""
+
+    def __init__(self, path: str, fsync_every: int = 16, fsync_interval: float = 1.0):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.fsyncs = 0
+
+        self._log = open(path, "ab+")
+        self._index = open(self.index_path, "ab+")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._count = self._recover()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "ConversationLog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- recovery ----
+
+    def _recover(self) -> int:
+        """Bring the index in line with the log after an unclean shutdown"""
+        log_size = os.fstat(self._log.fileno()).st_size
+        index_size = os.fstat(self._index.fileno()).st_size
+        count = index_size // _OFFSET.size
+        if index_size % _OFFSET.size:
+            self._index.truncate(count * _OFFSET.size)
+
+        # drop index entries pointing past the end of the log
+        while count and self._offset_at(count - 1) >= log_size:
+            count -= 1
+        self._index.truncate(count * _OFFSET.size)
+
+        # index records the log has but the index missed
+        position = 0
+        if count:
+            self._log.seek(self._offset_at(count - 1))
+            self._log.readline()
+            position = self._log.tell()
+        self._log.seek(position)
+        for line in iter(self._log.readline, b""):
+            if not line.endswith(b"\n"):
+                # torn write from a crash; the record never completed
+                self._log.truncate(position)
+                break
+            self._index.write(_OFFSET.pack(position))
+            position += len(line)
+            count += 1
+        self._index.flush()
+        self._log.seek(0, os.SEEK_END)
+        return count
+
+    def _offset_at(self, i: int) -> int:
+        self._index.seek(i * _OFFSET.size)
+        return _OFFSET.unpack(self._index.read(_OFFSET.size))[0]
+
+    # ---- writing ----
+
+    def append(self, messages: Iterable[BaseMessage]) -> int:
+        """Append user/assistant messages; returns how many were written"""
+        offset = self._log.seek(0, os.SEEK_END)
+        lines, offsets = [], []
+        for message in messages:
+            record = message_to_record(message)
+            if record is None:
+                continue
+            line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+            offsets.append(_OFFSET.pack(offset))
+            lines.append(line)
+            offset += len(line)
+        if not lines:
+            return 0
+
+        self._log.write(b"".join(lines))
+        self._log.flush()
+        self._index.seek(0, os.SEEK_END)
+        self._index.write(b"".join(offsets))
+        self._index.flush()
+        self._count += len(lines)
+        self._unsynced += len(lines)
+
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+        return len(lines)
+
+    def sync(self) -> None:
+        """fsync the log, then the index"""
+        if not self._unsynced:
+            return
+        os.fsync(self._log.fileno())
+        os.fsync(self._index.fileno())
+        self.fsyncs += 1
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._log.closed:
+            return
+        self.sync()
+        self._log.close()
+        self._index.close()
+
+    # ---- reading ----
+
+    def load_last(self, n: Optional[int] = None) -> List[BaseMessage]:
+        """The last `n` messages (all of them if n is None), oldest first"""
+        start = 0 if n is None else max(0, self._count - n)
+        if start >= self._count:
+            return []
+        self._log.seek(self._offset_at(start))
+        messages = [record_to_message(json.loads(line)) for line in self._log.readlines()]
+        self._log.seek(0, os.SEEK_END)
+        return messages
@@ -0,0 +1,123 @@
+"""
+Parsing of the onboarding agent's JSON replies.
+
+The agent sends an envelope delta (see ``OnboardingDelta``), which is validated
+against the typed models in ``app.models.onboarding`` before the full envelope
+is assembled and returned, so malformed output is caught
+on the server instead of in the browser. Well-formed replies take the fast
+path: one ``validate_json`` call in pydantic-core. Only when that fails do we
+try local repairs for the usual LLM slips (code fences, prose around the
+object, trailing commas, Python literals); the API asks the agent to correct
+itself only if the repaired text still does not validate.
+"""
+
+import json
+import re
+from typing import Any, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.core.metrics import Counter, REGISTRY
+from app.models.onboarding import OnboardingDelta, OnboardingEnvelope
+
+envelope_adapter: TypeAdapter = TypeAdapter(OnboardingEnvelope)
+delta_adapter: TypeAdapter = TypeAdapter(OnboardingDelta)
+
+# Sent back to the agent (as a user turn) when its reply could not be repaired
+CORRECTION_PROMPT = (
+    "Your last reply was not a valid JSON reply ({error}). "
+    "Reply again with ONLY the corrected JSON, following the JSON REPLY rules exactly."
+)
+
+ENVELOPE_PARSES = Counter(
+    "onboarding_envelope_parses_total",
+    "Onboarding envelopes by parse outcome (ok, repaired, invalid).",
+    ("outcome",),
+)
+REGISTRY.append(ENVELOPE_PARSES)
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+_PYTHON_LITERAL = re.compile(r"(?<![\w\"])(None|True|False)(?![\w\"])")
+
+
+class EnvelopeParseError(ValueError):
+    """The text is not a valid onboarding envelope"""
+
+
+def parse_envelope(text: str, adapter: TypeAdapter = envelope_adapter) -> Any:
+    """Typed envelope (or delta, with `delta_adapter`) for `text`; raises EnvelopeParseError"""
+    try:
+        return adapter.validate_json(text)
+    except ValidationError as e:
+        raise EnvelopeParseError(_describe(e)) from e
+
+
+def _describe(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first.get("loc", ())) or "envelope"
+    return f"{location}: {first.get('msg')}"
+
+
+def repair_json(text: str) -> Optional[str]:
+    """Best-effort fix of common LLM JSON slips; None when nothing could be changed"""
+    repaired = text.strip()
+    fenced = _FENCE.match(repaired)
+    if fenced:
+        repaired = fenced.group(1)
+    start, end = repaired.find("{"), repaired.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    repaired = repaired[start:end + 1]
+    repaired = _TRAILING_COMMA.sub(r"\1", repaired)
+    try:
+        json.loads(repaired)
+    except ValueError:
+        repaired = _PYTHON_LITERAL.sub(lambda m: _PYTHON_LITERALS[m.group(1)], repaired)
+    return repaired if repaired != text else None
+
+
+def _parse_or_repair(text: str, adapter: TypeAdapter) -> Tuple[Any, bool]:
+    try:
+        return parse_envelope(text, adapter), False
+    except EnvelopeParseError as error:
+        repaired = repair_json(text) if isinstance(text, str) else None
+        if repaired is None:
+            raise
+        try:
+            return parse_envelope(repaired, adapter), True
+        except EnvelopeParseError:
+            raise error
+
+
+def parse_or_repair(text: str, adapter: TypeAdapter = envelope_adapter) -> Tuple[Any, bool]:
+    """Typed value and whether it needed repairing; raises EnvelopeParseError if unrecoverable"""
+    try:
+        value, repaired = _parse_or_repair(text, adapter)
+    except EnvelopeParseError:
+        ENVELOPE_PARSES.inc(1, "invalid")
+        raise
+    ENVELOPE_PARSES.inc(1, "repaired" if repaired else "ok")
+    return value, repaired
+
+
+def load_delta(text: Any) -> Optional[OnboardingDelta]:
+    """Delta from an earlier turn of the history, or None (not counted in the parse metrics)"""
+    if not isinstance(text, str):
+        return None
+    try:
+        return _parse_or_repair(text, delta_adapter)[0]
+    except EnvelopeParseError:
+        return None
+
+
+def envelope_json(envelope: Any) -> str:
+    """Canonical JSON text of a typed envelope or delta (what gets cached and checkpointed)"""
+    # exclude_unset: only the keys the agent sent, not the models' null defaults
+    return envelope.model_dump_json(exclude_unset=True)
+
+
+def envelope_data(envelope: OnboardingEnvelope) -> dict:
+    """JSON-ready dict of a typed envelope, for encoders that take plain data"""
+    return envelope.model_dump(mode="json", exclude_unset=True)
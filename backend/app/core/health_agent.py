@@ -1,9 +1,15 @@
+import asyncio
+import os
 from typing import Annotated, Sequence, TypedDict, Any
-from operator import add as add_messages
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
 from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, AIMessage
 from dotenv import load_dotenv
+from app.core.conversation_log import ConversationLog
+from app.core.context_window import ContextWindow
+from app.core.checkpointer import ConversationCheckpointer
+from app.core.model_router import ModelRouter
+from app.core.providers import provider
 
 # Import locally for CLI version
 try:
@@ -14,16 +20,38 @@ except ImportError:
 
 load_dotenv()
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0)
+# gpt-4o for plan generation, gpt-4o-mini for small talk and clarifications (MODEL_ROUTER_POLICY).
+# The router only creates its chat models when a turn first needs them.
+llm = ModelRouter()
+
+# The summary model, context window, graphs and checkpointer are built on first
+# use (see app.core.providers), so importing this module stays cheap.
+
+@provider("health_agent.summary_llm")
+def get_summary_llm():
+    """Cheap model that folds old turns into the running summary"""
+    from langchain_openai import ChatOpenAI
+    from app.core.llm_policy import chat_openai_kwargs
+
+    return ChatOpenAI(model="gpt-4o-mini", temperature=0, **chat_openai_kwargs("summary"))
+
+@provider("health_agent.context_window")
+def get_context_window() -> ContextWindow:
+    """Keeps each gpt-4o prompt under the token budget however long the conversation gets"""
+    return ContextWindow(
+        get_summary_llm(),
+        max_tokens=int(os.environ.get("HEALTH_AGENT_CONTEXT_TOKENS", 4000)),
+        summary_max_tokens=int(os.environ.get("HEALTH_AGENT_SUMMARY_TOKENS", 500)),
+    )
 
 class AgentState(TypedDict):
     context: dict[str, Any]
     messages: Annotated[Sequence[BaseMessage], add_messages]
+    summary: str  # running summary of messages no longer sent verbatim
+    summarized: int  # how many of `messages` the summary covers
 
 
-def agent_node(state: AgentState) -> AgentState:
-    """ This is the agent node. It takes in a state and returns a new state."""
-    system_prompt = SystemMessage(content="""
+SYSTEM_PROMPT = SystemMessage(content="""
     You are a helpful health coach assistant. Users will ask you questions about their health and fitness.
     You will answer their questions in a helpful and concise way. 
 
@@ -33,41 +61,62 @@ def agent_node(state: AgentState) -> AgentState:
     - Always stick to the topic of the conversation which is health and fitness, if user asks about something else, try to redirect the conversation to health and fitness.
     - To end the conversation, user can say "exit_conversation".
     """)
-    
-    user_input = input("\nHow would you like me to help you? ")
-    user_message = HumanMessage(content=user_input)
-
-    all_messages = [system_prompt] + list(state["messages"]) + [user_message]
-    response = llm.invoke(all_messages)
-    
-    
-    return {"messages": list(state["messages"]) + [user_message,response]}
-    
-
-def should_continue(state: AgentState) -> str:
-    """ This function decides whether to continue the conversation or not,"""
-    messages = state["messages"]
-    
-    if not messages:
-        return "continue"
-
-    # check if the last message is exit_conversation
-    last_message = messages[-1]
-    if isinstance(last_message, HumanMessage) and "exit_conversation" in last_message.content.lower():
-        return "end"
-
-    return "continue"
 
-graph = StateGraph(AgentState)
-graph.add_node("agent", agent_node)
+EXIT_COMMAND = "exit_conversation"
 
 
-graph.add_edge(START, "agent")
-graph.add_conditional_edges("agent", should_continue, {
-    "continue": "agent",
-    "end": END
-})
-agent = graph.compile()
+async def agent_node(state: AgentState) -> AgentState:
+    """ This is the agent node. It answers the latest user message in the state."""
+    context = await get_context_window().aprepare(
+        [SYSTEM_PROMPT],
+        list(state["messages"]),
+        summary=state.get("summary", ""),
+        summarized=state.get("summarized", 0),
+    )
+    response = await llm.ainvoke(context.prompt)
+    
+    # only the new message: the reducer appends it to the history
+    return {"messages": [response], "summary": context.summary, "summarized": context.summarized}
+
+
+def build_graph() -> StateGraph:
+    """One graph run is one turn: the caller adds the user's message, the agent answers."""
+    graph = StateGraph(AgentState)
+    graph.add_node("agent", agent_node)
+    graph.add_edge(START, "agent")
+    graph.add_edge("agent", END)
+    return graph
+
+@provider("health_agent.agent")
+def get_agent():
+    """CLI: the caller passes the whole conversation in on every turn"""
+    return build_graph().compile()
+
+@provider("health_agent.checkpointer")
+def get_checkpointer() -> ConversationCheckpointer:
+    return ConversationCheckpointer(
+        path=os.environ.get("HEALTH_COACH_CHECKPOINT_DB", "health_coach_checkpoints.sqlite3"),
+        cache_size=int(os.environ.get("HEALTH_COACH_CHECKPOINT_CACHE_SIZE", 1024)),
+    )
+
+@provider("health_agent.coach_agent")
+def get_coach_agent():
+    """Server: per-session state is checkpointed under the chat session id (the LangGraph thread_id)"""
+    return build_graph().compile(checkpointer=get_checkpointer())
+
+_LAZY_ATTRIBUTES = {
+    "summary_llm": get_summary_llm,
+    "context_window": get_context_window,
+    "agent": get_agent,
+    "checkpointer": get_checkpointer,
+    "coach_agent": get_coach_agent,
+}
+
+def __getattr__(name: str):
+    # the lazily built objects are still reachable as module attributes
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def print_messages(messages):
@@ -81,15 +130,13 @@ def print_messages(messages):
         elif isinstance(message, HumanMessage):
             print(f"\n👤 User: {message.content}")
 
-def save_history(messages, filename="history.txt"):
-    with open(filename, "w") as f:
-        for message in messages:
-            if isinstance(message, AIMessage):
-                f.write(f"Agent: {message.content}\n")
-            elif isinstance(message, HumanMessage):
-                f.write(f"User: {message.content}\n")
+HISTORY_FILE = "history.jsonl"
+LEGACY_HISTORY_FILE = "history.txt"
+# how many past messages are loaded back into the conversation on start
+HISTORY_LOAD_LAST = 50
 
-def load_history(filename="history.txt"):
+def load_legacy_history(filename=LEGACY_HISTORY_FILE):
+    """Messages from the old line-per-message history.txt format"""
     messages = []
     try:
         with open(filename, "r") as f:
@@ -103,18 +150,39 @@ def load_history(filename="history.txt"):
     except FileNotFoundError:
         return []
 
+def open_history(filename=HISTORY_FILE):
+    """Open the conversation log, importing an old history.txt the first time"""
+    is_new = not os.path.exists(filename)
+    log = ConversationLog(filename)
+    if is_new:
+        # the old history.txt lives next to the new log
+        log.append(load_legacy_history(os.path.join(os.path.dirname(filename), LEGACY_HISTORY_FILE)))
+    return log
 
-def run_agent():
-    print_custom_banner()
-    # load chat history.
-    messages = load_history()
-    state = {"messages": messages}
+def load_history(filename=HISTORY_FILE, last_n=HISTORY_LOAD_LAST):
+    """Last `last_n` messages of the saved conversation"""
+    with open_history(filename) as log:
+        return log.load_last(last_n)
 
-    for step in agent.stream(state, stream_mode="values"):
-        if "messages" in step:
-            print_messages(step["messages"])
-            save_history(step["messages"])
 
+async def _run_cli():
+    # load the tail of the chat history; every new message is appended to the log
+    with open_history() as log:
+        state = {"messages": log.load_last(HISTORY_LOAD_LAST)}
+
+        while True:
+            user_input = await asyncio.to_thread(input, "\nHow would you like me to help you? ")
+            if EXIT_COMMAND in user_input.lower():
+                break
+            user_message = HumanMessage(content=user_input)
+            state = await get_agent().ainvoke({**state, "messages": list(state["messages"]) + [user_message]})
+            print_messages(state["messages"])
+            log.append(state["messages"][-2:])
+
+
+def run_agent():
+    print_custom_banner()
+    asyncio.run(_run_cli())
     print("\n === HEALTH COACH AGENT FINISHED ===")
 
 if __name__ == "__main__":
@@ -0,0 +1,297 @@
+"""
+Deadline, retry and hedging policy for LLM HTTP calls.
+
+The OpenAI clients behind ChatOpenAI send their requests through an httpx
+client. ``llm_http_client`` builds one whose transport applies an
+LLMCallPolicy to every chat completion, whichever agent, tool loop or stream
+makes it:
+
+- deadline: the whole call, retries and hedges included, must finish within
+  ``deadline`` seconds. A streamed body is cut off once it runs past it.
+- retries: connection errors, 429 and 5xx responses are retried up to
+  ``max_retries`` times with full-jitter exponential backoff (a Retry-After
+  header wins when it is longer), as long as the deadline leaves room.
+- hedging (optional): when a request has not started answering after the p95
+  of recent response times (or a fixed ``hedge_after``), an identical second
+  request is sent. Whichever answers first is used and the other is
+  cancelled, so one stalled upstream request no longer sets the tail latency.
+  Streamed and non-streamed calls keep separate latency windows, since time to
+  first token and time to a whole completion differ by an order of magnitude.
+
+The OpenAI SDK's own retries are turned off (``max_retries=0``) where the
+policy is installed so the two do not multiply. Only the async client gets
+the full policy, since the API serves every request through it; sync calls
+(the CLI) keep the deadline as their timeout and retry failed connections.
+
+Configured from the environment: LLM_DEADLINE, LLM_MAX_RETRIES,
+LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_HEDGE (1 to enable), LLM_HEDGE_AFTER
+(fixed delay instead of the p95) and LLM_HEDGE_MIN_SAMPLES.
+"""
+
+import asyncio
+import email.utils
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+import httpx
+
+from app.core.metrics import Counter, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LLM_HEDGES = Counter(
+    "llm_hedges_total",
+    "Hedged LLM requests by client and outcome (fired: a second request was sent, won: it answered first).",
+    ("client", "outcome"),
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "Retried LLM requests by client and reason (status code or error).",
+    ("client", "reason"),
+)
+LLM_DEADLINE_EXCEEDED = Counter(
+    "llm_deadline_exceeded_total",
+    "LLM calls that ran past the policy deadline, by client.",
+    ("client",),
+)
+REGISTRY.extend([LLM_HEDGES, LLM_RETRIES, LLM_DEADLINE_EXCEEDED])
+
+RETRYABLE_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class LLMDeadlineExceeded(httpx.TimeoutException):
+    """Raised when an LLM call, retries and hedges included, runs past its deadline"""
+
+
+class LLMCallPolicy:
+    """How long an LLM call may take, how it is retried and when it is hedged"""
+
+    def __init__(
+        self,
+        deadline: float = 60.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedge: bool = False,
+        hedge_after: Optional[float] = None,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+    ):
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+
+    @classmethod
+    def from_env(cls) -> "LLMCallPolicy":
+        hedge_after = os.environ.get("LLM_HEDGE_AFTER")
+        return cls(
+            deadline=float(os.environ.get("LLM_DEADLINE", 60)),
+            max_retries=int(os.environ.get("LLM_MAX_RETRIES", 2)),
+            backoff_base=float(os.environ.get("LLM_BACKOFF_BASE", 0.5)),
+            backoff_max=float(os.environ.get("LLM_BACKOFF_MAX", 8)),
+            hedge=os.environ.get("LLM_HEDGE", "").lower() in ("1", "true", "yes"),
+            hedge_after=float(hedge_after) if hedge_after else None,
+            hedge_min_samples=int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", 20)),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+
+def _retry_after(response: httpx.Response) -> float:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else 0.0
+
+
+def _is_stream(request: httpx.Request) -> bool:
+    try:
+        return bool(json.loads(request.content or b"{}").get("stream"))
+    except ValueError:
+        return False
+
+
+class _DeadlineStream(httpx.AsyncByteStream):
+    """Response body that raises LLMDeadlineExceeded once the call's deadline passes"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, deadline: float, client: str):
+        self._stream = stream
+        self._deadline = deadline
+        self._client = client
+
+    async def __aiter__(self):
+        chunks = self._stream.__aiter__()
+        while True:
+            remaining = self._deadline - time.monotonic()
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), max(remaining, 0.0))
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                LLM_DEADLINE_EXCEEDED.inc(1, self._client)
+                raise LLMDeadlineExceeded("LLM call deadline exceeded while streaming")
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+class PolicyTransport(httpx.AsyncBaseTransport):
+    """httpx transport applying an LLMCallPolicy to each request"""
+
+    def __init__(
+        self,
+        policy: LLMCallPolicy,
+        name: str = "llm",
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        window: int = 200,
+    ):
+        self.policy = policy
+        self.name = name
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        # time until a response starts, per (streamed?) kind of call
+        self._latencies: Dict[bool, Deque[float]] = {True: deque(maxlen=window), False: deque(maxlen=window)}
+
+    def hedge_delay(self, stream: bool) -> Optional[float]:
+        """Seconds to wait before hedging a call, or None to not hedge it"""
+        if not self.policy.hedge:
+            return None
+        if self.policy.hedge_after is not None:
+            return self.policy.hedge_after
+        samples = self._latencies[stream]
+        if len(samples) < self.policy.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(self.policy.hedge_quantile * len(ordered)))]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # buffered, so the body can be sent again by a retry or a hedge
+        await request.aread()
+        deadline = time.monotonic() + self.policy.deadline
+        stream = _is_stream(request)
+        attempt = 0
+        while True:
+            try:
+                response = await asyncio.wait_for(
+                    self._send(request, stream), max(deadline - time.monotonic(), 0.0)
+                )
+            except asyncio.TimeoutError:
+                LLM_DEADLINE_EXCEEDED.inc(1, self.name)
+                raise LLMDeadlineExceeded("LLM call deadline exceeded", request=request)
+            except httpx.TransportError as e:
+                error: Optional[Exception] = e
+                response = None
+                reason = type(e).__name__
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    response.stream = _DeadlineStream(response.stream, deadline, self.name)
+                    return response
+                error = None
+                reason = str(response.status_code)
+
+            attempt += 1
+            wait = self.policy.backoff(attempt)
+            if response is not None:
+                wait = max(wait, _retry_after(response))
+            if attempt > self.policy.max_retries or time.monotonic() + wait >= deadline:
+                if response is not None:
+                    response.stream = _DeadlineStream(response.stream, deadline, self.name)
+                    return response
+                raise error
+            if response is not None:
+                await response.aclose()
+            LLM_RETRIES.inc(1, self.name, reason)
+            logger.warning("llm_retry client=%s attempt=%d reason=%s wait_s=%.2f", self.name, attempt, reason, wait)
+            await asyncio.sleep(wait)
+
+    async def _timed(self, request: httpx.Request, stream: bool) -> httpx.Response:
+        start = time.monotonic()
+        response = await self._transport.handle_async_request(request)
+        if response.status_code < 400:
+            self._latencies[stream].append(time.monotonic() - start)
+        return response
+
+    async def _send(self, request: httpx.Request, stream: bool) -> httpx.Response:
+        """One attempt: the request, plus a hedge if it is slow to answer"""
+        delay = self.hedge_delay(stream)
+        if delay is None:
+            return await self._timed(request, stream)
+
+        first = asyncio.ensure_future(self._timed(request, stream))
+        tasks: Set["asyncio.Future[httpx.Response]"] = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                tasks.discard(first)
+                return first.result()
+            LLM_HEDGES.inc(1, self.name, "fired")
+            hedge = asyncio.ensure_future(self._timed(request, stream))
+            tasks.add(hedge)
+
+            pending = set(tasks)
+            failed: Optional["asyncio.Future[httpx.Response]"] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code not in RETRYABLE_STATUSES:
+                        if task is hedge:
+                            LLM_HEDGES.inc(1, self.name, "won")
+                        tasks.discard(task)
+                        return task.result()
+                    failed = task
+            # both failed: the retry loop decides what to do with the last failure
+            tasks.discard(failed)
+            return failed.result()
+        finally:
+            await _cancel(tasks)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+async def _cancel(tasks: Set["asyncio.Future[httpx.Response]"]) -> None:
+    """Cancel the losing requests and close any response they already got"""
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            response = await task
+        except BaseException:
+            continue
+        await response.aclose()
+
+
+def llm_http_client(name: str, policy: Optional[LLMCallPolicy] = None) -> httpx.AsyncClient:
+    """Async httpx client for an OpenAI client that applies `policy` (default: from the environment)"""
+    policy = policy or LLMCallPolicy.from_env()
+    return httpx.AsyncClient(transport=PolicyTransport(policy, name), timeout=httpx.Timeout(policy.deadline))
+
+
+def chat_openai_kwargs(name: str, policy: Optional[LLMCallPolicy] = None) -> Dict[str, Any]:
+    """ChatOpenAI arguments that route its async calls through the policy"""
+    policy = policy or LLMCallPolicy.from_env()
+    return {
+        "http_async_client": llm_http_client(name, policy),
+        "http_client": httpx.Client(
+            transport=httpx.HTTPTransport(retries=policy.max_retries), timeout=httpx.Timeout(policy.deadline)
+        ),
+        "timeout": policy.deadline,
+        # retries happen in the policy transport
+        "max_retries": 0,
+    }
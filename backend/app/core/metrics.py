@@ -0,0 +1,323 @@
+"""
+Per-request timing and Prometheus-style metrics.
+
+RequestMetricsMiddleware opens a RequestTimings for every HTTP request and
+makes it the current one (a ContextVar, so it follows the request into the
+tasks it spawns). While the request runs:
+
+- LLM time and tokens in/out are added by RequestTimings itself, which is
+  registered as a LangChain configure hook and therefore sees every chat model
+  call made on behalf of the request, whatever model or agent makes it;
+- DB time is added by ``db_timed``, which wraps each ``app.db.client`` call;
+- serialization time is added by ``serialization_timer`` (response rendering
+  in TimedJSONResponse and the SSE event encoding).
+
+When the request finishes its totals go into histograms and one structured
+``request ...`` log line. ``render_metrics`` produces the Prometheus text
+format served on ``/metrics``. Metrics are per process: with several uvicorn
+workers each one reports its own.
+"""
+
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SERIALIZATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self._series: Dict[LabelValues, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def sum(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = _format_labels(self.labels, labels, f'le="{bound:g}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _format_labels(self.labels, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Total request latency.", ("method", "route", "status"),
+)
+REQUEST_LLM = Histogram(
+    "http_request_llm_seconds", "Time per request spent in LLM calls.", ("route",),
+)
+REQUEST_DB = Histogram(
+    "http_request_db_seconds", "Time per request spent in database calls.", ("route",), DB_BUCKETS,
+)
+REQUEST_SERIALIZATION = Histogram(
+    "http_request_serialization_seconds", "Time per request spent serializing responses.", ("route",),
+    SERIALIZATION_BUCKETS,
+)
+DB_CALL_DURATION = Histogram(
+    "db_call_duration_seconds", "Latency of each app.db.client call.", ("operation",), DB_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens by request route and direction (in/out).", ("route", "direction"))
+
+REGISTRY: List[Any] = [
+    REQUEST_DURATION, REQUEST_LLM, REQUEST_DB, REQUEST_SERIALIZATION, DB_CALL_DURATION, LLM_TOKENS,
+]
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestTimings(BaseCallbackHandler):
+    """Time and token totals for one request; also the LangChain handler that collects the LLM part"""
+
+    # called inline so the measured time is the model call, not an executor hop
+    run_inline = True
+
+    def __init__(self):
+        self.llm_seconds = 0.0
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.db_seconds = 0.0
+        self.db_calls = 0
+        self.serialization_seconds = 0.0
+        self._llm_started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        self._llm_started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs) -> None:
+        self._llm_started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs) -> None:
+        self._finish_llm(run_id)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.prompt_tokens += usage.get("input_tokens", 0)
+                    self.completion_tokens += usage.get("output_tokens", 0)
+                    return
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._finish_llm(run_id)
+
+    def _finish_llm(self, run_id: UUID) -> None:
+        started = self._llm_started.pop(run_id, None)
+        if started is not None:
+            self.llm_seconds += time.perf_counter() - started
+            self.llm_calls += 1
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+# every LangChain run started while a request is current reports to its RequestTimings
+register_configure_hook(_current, inheritable=True)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def db_timed(func):
+    """Decorator recording the duration of a database call (per operation and for the current request)"""
+    operation = func.__name__
+
+    def record(start: float) -> None:
+        elapsed = time.perf_counter() - start
+        DB_CALL_DURATION.observe(elapsed, operation)
+        timings = _current.get()
+        if timings is not None:
+            timings.db_seconds += elapsed
+            timings.db_calls += 1
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                record(start)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(start)
+    return wrapper
+
+
+@contextmanager
+def serialization_timer() -> Iterator[None]:
+    """Count the enclosed block as serialization time of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _current.get()
+        if timings is not None:
+            timings.serialization_seconds += time.perf_counter() - start
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse whose rendering counts as serialization time"""
+
+    def render(self, content: Any) -> bytes:
+        with serialization_timer():
+            return super().render(content)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording per-request latency, broken down into LLM, DB and serialization time"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._record(scope, status_code, time.perf_counter() - start, timings)
+
+    @staticmethod
+    def _route_template(scope) -> str:
+        """Matched route path with its include prefix, e.g. /api/chat/sessions/{session_id}/messages"""
+        # templates rather than raw paths keep label cardinality bounded (no ids)
+        template = getattr(scope.get("route"), "path", None)
+        if template is None:
+            return "unmatched"
+        # included routers may report the path without the prefix they were mounted under
+        extra = scope["path"].rstrip("/").count("/") - template.rstrip("/").count("/")
+        if extra <= 0:
+            return template
+        return "/".join(scope["path"].split("/")[:extra + 1]) + template
+
+    @classmethod
+    def _record(cls, scope, status_code: int, elapsed: float, timings: RequestTimings) -> None:
+        route = cls._route_template(scope)
+        method = scope.get("method", "")
+        REQUEST_DURATION.observe(elapsed, method, route, str(status_code))
+        REQUEST_LLM.observe(timings.llm_seconds, route)
+        REQUEST_DB.observe(timings.db_seconds, route)
+        REQUEST_SERIALIZATION.observe(timings.serialization_seconds, route)
+        if timings.prompt_tokens:
+            LLM_TOKENS.inc(timings.prompt_tokens, route, "in")
+        if timings.completion_tokens:
+            LLM_TOKENS.inc(timings.completion_tokens, route, "out")
+
+        logger.info(
+            "request method=%s route=%s status=%d duration_ms=%.1f llm_ms=%.1f llm_calls=%d "
+            "db_ms=%.1f db_calls=%d serialization_ms=%.2f prompt_tokens=%d completion_tokens=%d",
+            method, route, status_code, elapsed * 1000, timings.llm_seconds * 1000, timings.llm_calls,
+            timings.db_seconds * 1000, timings.db_calls, timings.serialization_seconds * 1000,
+            timings.prompt_tokens, timings.completion_tokens,
+        )
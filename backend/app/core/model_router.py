@@ -0,0 +1,205 @@
+"""
+Cost/latency-aware model routing.
+
+Not every turn needs the biggest model: "thanks!" or "what's a superset?" are
+answered just as well by gpt-4o-mini, at a fraction of the cost and latency,
+while generating a full training or diet plan benefits from gpt-4o.
+
+ModelRouter classifies each turn into a route (small talk, clarification or
+plan) with cheap local rules, picks the model the active policy assigns to
+that route, and records per-route latency and token metrics. It exposes
+``ainvoke`` / ``invoke`` like a chat model, so it drops in wherever one is used.
+
+Policies map routes to models. ``MODEL_ROUTER_POLICY`` selects a preset
+("cost", "quality", "economy") or gives an explicit JSON mapping such as
+``{"small_talk": "gpt-4o-mini", "clarification": "gpt-4o-mini", "plan": "gpt-4o"}``.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+
+SMALL_TALK = "small_talk"
+CLARIFICATION = "clarification"
+PLAN = "plan"
+ROUTES = (SMALL_TALK, CLARIFICATION, PLAN)
+
+POLICIES: Dict[str, Dict[str, str]] = {
+    # cheapest adequate model per route
+    "cost": {SMALL_TALK: "gpt-4o-mini", CLARIFICATION: "gpt-4o-mini", PLAN: "gpt-4o"},
+    # previous behaviour: everything on the big model
+    "quality": {SMALL_TALK: "gpt-4o", CLARIFICATION: "gpt-4o", PLAN: "gpt-4o"},
+    "economy": {SMALL_TALK: "gpt-4o-mini", CLARIFICATION: "gpt-4o-mini", PLAN: "gpt-4o-mini"},
+}
+DEFAULT_POLICY = "cost"
+
+# USD per 1M tokens (input, output), for cost estimates in the metrics
+MODEL_PRICES: Dict[str, tuple] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+_SMALL_TALK = re.compile(
+    r"^\s*(hi|hello|hey|yo|thanks|thank you|thx|ty|ok|okay|cool|great|nice|awesome|bye|goodbye|"
+    r"good (morning|afternoon|evening|night)|how are you|got it|sounds good)\b[\s\w,!.?:)]{0,15}$",
+    re.IGNORECASE,
+)
+_PLAN_ITEM = r"(plan|program|programme|routine|schedule|split|meal plan|diet|menu|regimen|workouts?)"
+_PLAN_REQUEST = re.compile(
+    r"\b(make|create|give|build|design|write|draft|put together|prepare|need|want|suggest|recommend)\b"
+    r".*\b" + _PLAN_ITEM + r"\b"
+    r"|\bplan (my|a|out)\b"
+    r"|\b(weekly|\d+[- ](day|week|month))\b.*\b" + _PLAN_ITEM + r"\b",
+    re.IGNORECASE,
+)
+LONG_MESSAGE_CHARS = 600
+
+
+def classify_turn(message: str) -> str:
+    """Route for a user message: small talk, clarification, or plan generation"""
+    text = message.strip()
+    if _PLAN_REQUEST.search(text) or len(text) > LONG_MESSAGE_CHARS:
+        return PLAN
+    if _SMALL_TALK.match(text):
+        return SMALL_TALK
+    return CLARIFICATION
+
+
+def load_policy(spec: Optional[str] = None) -> Dict[str, str]:
+    """Policy from a preset name or a JSON route -> model mapping (default: MODEL_ROUTER_POLICY)"""
+    spec = spec or os.environ.get("MODEL_ROUTER_POLICY", DEFAULT_POLICY)
+    if spec in POLICIES:
+        return dict(POLICIES[spec])
+    try:
+        mapping = json.loads(spec)
+    except ValueError:
+        raise ValueError(f"Unknown model router policy: {spec}")
+    policy = dict(POLICIES[DEFAULT_POLICY])
+    policy.update({route: model for route, model in mapping.items() if route in ROUTES})
+    return policy
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RouteMetrics:
+    """Latency and token totals for one route"""
+
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "estimated_cost_usd": round(self.cost_usd, 6),
+            "latency_p50": _percentile(self.latencies, 0.50),
+            "latency_p95": _percentile(self.latencies, 0.95),
+        }
+
+
+def _default_model_factory(name: str) -> Any:
+    from langchain_openai import ChatOpenAI
+    from app.core.llm_policy import chat_openai_kwargs
+
+    return ChatOpenAI(model=name, temperature=0, **chat_openai_kwargs(f"router:{name}"))
+
+
+class ModelRouter:
+    """Chat-model facade that sends each turn to the model its route calls for"""
+
+    def __init__(
+        self,
+        policy: Optional[Dict[str, str]] = None,
+        model_factory: Callable[[str], Any] = _default_model_factory,
+        classifier: Callable[[str], str] = classify_turn,
+    ):
+        self.policy = policy or load_policy()
+        self.classifier = classifier
+        self._model_factory = model_factory
+        self._models: Dict[str, Any] = {}
+        self._metrics: Dict[str, RouteMetrics] = {route: RouteMetrics() for route in ROUTES}
+        self._lock = threading.Lock()
+
+    def model_for(self, name: str) -> Any:
+        """Chat model for `name`, created on first use"""
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    model = self._models[name] = self._model_factory(name)
+        return model
+
+    def route(self, messages: Sequence[BaseMessage]) -> str:
+        """Route for a prompt, from its latest user message"""
+        for message in reversed(messages):
+            if message.type == "human":
+                return self.classifier(message.content if isinstance(message.content, str) else str(message.content))
+        return CLARIFICATION
+
+    def _record(self, route: str, model: str, elapsed: float, response: Any = None, failed: bool = False) -> None:
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens", 0)
+        completion_tokens = usage.get("output_tokens", 0)
+        with self._lock:
+            metrics = self._metrics[route]
+            metrics.calls += 1
+            metrics.errors += failed
+            metrics.latencies.append(elapsed)
+            metrics.prompt_tokens += prompt_tokens
+            metrics.completion_tokens += completion_tokens
+            metrics.cost_usd += estimate_cost(model, prompt_tokens, completion_tokens)
+
+    async def ainvoke(self, messages: List[BaseMessage], route: Optional[str] = None, **kwargs) -> Any:
+        route = route or self.route(messages)
+        name = self.policy[route]
+        start = time.perf_counter()
+        try:
+            response = await self.model_for(name).ainvoke(messages, **kwargs)
+        except Exception:
+            self._record(route, name, time.perf_counter() - start, failed=True)
+            raise
+        self._record(route, name, time.perf_counter() - start, response)
+        return response
+
+    def invoke(self, messages: List[BaseMessage], route: Optional[str] = None, **kwargs) -> Any:
+        route = route or self.route(messages)
+        name = self.policy[route]
+        start = time.perf_counter()
+        try:
+            response = self.model_for(name).invoke(messages, **kwargs)
+        except Exception:
+            self._record(route, name, time.perf_counter() - start, failed=True)
+            raise
+        self._record(route, name, time.perf_counter() - start, response)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                route: {"model": self.policy[route], **metrics.stats()}
+                for route, metrics in self._metrics.items()
+            }
@@ -1,13 +1,72 @@
-from langgraph.prebuilt import create_react_agent
-from langchain_openai import ChatOpenAI
+import os
 from pydantic import BaseModel
-from app.core.prompt import ONBOARDING_AGENT_PROMPT
+from app.core.prompt import build_onboarding_system_messages, ONBOARDING_PROMPT_VERSION
+from app.core.checkpointer import ConversationCheckpointer
+from app.core.onboarding_tools import ONBOARDING_TOOLS
+from app.core.providers import provider
+from app.core.token_usage import TokenUsageTracker
 
-model = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+usage_tracker = TokenUsageTracker("onboarding")
 
 class ResponseFormat(BaseModel):
     """Response format for the agent."""
     result: str
 
+# The model, checkpointer and agent are built on first use (see app.core.providers),
+# so importing the API does not need OPENAI_API_KEY or pay for langchain_openai.
 
-onboarding_agent = create_react_agent(model, tools=[], prompt=ONBOARDING_AGENT_PROMPT, response_format=ResponseFormat)
\ No newline at end of file
+@provider("onboarding.model")
+def get_model():
+    """The onboarding chat model"""
+    from langchain_openai import ChatOpenAI
+    from app.core.llm_policy import chat_openai_kwargs
+
+    return ChatOpenAI(
+        model="gpt-4o-mini",
+        temperature=0,
+        stream_usage=True,
+        # same key for every request sharing the static prompt -> routed to a warm prompt cache
+        model_kwargs={"prompt_cache_key": f"onboarding:{ONBOARDING_PROMPT_VERSION}"},
+        callbacks=[usage_tracker],
+        **chat_openai_kwargs("onboarding"),
+    )
+
+@provider("onboarding.checkpointer")
+def get_checkpointer() -> ConversationCheckpointer:
+    """Conversation memory keyed by conversation_id (passed as the LangGraph thread_id)"""
+    return ConversationCheckpointer(
+        path=os.environ.get("ONBOARDING_CHECKPOINT_DB", "onboarding_checkpoints.sqlite3"),
+        cache_size=int(os.environ.get("ONBOARDING_CHECKPOINT_CACHE_SIZE", 1024)),
+    )
+
+def onboarding_prompt(state):
+    """Static system prompt, then the session suffix, then the conversation so far"""
+    from langgraph.config import get_config
+
+    session_id = get_config().get("configurable", {}).get("thread_id")
+    return build_onboarding_system_messages(session_id) + list(state["messages"])
+
+@provider("onboarding.agent")
+def get_onboarding_agent():
+    """The compiled onboarding agent"""
+    from langgraph.prebuilt import create_react_agent
+
+    return create_react_agent(
+        get_model(),
+        tools=ONBOARDING_TOOLS,
+        prompt=onboarding_prompt,
+        response_format=ResponseFormat,
+        checkpointer=get_checkpointer(),
+    )
+
+_LAZY_ATTRIBUTES = {
+    "model": get_model,
+    "checkpointer": get_checkpointer,
+    "onboarding_agent": get_onboarding_agent,
+}
+
+def __getattr__(name: str):
+    # `model`, `checkpointer` and `onboarding_agent` still work as module attributes
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
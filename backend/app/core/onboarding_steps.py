@@ -0,0 +1,101 @@
+"""
+Server-owned STEP MAP progress of an onboarding conversation.
+
+The agent replies with a delta (status, current step, the answers it accepted
+this turn and the next payload); re-emitting every step with its title,
+question, answer and status on each turn made most of its output tokens
+boilerplate. The server folds the deltas of a conversation into an
+``OnboardingProgress`` and assembles the full envelope the frontend expects
+from it, so the response contract is unchanged.
+
+The progress is rebuilt from the conversation's checkpointed history, which
+already holds every delta, so there is no extra state to store or keep in sync.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.envelope import envelope_adapter, load_delta
+from app.models.onboarding import OnboardingDelta, OnboardingEnvelope
+
+# (title, question) per step, in STEP MAP order
+STEP_MAP: Dict[str, Tuple[str, str]] = {
+    "display_name": ("Display name", "What would you like us to call you?"),
+    "birthday": ("Birthday", "When were you born?"),
+    "sex": ("Sex / gender", "What is your sex?"),
+    "height": ("Height", "How tall are you (cm)?"),
+    "training_experience": ("Experience", "How many years have you been training?"),
+    "training_style": ("Training style", "What kind of training do you do?"),
+    "equipment": ("Equipment", "What equipment do you have access to?"),
+    "availability": ("Availability", "When can you train?"),
+    "limitations": ("Limitations", "Any injuries or limitations we should know about?"),
+    "review": ("Review", "Everything look right?"),
+}
+_STEP_ORDER = list(STEP_MAP)
+# steps whose reply refers to earlier answers (the review summary repeats them)
+STATE_DEPENDENT_STEPS = frozenset({"review"})
+
+
+class OnboardingProgress:
+    """Answers collected so far and the step being asked"""
+
+    def __init__(self, answers: Optional[Dict[str, str]] = None, current_step_id: Optional[str] = None):
+        self.answers: Dict[str, str] = dict(answers or {})
+        self.current_step_id = current_step_id
+        self.complete = False
+
+    @classmethod
+    def from_history(cls, messages: Iterable[Any]) -> "OnboardingProgress":
+        """Progress after the agent replies in `messages` (unparseable replies are skipped)"""
+        progress = cls()
+        for message in messages:
+            if getattr(message, "type", None) != "ai":
+                continue
+            delta = load_delta(message.content)
+            if delta is not None:
+                progress.apply(delta)
+        return progress
+
+    def apply(self, delta: OnboardingDelta) -> None:
+        """Record the answers and current step of the agent's latest reply"""
+        self.answers.update(delta.answers)
+        if delta.currentStepId:
+            self.current_step_id = delta.currentStepId
+        self.complete = delta.status == "complete"
+
+    def state(self) -> Dict[str, Any]:
+        """What earlier turns contributed to the next reply (part of the cache key of STATE_DEPENDENT_STEPS)"""
+        return {"currentStepId": self.current_step_id, "answers": self.answers}
+
+    def steps(self) -> List[Dict[str, Any]]:
+        """The envelope's `steps`: every STEP MAP entry with its answer and status"""
+        current = _STEP_ORDER.index(self.current_step_id) if self.current_step_id in STEP_MAP else -1
+        steps = []
+        for index, (step_id, (title, question)) in enumerate(STEP_MAP.items()):
+            if self.complete or index < current or (step_id in self.answers and step_id != self.current_step_id):
+                status = "done"
+            elif step_id == self.current_step_id:
+                status = "current"
+            else:
+                status = "upcoming"
+            steps.append({
+                "id": step_id,
+                "title": title,
+                "stepDisplayName": title,
+                "question": question,
+                "answer": self.answers.get(step_id),
+                "status": status,
+            })
+        return steps
+
+    def envelope(self, delta: OnboardingDelta, session_id: Optional[str]) -> OnboardingEnvelope:
+        """Apply the agent's delta and assemble the full envelope for the client"""
+        self.apply(delta)
+        data = delta.model_dump(mode="json", exclude_unset=True)
+        data.pop("answers", None)
+        data.update(
+            sessionId=session_id,
+            currentStepId=self.current_step_id,
+            steps=self.steps(),
+            paraphrasedAnswers=dict(self.answers),
+        )
+        return envelope_adapter.validate_python(data)
@@ -0,0 +1,86 @@
+"""
+Tools of the onboarding agent (see TOOL DEFINITIONS in ONBOARDING_AGENT_PROMPT).
+
+``create_user_profile`` saves the profile the user confirmed on the review
+card with a single upsert through the profile cache. Its idempotency key is
+derived from the user, the conversation and the profile itself, so a retried
+tool call or a replayed request never writes twice, while a corrected profile
+gets a new key and is saved. ``finish_onboarding`` reads the profile back
+(from the cache, no query after a save) and tells the frontend where to go.
+
+The user comes from the run config (``configurable.user_id``, set by the API
+from the X-User-Id header); without one nothing is written.
+"""
+
+import logging
+import uuid
+from datetime import date
+from typing import Any, Dict, List, Literal, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import tool
+from pydantic import BaseModel, Field
+
+from app.core.response_cache import make_cache_key
+from app.db.models import UserProfile
+from app.db import profiles
+
+logger = logging.getLogger(__name__)
+
+ONBOARDING_REDIRECT_PATH = "/dashboard"
+
+
+class ProfileInput(BaseModel):
+    """The answers the user confirmed on the review card"""
+    display_name: str = Field(description="display name, 2-40 characters")
+    birthday: Optional[date] = Field(None, description="YYYY-MM-DD")
+    sex: Optional[Literal["male", "female", "other"]] = None
+    height_cm: Optional[float] = Field(None, description="height in cm (100-250)")
+    training_experience_years: Optional[int] = Field(None, description="whole years (0-40)")
+    training_style: List[str] = Field(default_factory=list)
+    equipment: List[str] = Field(default_factory=list)
+    availability: Optional[str] = None
+    limitations: Optional[str] = Field(None, description='null if the user answered "None"')
+
+
+def _user_id(config: RunnableConfig) -> Optional[uuid.UUID]:
+    value = (config or {}).get("configurable", {}).get("user_id")
+    try:
+        return uuid.UUID(str(value)) if value else None
+    except ValueError:
+        return None
+
+
+def profile_idempotency_key(user_id: uuid.UUID, conversation_id: Optional[str], profile: ProfileInput) -> str:
+    """Same user, conversation and profile -> same key"""
+    return make_cache_key("create_user_profile", str(user_id), conversation_id, profile.model_dump(mode="json"))
+
+
+@tool
+async def create_user_profile(profile: ProfileInput, config: RunnableConfig) -> Dict[str, Any]:
+    """Save the user's profile. Call once, after the user confirmed the review card."""
+    user_id = _user_id(config)
+    if user_id is None:
+        return {"success": False, "error": "The user is not signed in, so the profile cannot be saved."}
+
+    conversation_id = config.get("configurable", {}).get("thread_id")
+    key = profile_idempotency_key(user_id, conversation_id, profile)
+    try:
+        await profiles.profile_cache.save(UserProfile(user_id=user_id, **profile.model_dump()), key)
+    except Exception:
+        logger.exception("profile_save_failed user=%s conversation=%s", user_id, conversation_id)
+        return {"success": False, "error": "The profile could not be saved. Try again."}
+    return {"success": True}
+
+
+@tool
+async def finish_onboarding(config: RunnableConfig) -> Dict[str, Any]:
+    """Finish onboarding after create_user_profile succeeded; returns where the app goes next."""
+    user_id = _user_id(config)
+    profile = await profiles.profile_cache.get(user_id) if user_id else None
+    if profile is None:
+        return {"success": False, "error": "No saved profile. Call create_user_profile first."}
+    return {"redirect_path": ONBOARDING_REDIRECT_PATH}
+
+
+ONBOARDING_TOOLS = [create_user_profile, finish_onboarding]
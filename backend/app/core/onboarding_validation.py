@@ -0,0 +1,155 @@
+"""
+Local validation of onboarding answers, mirroring the STEP MAP rules in
+ONBOARDING_AGENT_PROMPT.
+
+The API runs these checks before calling the onboarding agent. An answer that
+definitely breaks a rule gets the `validationError` envelope straight away,
+without an LLM round trip. Answers that pass - or that can't be judged locally
+(e.g. a birthday written as free text) - go to the agent as before, which
+still applies the same rules.
+"""
+
+import re
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+STEP_IDS: List[str] = [
+    "display_name",
+    "birthday",
+    "sex",
+    "height",
+    "training_experience",
+    "training_style",
+    "equipment",
+    "availability",
+    "limitations",
+    "review",
+]
+
+SEX_OPTIONS = ("male", "female", "other")
+MIN_AGE = 13
+
+_EMOJI = re.compile(
+    "[\U0001F000-\U0001FAFF\U00002600-\U000027BF\U0001F1E6-\U0001F1FF\U0000FE0F\U0000200D]"
+)
+_NUMBER = re.compile(r"-?\d+(?:[.,]\d+)?")
+_IMPERIAL = re.compile(r"\d\s*(?:ft|feet|foot|inch|inches|in\b|'|\"|′|″)", re.IGNORECASE)
+_DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%d %B %Y", "%d %b %Y", "%B %d, %Y", "%b %d, %Y", "%B %d %Y")
+
+
+def _numbers(answer: str) -> List[float]:
+    return [float(n.replace(",", ".")) for n in _NUMBER.findall(answer)]
+
+
+def _parse_date(answer: str) -> Optional[date]:
+    text = answer.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _age_on(birthday: date, today: date) -> int:
+    return today.year - birthday.year - ((today.month, today.day) < (birthday.month, birthday.day))
+
+
+def validate_display_name(answer: str, today: date) -> Optional[str]:
+    name = answer.strip()
+    if not 2 <= len(name) <= 40:
+        return "Please enter a display name between 2 and 40 characters."
+    if _EMOJI.search(name):
+        return "Please enter a display name without emoji."
+    return None
+
+
+def validate_birthday(answer: str, today: date) -> Optional[str]:
+    birthday = _parse_date(answer)
+    if birthday is None:
+        # free-form dates are left to the agent
+        return None
+    if birthday > today:
+        return "Your birthday can't be in the future. Please enter a valid date."
+    if _age_on(birthday, today) < MIN_AGE:
+        return f"You need to be at least {MIN_AGE} years old to use the app."
+    return None
+
+
+def validate_sex(answer: str, today: date) -> Optional[str]:
+    if answer.strip().lower() not in SEX_OPTIONS:
+        return "Please choose one of: male, female or other."
+    return None
+
+
+def validate_height(answer: str, today: date) -> Optional[str]:
+    if _IMPERIAL.search(answer):
+        # feet/inches need conversion, leave it to the agent
+        return None
+    numbers = _numbers(answer)
+    if not numbers:
+        return "Please enter your height in cm as a number (100–250)."
+    if len(numbers) == 1 and not 100 <= numbers[0] <= 250:
+        return f"{answer.strip()} seems unlikely. Please enter a height between 100–250 cm."
+    return None
+
+
+def validate_training_experience(answer: str, today: date) -> Optional[str]:
+    numbers = _numbers(answer)
+    if len(numbers) != 1:
+        return None
+    years = numbers[0]
+    if years != int(years):
+        return "Please enter your training experience in whole years (0–40)."
+    if not 0 <= years <= 40:
+        return "Please enter your training experience in whole years between 0 and 40."
+    return None
+
+
+def validate_training_style(answer: str, today: date) -> Optional[str]:
+    styles = [s.strip() for s in answer.split(",")]
+    if any(len(s) > 50 for s in styles):
+        return "Please keep each training style to 50 characters or fewer."
+    return None
+
+
+def validate_availability(answer: str, today: date) -> Optional[str]:
+    if not 10 <= len(answer.strip()) <= 120:
+        return "Please describe your availability in 10 to 120 characters."
+    return None
+
+
+def validate_limitations(answer: str, today: date) -> Optional[str]:
+    if len(answer.strip()) > 200:
+        return "Please keep limitations to 200 characters or fewer (or answer “None”)."
+    return None
+
+
+VALIDATORS: Dict[str, Callable[[str, date], Optional[str]]] = {
+    "display_name": validate_display_name,
+    "birthday": validate_birthday,
+    "sex": validate_sex,
+    "height": validate_height,
+    "training_experience": validate_training_experience,
+    "training_style": validate_training_style,
+    "availability": validate_availability,
+    "limitations": validate_limitations,
+}
+
+
+def validate_answer(step_id: Optional[str], answer: str, today: Optional[date] = None) -> Optional[str]:
+    """Correction message if `answer` definitely breaks the rules of `step_id`, else None"""
+    validator = VALIDATORS.get(step_id or "")
+    if validator is None:
+        return None
+    return validator(answer, today or date.today())
+
+
+def validation_error_envelope(session_id: Optional[str], step_id: str, message: str) -> Dict[str, Any]:
+    """The `validationError` envelope the agent would have produced"""
+    return {
+        "sessionId": session_id,
+        "status": "validationError",
+        "currentStepId": step_id,
+        "payload": {"fieldId": step_id, "message": message},
+    }
@@ -0,0 +1,79 @@
+"""
+Lazy, memoized providers for expensive process-wide objects.
+
+Chat model clients, compiled agents and checkpointers used to be built when
+their module was imported. That made every cold start (autoscaled or
+serverless instances, test runs, the CLI) pay for importing and constructing
+all of them, and importing the app failed outright when OPENAI_API_KEY was
+unset. A provider builds its object on first use instead, once per process
+(thread-safe), and keeps the heavy imports inside the factory.
+
+Providers register themselves by name, so the FastAPI lifespan can optionally
+build them all up front (``warm_up``, enabled with ``APP_WARM_UP=1``) for
+deployments that prefer a slower start over a slow first request.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Generic, Iterable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_registry: Dict[str, "Provider"] = {}
+
+
+class Provider(Generic[T]):
+    """Builds a value with `factory` on first call and returns the same value afterwards"""
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self.factory = factory
+        self._value: Optional[T] = None
+        self._initialized = False
+        self._lock = threading.Lock()
+        self.__doc__ = factory.__doc__
+
+    @property
+    def initialized(self) -> bool:
+        return self._initialized
+
+    def __call__(self) -> T:
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    self._value = self.factory()
+                    self._initialized = True
+        return self._value
+
+    def reset(self) -> None:
+        """Forget the value; the next call builds a new one"""
+        with self._lock:
+            self._value = None
+            self._initialized = False
+
+
+def provider(name: str) -> Callable[[Callable[[], T]], Provider[T]]:
+    """Decorator turning a zero-argument factory into a registered Provider"""
+    def register(factory: Callable[[], T]) -> Provider[T]:
+        instance = Provider(name, factory)
+        _registry[name] = instance
+        return instance
+    return register
+
+
+def registered() -> Dict[str, Provider]:
+    return dict(_registry)
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Build the named providers (default: all registered); returns seconds spent per provider"""
+    timings = {}
+    for name in names or list(_registry):
+        start = time.perf_counter()
+        _registry[name]()
+        timings[name] = time.perf_counter() - start
+    logger.info("warm_up %s", " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in timings.items()))
+    return timings
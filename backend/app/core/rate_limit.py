@@ -0,0 +1,208 @@
+"""
+Per-client token-bucket admission control for LLM-backed endpoints.
+
+The ConcurrencyLimiter bounds how many LLM calls run at once; it does not stop
+one client from running calls back to back as fast as they finish, which is
+how a runaway frontend loop eats the provider's rate limit for everyone. A
+RateLimiter gives every client (user id, else IP) two token buckets:
+
+- requests: ``request_burst`` calls at once, refilled at ``requests_per_minute``;
+- LLM tokens: admission needs a positive balance, and the prompt + completion
+  tokens a call actually used are charged after it (``charge_tokens``). The
+  balance may go negative, so a client that just made an expensive call waits
+  for the bucket to refill before the next one.
+
+A client whose buckets refill within ``max_wait`` seconds waits instead of
+being rejected, with at most ``max_queued_per_client`` waiting calls, so a
+burst from one client queues behind its own budget without holding a place
+that others could use. Anything longer is rejected with RateLimitExceeded and
+a Retry-After estimate for the API to answer 429.
+
+Bucket state lives in a RateLimitBackend. InMemoryRateLimitBackend keeps it in
+this process (each worker enforces the limits on its own); a multi-worker
+deployment plugs in a shared store with the same two methods, e.g. Redis with
+the refill-and-take step in a Lua script so it stays atomic.
+"""
+
+import asyncio
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.metrics import Counter, REGISTRY, current_timings
+
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total",
+    "Rate limiter admissions by limiter and outcome (admitted, queued, rejected).",
+    ("limiter", "outcome"),
+)
+RATE_LIMIT_TOKENS = Counter(
+    "rate_limit_llm_tokens_total",
+    "LLM tokens charged to client token buckets, by limiter.",
+    ("limiter",),
+)
+REGISTRY.extend([RATE_LIMIT_DECISIONS, RATE_LIMIT_TOKENS])
+
+_EPSILON = 1e-3
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a client is over its request or LLM token budget"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RateLimitBackend(ABC):
+    """Stores token buckets; `capacity` is the burst size and `rate` the refill per second"""
+
+    @abstractmethod
+    async def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        """Take `cost` from the bucket and return 0, or return the seconds until it could be taken"""
+
+    @abstractmethod
+    async def charge(self, key: str, amount: float, capacity: float, rate: float) -> None:
+        """Take `amount` from the bucket unconditionally (the balance may go negative)"""
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Buckets in a bounded dict in this process"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> (balance, time of last refill)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def _refilled(self, key: str, capacity: float, rate: float) -> float:
+        now = time.monotonic()
+        balance, updated = self._buckets.get(key, (capacity, now))
+        return min(capacity, balance + (now - updated) * rate)
+
+    def _store(self, key: str, balance: float) -> None:
+        self._buckets[key] = (balance, time.monotonic())
+        self._buckets.move_to_end(key)
+        # the least recently used bucket has had the longest to refill
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    async def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        balance = self._refilled(key, capacity, rate)
+        # a zero-cost take still needs a positive balance (charged debt paid off)
+        needed = cost if cost > 0 else _EPSILON
+        if balance >= needed:
+            self._store(key, balance - cost)
+            return 0.0
+        self._store(key, balance)
+        return (needed - balance) / rate
+
+    async def charge(self, key: str, amount: float, capacity: float, rate: float) -> None:
+        self._store(key, self._refilled(key, capacity, rate) - amount)
+
+
+def request_llm_tokens() -> int:
+    """Prompt + completion tokens used so far by the current HTTP request"""
+    timings = current_timings()
+    return timings.prompt_tokens + timings.completion_tokens if timings else 0
+
+
+class RateLimiter:
+    """Per-client request and LLM token buckets with a short, per-client bounded wait"""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 30,
+        request_burst: float = 10,
+        tokens_per_minute: float = 60_000,
+        token_burst: Optional[float] = None,
+        max_wait: float = 2.0,
+        max_queued_per_client: int = 1,
+        backend: Optional[RateLimitBackend] = None,
+    ):
+        self.name = name
+        self.request_rate = requests_per_minute / 60
+        self.request_burst = request_burst
+        self.token_rate = tokens_per_minute / 60
+        self.token_burst = token_burst if token_burst is not None else tokens_per_minute
+        self.max_wait = max_wait
+        self.max_queued_per_client = max_queued_per_client
+        self.backend = backend or InMemoryRateLimitBackend()
+
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected = 0
+        self._queued: Dict[str, int] = {}
+
+    @property
+    def queued(self) -> int:
+        return sum(self._queued.values())
+
+    async def _try(self, client_id: str) -> Tuple[float, str]:
+        """Seconds until `client_id` can be admitted (0: admitted now) and why not"""
+        # the token bucket is only checked, so a request rejected on it takes nothing
+        wait = await self.backend.take(f"{self.name}:tokens:{client_id}", 0, self.token_burst, self.token_rate)
+        if wait > 0:
+            return wait, "LLM token budget exceeded"
+        wait = await self.backend.take(f"{self.name}:requests:{client_id}", 1, self.request_burst, self.request_rate)
+        return wait, "Request rate limit exceeded"
+
+    def _reject(self, reason: str, wait: float) -> RateLimitExceeded:
+        self.rejected += 1
+        RATE_LIMIT_DECISIONS.inc(1, self.name, "rejected")
+        return RateLimitExceeded(reason, max(1, math.ceil(wait)))
+
+    async def admit(self, client_id: str) -> None:
+        """Admit one call for `client_id`, waiting briefly if its buckets refill soon, or raise RateLimitExceeded"""
+        wait, reason = await self._try(client_id)
+        if wait == 0:
+            self._admit()
+            return
+        if wait > self.max_wait:
+            raise self._reject(reason, wait)
+        if self._queued.get(client_id, 0) >= self.max_queued_per_client:
+            raise self._reject(reason, wait)
+
+        self._queued[client_id] = self._queued.get(client_id, 0) + 1
+        self.queued_total += 1
+        RATE_LIMIT_DECISIONS.inc(1, self.name, "queued")
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while wait > 0:
+                if time.monotonic() + wait > deadline:
+                    raise self._reject(reason, wait)
+                await asyncio.sleep(wait)
+                wait, reason = await self._try(client_id)
+        finally:
+            remaining = self._queued.get(client_id, 0) - 1
+            if remaining > 0:
+                self._queued[client_id] = remaining
+            else:
+                self._queued.pop(client_id, None)
+        self._admit()
+
+    def _admit(self) -> None:
+        self.admitted += 1
+        RATE_LIMIT_DECISIONS.inc(1, self.name, "admitted")
+
+    async def charge_tokens(self, client_id: str, tokens: int) -> None:
+        """Charge the LLM tokens an admitted call used to `client_id`'s token bucket"""
+        if tokens <= 0:
+            return
+        RATE_LIMIT_TOKENS.inc(tokens, self.name)
+        await self.backend.charge(f"{self.name}:tokens:{client_id}", tokens, self.token_burst, self.token_rate)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "queued_total": self.queued_total,
+            "rejected": self.rejected,
+            "requests_per_minute": self.request_rate * 60,
+            "request_burst": self.request_burst,
+            "tokens_per_minute": self.token_rate * 60,
+            "token_burst": self.token_burst,
+        }
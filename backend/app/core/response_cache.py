@@ -0,0 +1,136 @@
+"""
+In-process cache of agent responses.
+
+Onboarding turns repeat a lot across users: the same question answered the
+same way produces the same envelope. ResponseCache keeps those responses in an
+LRU bounded by entry count and total size, with a TTL per entry, so a repeated
+turn skips the LLM call entirely.
+
+Entries belong to a version (the prompt hash). When the version changes every
+entry is dropped, so a prompt edit never serves responses from the old prompt.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_answer(answer: str) -> str:
+    """Case- and whitespace-insensitive form of a user answer"""
+    return _WHITESPACE.sub(" ", answer).strip().casefold()
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Stable hash of the JSON-serialisable key parts"""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of response strings, bounded by entries and bytes"""
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl: float = 3600.0,
+        max_bytes: int = 8 * 1024 * 1024,
+        max_entry_bytes: int = 64 * 1024,
+        version: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.version = version
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._bytes = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ensure_version(self, version: str) -> None:
+        """Drop every entry if `version` differs from the one they were cached for"""
+        with self._lock:
+            if version == self.version:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+            self.version = version
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> bool:
+        """Cache `value`; returns False if it is too large to keep"""
+        size = len(value.encode("utf-8"))
+        if size > self.max_entry_bytes or self.max_entries <= 0:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value.encode("utf-8"))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,51 @@
+"""
+Fast JSON encoding for API responses.
+
+Uses orjson when it is installed (several times faster than the standard
+library on large nested payloads such as onboarding envelopes) and falls back
+to ``json`` otherwise. Pydantic models are encoded through ``model_dump``.
+"""
+
+import json
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.core.metrics import TimedJSONResponse, serialization_timer
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _orjson_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_default(value: Any) -> Any:
+    # orjson encodes UUIDs and datetimes natively; json needs them as strings
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """UTF-8 JSON for `content` (dicts, lists, Pydantic models, UUIDs, datetimes)"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_orjson_default)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_str(content: Any) -> str:
+    return dumps(content).decode("utf-8")
+
+
+class ORJSONResponse(TimedJSONResponse):
+    """JSON response rendered with orjson (counted as serialization time)"""
+
+    def render(self, content: Any) -> bytes:
+        with serialization_timer():
+            return dumps(content)
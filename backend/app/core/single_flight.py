@@ -0,0 +1,142 @@
+"""
+Single-flight coalescing of duplicate requests.
+
+A double click, a React effect that runs twice or a client retrying after a
+timeout sends the same turn again while the first is still running. Running
+both doubles the LLM cost and races two agent runs on one conversation's
+checkpoint. SingleFlight runs the first call for a key (the leader) and
+makes concurrent calls with the same key await its result. With ``replay``,
+a result that completed within the last ``window`` seconds is also returned
+to late duplicates; that is only safe for keys that name one specific turn
+(a client-chosen idempotency key), not for keys that merely look alike.
+
+Results are strings (the serialized response), so a replay is byte-identical
+to what the leader's caller got. A failure is passed to the callers waiting at
+the time but is not replayed: the next duplicate runs again.
+
+``do`` covers the common case. A streaming leader that produces its result
+partway through a response uses ``start`` and resolves the returned future
+itself; its duplicates ``join`` the future and answer once it is resolved.
+
+``coalesce`` is the in-flight dedupe on its own, for callers that keep their
+own record of completed results (e.g. ProfileCache).
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.core.metrics import Counter, REGISTRY
+from app.core.response_cache import ResponseCache
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "single_flight_calls_total",
+    "Calls through a single-flight group by outcome (leader, coalesced, replayed).",
+    ("group", "outcome"),
+)
+REGISTRY.append(SINGLE_FLIGHT_CALLS)
+
+
+def coalesce(
+    inflight: Dict[str, "asyncio.Future[T]"], key: str, call: Callable[[], Awaitable[T]]
+) -> Tuple["asyncio.Future[T]", bool]:
+    """The in-flight future for `key` and True, or `call()` started as a task under `key` and False
+
+    Await the future through ``asyncio.shield``: a caller giving up must not
+    cancel a call others wait on.
+    """
+    future = inflight.get(key)
+    if future is not None:
+        return future, True
+    task = asyncio.ensure_future(call())
+    inflight[key] = task
+    task.add_done_callback(lambda done: _forget(inflight, key, done))
+    return task, False
+
+
+def _forget(inflight: Dict[str, "asyncio.Future[Any]"], key: str, future: "asyncio.Future[Any]") -> None:
+    if inflight.get(key) is future:
+        del inflight[key]
+    # marks a failure as seen when every caller has given up on it
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key and optionally replays recent results"""
+
+    def __init__(self, name: str, window: float = 10.0, max_entries: int = 1024):
+        self.name = name
+        self._inflight: Dict[str, "asyncio.Future[str]"] = {}
+        # recent results; a window of 0 turns replay off
+        self._recent = ResponseCache(max_entries=max_entries if window > 0 else 0, ttl=window)
+        self.leaders = 0
+        self.coalesced = 0
+        self.replayed = 0
+
+    def _count(self, outcome: str) -> None:
+        if outcome == "leader":
+            self.leaders += 1
+        elif outcome == "coalesced":
+            self.coalesced += 1
+        else:
+            self.replayed += 1
+        SINGLE_FLIGHT_CALLS.inc(1, self.name, outcome)
+
+    def _replay(self, key: str) -> Optional[str]:
+        recent = self._recent.get(key)
+        if recent is not None:
+            self._count("replayed")
+        return recent
+
+    def _remember(self, key: str, future: "asyncio.Future[str]") -> None:
+        if not future.cancelled() and future.exception() is None:
+            self._recent.set(key, future.result())
+
+    def join(self, key: str, replay: bool = False) -> Optional["asyncio.Future[str]"]:
+        """The in-flight (or, with `replay`, recently completed) result for `key`; None: the caller leads"""
+        recent = self._replay(key) if replay else None
+        if recent is not None:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(recent)
+            return future
+        future = self._inflight.get(key)
+        if future is not None:
+            self._count("coalesced")
+        return future
+
+    def start(self, key: str, replay: bool = False) -> "asyncio.Future[str]":
+        """Become the leader for `key`; resolve the returned future with the result (or an exception)"""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        future.add_done_callback(lambda done: _forget(self._inflight, key, done))
+        if replay:
+            future.add_done_callback(lambda done: self._remember(key, done))
+        self._count("leader")
+        return future
+
+    async def do(self, key: str, call: Callable[[], Awaitable[str]], replay: bool = False) -> str:
+        """Result of `call()`, shared with every concurrent (and, with `replay`, recent) call for `key`"""
+        recent = self._replay(key) if replay else None
+        if recent is not None:
+            return recent
+        future, joined = coalesce(self._inflight, key, call)
+        if joined:
+            self._count("coalesced")
+        else:
+            self._count("leader")
+            if replay:
+                future.add_done_callback(lambda done: self._remember(key, done))
+        return await asyncio.shield(future)
+
+    def clear(self) -> None:
+        self._recent.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "replayed": self.replayed,
+        }
@@ -0,0 +1,82 @@
+"""
+Per-request LLM token accounting.
+
+TokenUsageTracker is a LangChain callback handler: attach it to a chat model
+and every completed call is logged with its prompt tokens split into cached
+(served from the provider's prompt cache) and uncached, plus completion tokens.
+Running totals are kept for the API to report.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+logger = logging.getLogger(__name__)
+
+
+class TokenUsageTracker(BaseCallbackHandler):
+    """Callback handler recording prompt / cached / completion tokens per call"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self._conversations: Dict[UUID, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs) -> None:
+        # remember which conversation this call belongs to for the log line
+        self._conversations[run_id] = (metadata or {}).get("thread_id")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs) -> None:
+        conversation_id = self._conversations.pop(run_id, None)
+        usage = _usage_from_result(response)
+        if usage is None:
+            return
+
+        prompt_tokens = usage.get("input_tokens", 0)
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        completion_tokens = usage.get("output_tokens", 0)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_prompt_tokens += cached
+            self.completion_tokens += completion_tokens
+
+        logger.info(
+            "llm_usage agent=%s conversation=%s prompt_tokens=%d cached_prompt_tokens=%d "
+            "uncached_prompt_tokens=%d completion_tokens=%d",
+            self.name, conversation_id, prompt_tokens, cached, prompt_tokens - cached, completion_tokens,
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._conversations.pop(run_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_prompt_tokens": self.cached_prompt_tokens,
+                "uncached_prompt_tokens": self.prompt_tokens - self.cached_prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cache_hit_ratio": (
+                    self.cached_prompt_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+                ),
+            }
+
+
+def _usage_from_result(response: LLMResult) -> Optional[Dict[str, Any]]:
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                return usage
+    return None
@@ -0,0 +1,57 @@
+"""
+Token counting helpers.
+
+Uses tiktoken when its encoding files are available and falls back to the
+usual ~4 characters per token estimate otherwise (e.g. offline machines).
+"""
+
+import math
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+# fixed per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str) -> Optional[Any]:
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Number of tokens `text` encodes to for `model`"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages: Iterable[Any], model: str = "gpt-4o") -> int:
+    """Prompt tokens for a list of chat messages"""
+    total = 0
+    for message in messages:
+        content = message.content if hasattr(message, "content") else str(message)
+        if not isinstance(content, str):
+            content = str(content)
+        total += count_tokens(content, model) + MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """`text` cut down to at most `max_tokens` tokens"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[: max_tokens * 4]
+    return encoding.decode(encoding.encode(text)[:max_tokens])
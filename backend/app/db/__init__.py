@@ -5,29 +5,67 @@ This package provides:
 - SQL schema definitions
 - Pydantic models for chat sessions and messages
 - Client functions for interacting with the database
+- Process-wide pooled Supabase clients (sync and async)
+- A write-behind buffer that batches message inserts
+- A read-through cache of chat sessions, invalidated by writes
 """
 
-from app.db.models import ChatSession, Message
+from app.db.models import ChatSession, ChatSessionPage, ChatSessionSummary, ChatSessionSummaryPage, Message, MessagePage
+from app.db.pool import (
+    init_supabase_client,
+    close_supabase_client,
+    init_async_supabase_client,
+    close_async_supabase_client,
+)
 from app.db.client import (
     get_supabase_client,
+    get_async_supabase_client,
     create_chat_session,
     get_chat_session,
     get_user_chat_sessions,
+    get_user_chat_sessions_page,
+    get_user_chat_session_summaries_page,
     update_chat_session,
     create_message,
+    create_messages,
     get_session_messages,
+    get_session_messages_page,
+    get_latest_messages,
     delete_chat_session
 )
+from app.db.write_behind import MessageWriteBuffer, get_message_buffer, close_message_buffer
+from app.db.session_cache import SessionCache, InvalidationBus, LocalInvalidationBus, session_cache
 
 __all__ = [
     'ChatSession',
+    'ChatSessionPage',
+    'ChatSessionSummary',
+    'ChatSessionSummaryPage',
     'Message',
+    'MessagePage',
     'get_supabase_client',
+    'init_supabase_client',
+    'close_supabase_client',
+    'get_async_supabase_client',
+    'init_async_supabase_client',
+    'close_async_supabase_client',
     'create_chat_session',
     'get_chat_session',
     'get_user_chat_sessions',
+    'get_user_chat_sessions_page',
+    'get_user_chat_session_summaries_page',
     'update_chat_session',
     'create_message',
+    'create_messages',
     'get_session_messages',
+    'get_session_messages_page',
+    'get_latest_messages',
     'delete_chat_session',
+    'MessageWriteBuffer',
+    'get_message_buffer',
+    'close_message_buffer',
+    'SessionCache',
+    'InvalidationBus',
+    'LocalInvalidationBus',
+    'session_cache',
 ]
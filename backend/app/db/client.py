@@ -1,22 +1,71 @@
-import os
-from typing import Dict, List, Any, Optional
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
+import base64
 import uuid
-from supabase import create_client, Client
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from app.db.models import ChatSession, Message
+from app.db.models import (
+    ChatSession,
+    ChatSessionPage,
+    ChatSessionSummary,
+    ChatSessionSummaryPage,
+    Message,
+    MessagePage,
+    UserProfile,
+)
+from app.db.pool import get_pooled_client, get_async_pooled_client
+from app.db.session_cache import session_cache
+from app.core.metrics import db_timed
 
-# Initialize Supabase client
-def get_supabase_client() -> Client:
-    """Get or create Supabase client"""
-    url: str = os.environ.get("SUPABASE_URL")
-    key: str = os.environ.get("SUPABASE_KEY")
-    return create_client(url, key)
+if TYPE_CHECKING:
+    from supabase import Client, AsyncClient
+
+# Explicit column lists, so reads only transfer what the models need
+SESSION_COLUMNS = "id,user_id,title,created_at,last_activity_at"
+SESSION_SUMMARY_COLUMNS = SESSION_COLUMNS + ",message_count,last_message_preview,last_message_role,last_message_at"
+MESSAGE_COLUMNS = "id,session_id,role,content,created_at"
+PROFILE_COLUMNS = (
+    "user_id,display_name,birthday,sex,height_cm,training_experience_years,"
+    "training_style,equipment,availability,limitations,idempotency_key,created_at,updated_at"
+)
+
+class ChatSessionNotFound(Exception):
+    """Raised when a chat session id does not exist"""
+
+# Shared Supabase clients
+def get_supabase_client() -> "Client":
+    """Get the process-wide pooled (sync) Supabase client"""
+    return get_pooled_client()
+
+async def get_async_supabase_client() -> "AsyncClient":
+    """Get the process-wide pooled async Supabase client"""
+    return await get_async_pooled_client()
+
+# Keyset cursors: an opaque token for the (created_at, id) of the last row of a
+# page. The next page is everything strictly before it in that order, which
+# stays an index range scan however deep the client pages, unlike OFFSET.
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Cursor pointing at `row` (a raw result row)"""
+    raw = f"{row['created_at']}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """(created_at, id) from a cursor; ValueError if it is malformed"""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return created_at, str(uuid.UUID(row_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _before_filter(cursor: str) -> str:
+    """PostgREST `or` filter for rows before the cursor in (created_at, id) desc order"""
+    created_at, row_id = decode_cursor(cursor)
+    return f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})'
 
 # Chat Sessions operations
+@db_timed
 async def create_chat_session(user_id: uuid.UUID, title: str, metadata: Optional[Dict[str, Any]] = None) -> ChatSession:
     """Create a new chat session"""
-    supabase = get_supabase_client()
+    supabase = await get_async_supabase_client()
     
     session_data = {
         "user_id": str(user_id),
@@ -25,90 +74,239 @@ async def create_chat_session(user_id: uuid.UUID, title: str, metadata: Optional
         "last_activity_at": datetime.now().isoformat()
     }
     
-    result = supabase.table("chat_sessions").insert(session_data).execute()
+    result = await supabase.table("chat_sessions").insert(session_data).execute()
     
     if len(result.data) > 0:
-        return ChatSession(**result.data[0])
+        session = ChatSession(**result.data[0])
+        session_cache.invalidate_user(user_id)
+        session_cache.set_session(session)
+        return session
     raise Exception("Failed to create chat session")
 
-async def get_chat_session(session_id: uuid.UUID) -> ChatSession:
-    """Get chat session by id"""
-    supabase = get_supabase_client()
+# Reads of sessions go through session_cache (app.db.session_cache); a hit
+# costs no round trip, so only the fetches are timed as DB calls.
+@db_timed
+async def _fetch_chat_session(session_id: uuid.UUID) -> ChatSession:
+    supabase = await get_async_supabase_client()
     
-    result = supabase.table("chat_sessions").select("*").eq("id", str(session_id)).execute()
+    result = await supabase.table("chat_sessions").select(SESSION_COLUMNS).eq("id", str(session_id)).execute()
     
     if len(result.data) > 0:
         return ChatSession(**result.data[0])
-    raise Exception(f"Chat session with id {session_id} not found")
+    raise ChatSessionNotFound(f"Chat session with id {session_id} not found")
 
-async def get_user_chat_sessions(user_id: uuid.UUID) -> List[ChatSession]:
-    """Get all chat sessions for a user"""
-    supabase = get_supabase_client()
+async def get_chat_session(session_id: uuid.UUID) -> ChatSession:
+    """Get chat session by id"""
+    cached = session_cache.get_session(session_id)
+    if cached is not None:
+        return cached
+    generation = session_cache.generation()
+    session = await _fetch_chat_session(session_id)
+    session_cache.set_session(session, generation)
+    return session
+
+@db_timed
+async def _fetch_user_chat_sessions(user_id: uuid.UUID) -> List[ChatSession]:
+    supabase = await get_async_supabase_client()
     
-    result = supabase.table("chat_sessions") \
-        .select("*") \
+    result = await supabase.table("chat_sessions") \
+        .select(SESSION_COLUMNS) \
         .eq("user_id", str(user_id)) \
         .order("created_at", desc=True) \
         .execute()
     
     return [ChatSession(**session) for session in result.data]
 
+async def get_user_chat_sessions(user_id: uuid.UUID) -> List[ChatSession]:
+    """Get all chat sessions for a user"""
+    cached = session_cache.get_user_sessions(user_id)
+    if cached is not None:
+        return cached
+    generation = session_cache.generation()
+    sessions = await _fetch_user_chat_sessions(user_id)
+    session_cache.set_user_sessions(user_id, sessions, generation)
+    return sessions
+
+async def _user_sessions_page(
+    user_id: uuid.UUID, columns: str, limit: int, before: Optional[str]
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Rows of one page of a user's sessions, newest first, and the cursor of the next page"""
+    supabase = await get_async_supabase_client()
+    
+    query = supabase.table("chat_sessions") \
+        .select(columns) \
+        .eq("user_id", str(user_id))
+    if before:
+        query = query.or_(_before_filter(before))
+    # one extra row tells us whether there is another page
+    result = await query \
+        .order("created_at", desc=True) \
+        .order("id", desc=True) \
+        .limit(limit + 1) \
+        .execute()
+    
+    rows = result.data[:limit]
+    next_cursor = encode_cursor(rows[-1]) if len(result.data) > limit else None
+    return rows, next_cursor
+
+@db_timed
+async def get_user_chat_sessions_page(user_id: uuid.UUID, limit: int = 20, before: Optional[str] = None) -> ChatSessionPage:
+    """Get a page of a user's chat sessions, newest first"""
+    rows, next_cursor = await _user_sessions_page(user_id, SESSION_COLUMNS, limit, before)
+    return ChatSessionPage(sessions=[ChatSession(**row) for row in rows], next_cursor=next_cursor)
+
+@db_timed
+async def get_user_chat_session_summaries_page(
+    user_id: uuid.UUID, limit: int = 20, before: Optional[str] = None
+) -> ChatSessionSummaryPage:
+    """Get a page of a user's chat sessions with message count and last-message preview, in one query"""
+    # the summary columns are maintained by append_messages (schema.sql)
+    rows, next_cursor = await _user_sessions_page(user_id, SESSION_SUMMARY_COLUMNS, limit, before)
+    return ChatSessionSummaryPage(sessions=[ChatSessionSummary(**row) for row in rows], next_cursor=next_cursor)
+
+@db_timed
 async def update_chat_session(session_id: uuid.UUID, updates: Dict[str, Any]) -> ChatSession:
     """Update a chat session"""
-    supabase = get_supabase_client()
+    supabase = await get_async_supabase_client()
     
     updates["last_activity_at"] = datetime.now().isoformat()
     
-    result = supabase.table("chat_sessions") \
-        .update(updates) \
-        .eq("id", str(session_id)) \
-        .execute()
+    try:
+        result = await supabase.table("chat_sessions") \
+            .update(updates) \
+            .eq("id", str(session_id)) \
+            .execute()
+    finally:
+        # even a failed call may have reached the database
+        session_cache.invalidate_session(session_id)
     
     if len(result.data) > 0:
-        return ChatSession(**result.data[0])
+        session = ChatSession(**result.data[0])
+        session_cache.invalidate_user(session.user_id)
+        return session
     raise Exception(f"Failed to update chat session with id {session_id}")
 
 # Messages operations
 async def create_message(session_id: uuid.UUID, role: str, content: str) -> Message:
     """Create a new message"""
-    supabase = get_supabase_client()
-    
-    # Validate role to match database constraint
-    if role not in ['user', 'assistant']:
-        raise ValueError("Role must be either 'user' or 'assistant'")
-        
-    message_data = {
-        "session_id": str(session_id),
-        "role": role,
-        "content": content,
-        "created_at": datetime.now().isoformat()
-    }
-    
-    result = supabase.table("messages").insert(message_data).execute()
+    # through append_messages, so the session's summary columns stay current
+    messages = await create_messages(session_id, [{"role": role, "content": content}])
     
-    if len(result.data) > 0:
-        return Message(**result.data[0])
+    if len(messages) > 0:
+        return messages[0]
     raise Exception("Failed to create message")
 
+@db_timed
+async def create_messages(session_id: uuid.UUID, messages: List[Dict[str, Any]]) -> List[Message]:
+    """Insert several messages and update the session's activity and summary in one round trip"""
+    supabase = await get_async_supabase_client()
+    
+    now = datetime.now()
+    rows = []
+    for i, message in enumerate(messages):
+        if message["role"] not in ['user', 'assistant']:
+            raise ValueError("Role must be either 'user' or 'assistant'")
+        rows.append({
+            "id": str(message.get("id") or uuid.uuid4()),
+            "role": message["role"],
+            "content": message["content"],
+            # distinct timestamps keep the batch in order (user before assistant)
+            "created_at": str(message.get("created_at") or (now + timedelta(microseconds=i)).isoformat()),
+        })
+    
+    # append_messages (schema.sql) runs both statements in one transaction
+    try:
+        result = await supabase.rpc("append_messages", {
+            "p_session_id": str(session_id),
+            "p_messages": rows,
+        }).execute()
+    finally:
+        # append_messages bumps the session's last_activity_at and summary
+        session_cache.invalidate_session(session_id)
+    
+    return [Message(**message) for message in result.data]
+
+@db_timed
 async def get_session_messages(session_id: uuid.UUID) -> List[Message]:
     """Get all messages for a chat session"""
-    supabase = get_supabase_client()
+    supabase = await get_async_supabase_client()
     
-    result = supabase.table("messages") \
-        .select("*") \
+    result = await supabase.table("messages") \
+        .select(MESSAGE_COLUMNS) \
         .eq("session_id", str(session_id)) \
         .order("created_at") \
+        .order("id") \
         .execute()
     
     return [Message(**message) for message in result.data]
 
+@db_timed
+async def get_session_messages_page(session_id: uuid.UUID, limit: int = 50, before: Optional[str] = None) -> MessagePage:
+    """Get the `limit` messages preceding the `before` cursor (the latest ones without it)"""
+    supabase = await get_async_supabase_client()
+    
+    query = supabase.table("messages") \
+        .select(MESSAGE_COLUMNS) \
+        .eq("session_id", str(session_id))
+    if before:
+        query = query.or_(_before_filter(before))
+    # newest first so the limit keeps the most recent rows; one extra row tells
+    # us whether older messages remain
+    result = await query \
+        .order("created_at", desc=True) \
+        .order("id", desc=True) \
+        .limit(limit + 1) \
+        .execute()
+    
+    rows = result.data[:limit]
+    next_cursor = encode_cursor(rows[-1]) if len(result.data) > limit else None
+    return MessagePage(messages=[Message(**row) for row in reversed(rows)], next_cursor=next_cursor)
+
+async def get_latest_messages(session_id: uuid.UUID, n: int) -> List[Message]:
+    """Get the last `n` messages of a session in chronological order (e.g. for LLM context)"""
+    page = await get_session_messages_page(session_id, limit=n)
+    return page.messages
+
+@db_timed
 async def delete_chat_session(session_id: uuid.UUID) -> bool:
     """Delete a chat session (and associated messages via CASCADE)"""
-    supabase = get_supabase_client()
+    supabase = await get_async_supabase_client()
     
-    result = supabase.table("chat_sessions") \
-        .delete() \
-        .eq("id", str(session_id)) \
-        .execute()
+    try:
+        result = await supabase.table("chat_sessions") \
+            .delete() \
+            .eq("id", str(session_id)) \
+            .execute()
+    finally:
+        session_cache.invalidate_session(session_id)
     
+    for row in result.data:
+        session_cache.invalidate_user(row["user_id"])
     return len(result.data) > 0
+
+# User profile operations
+@db_timed
+async def get_user_profile(user_id: uuid.UUID) -> Optional[UserProfile]:
+    """Get a user's profile, or None if they have not finished onboarding"""
+    supabase = await get_async_supabase_client()
+    
+    result = await supabase.table("user_profiles").select(PROFILE_COLUMNS).eq("user_id", str(user_id)).execute()
+    
+    if len(result.data) > 0:
+        return UserProfile(**result.data[0])
+    return None
+
+@db_timed
+async def upsert_user_profile(profile: UserProfile, idempotency_key: str) -> UserProfile:
+    """Write a whole profile in one round trip; a retry with the same key writes nothing"""
+    supabase = await get_async_supabase_client()
+    
+    # upsert_user_profile (schema.sql) skips the write if the row already carries the key
+    result = await supabase.rpc("upsert_user_profile", {
+        "p_profile": profile.model_dump(mode="json", exclude={"idempotency_key", "created_at", "updated_at"}),
+        "p_idempotency_key": idempotency_key,
+    }).execute()
+    
+    if len(result.data) > 0:
+        return UserProfile(**result.data[0])
+    raise Exception(f"Failed to save profile for user {profile.user_id}")
@@ -1,6 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime
 import uuid
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field
 
 
@@ -26,3 +26,49 @@ class Message(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class ChatSessionSummary(ChatSession):
+    """A chat session with a summary of its messages, for session lists"""
+    message_count: int = 0
+    last_message_preview: Optional[str] = None  # first 120 characters of the latest message
+    last_message_role: Optional[str] = None
+    last_message_at: Optional[datetime] = None
+
+
+class UserProfile(BaseModel):
+    """Model representing a user's onboarding profile in the database"""
+    user_id: uuid.UUID
+    display_name: str
+    birthday: Optional[date] = None
+    sex: Optional[str] = None  # male, female, other
+    height_cm: Optional[float] = None
+    training_experience_years: Optional[int] = None
+    training_style: List[str] = Field(default_factory=list)
+    equipment: List[str] = Field(default_factory=list)
+    availability: Optional[str] = None
+    limitations: Optional[str] = None
+    idempotency_key: Optional[str] = None  # key of the write that produced this row
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+    class Config:
+        orm_mode = True
+
+
+class ChatSessionPage(BaseModel):
+    """A page of chat sessions, newest first"""
+    sessions: List[ChatSession]
+    next_cursor: Optional[str] = None  # pass as `before` to get the next (older) page
+
+
+class ChatSessionSummaryPage(BaseModel):
+    """A page of chat session summaries, newest first"""
+    sessions: List[ChatSessionSummary]
+    next_cursor: Optional[str] = None  # pass as `before` to get the next (older) page
+
+
+class MessagePage(BaseModel):
+    """A page of messages in chronological order"""
+    messages: List[Message]
+    next_cursor: Optional[str] = None  # pass as `before` to get the previous (older) page
@@ -0,0 +1,166 @@
+"""
+Process-wide Supabase client registry.
+
+Building a Supabase client is not free (auth, realtime and PostgREST
+sub-clients are constructed) and every fresh client opens its own HTTP
+connections. This module keeps one client per process, backed by a keep-alive
+``httpx`` connection pool, so every query reuses warm connections.
+
+There are two flavours:
+
+- an async client (``httpx.AsyncClient``) used by ``app.db.client`` so database
+  round trips never block the event loop;
+- a sync client for scripts and the CLI.
+
+Both are created by the FastAPI lifespan (see ``main.py``) and closed on
+shutdown. Callers outside the app get them lazily on first use.
+"""
+
+import asyncio
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    # supabase is imported when the first client is built, not with the app
+    from supabase import Client, AsyncClient
+
+load_dotenv()
+
+DEFAULT_POOL_SIZE = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_TIMEOUT = 10.0
+
+_client: Optional["Client"] = None
+_http_client: Optional[httpx.Client] = None
+_lock = threading.Lock()
+
+_async_client: Optional["AsyncClient"] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_lock = threading.Lock()
+
+
+def get_pool_size() -> int:
+    """Max number of pooled connections, configurable via SUPABASE_POOL_SIZE"""
+    return int(os.environ.get("SUPABASE_POOL_SIZE", DEFAULT_POOL_SIZE))
+
+
+def _build_limits(pool_size: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY,
+    )
+
+
+def init_supabase_client(
+    url: Optional[str] = None,
+    key: Optional[str] = None,
+    pool_size: Optional[int] = None,
+) -> "Client":
+    """Create the shared sync Supabase client (no-op if it already exists)"""
+    global _client, _http_client
+
+    with _lock:
+        if _client is not None:
+            return _client
+
+        url = url or os.environ.get("SUPABASE_URL")
+        key = key or os.environ.get("SUPABASE_KEY")
+        pool_size = pool_size or get_pool_size()
+
+        from supabase import create_client
+        from supabase.lib.client_options import SyncClientOptions
+
+        http_client = httpx.Client(limits=_build_limits(pool_size), timeout=DEFAULT_TIMEOUT)
+        try:
+            client = create_client(url, key, options=SyncClientOptions(httpx_client=http_client))
+        except Exception:
+            http_client.close()
+            raise
+
+        _http_client = http_client
+        _client = client
+        return _client
+
+
+def get_pooled_client() -> "Client":
+    """Return the shared sync Supabase client, creating it on first use"""
+    if _client is None:
+        return init_supabase_client()
+    return _client
+
+
+def close_supabase_client() -> None:
+    """Close the shared sync client's connection pool"""
+    global _client, _http_client
+
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _client = None
+        _http_client = None
+
+
+async def init_async_supabase_client(
+    url: Optional[str] = None,
+    key: Optional[str] = None,
+    pool_size: Optional[int] = None,
+) -> "AsyncClient":
+    """Create the shared async Supabase client for the running event loop"""
+    global _async_client, _async_http_client, _async_loop
+
+    loop = asyncio.get_running_loop()
+    if _async_client is not None and _async_loop is loop:
+        return _async_client
+
+    url = url or os.environ.get("SUPABASE_URL")
+    key = key or os.environ.get("SUPABASE_KEY")
+    pool_size = pool_size or get_pool_size()
+
+    from supabase import acreate_client
+    from supabase.lib.client_options import AsyncClientOptions
+
+    http_client = httpx.AsyncClient(limits=_build_limits(pool_size), timeout=DEFAULT_TIMEOUT)
+    try:
+        client = await acreate_client(url, key, options=AsyncClientOptions(httpx_client=http_client))
+    except Exception:
+        await http_client.aclose()
+        raise
+
+    with _async_lock:
+        # Connections are bound to the loop that opened them, so a client
+        # left over from another (closed) loop is simply dropped.
+        if _async_client is not None and _async_loop is loop:
+            await http_client.aclose()
+            return _async_client
+        _async_http_client = http_client
+        _async_client = client
+        _async_loop = loop
+    return client
+
+
+async def get_async_pooled_client() -> "AsyncClient":
+    """Return the shared async Supabase client, creating it on first use"""
+    if _async_client is None or _async_loop is not asyncio.get_running_loop():
+        return await init_async_supabase_client()
+    return _async_client
+
+
+async def close_async_supabase_client() -> None:
+    """Close the shared async client's connection pool"""
+    global _async_client, _async_http_client, _async_loop
+
+    with _async_lock:
+        http_client = _async_http_client
+        loop = _async_loop
+        _async_client = None
+        _async_http_client = None
+        _async_loop = None
+
+    if http_client is not None and loop is asyncio.get_running_loop():
+        await http_client.aclose()
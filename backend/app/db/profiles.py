@@ -0,0 +1,102 @@
+"""
+Read-through cache of user profiles.
+
+The onboarding agent writes a profile once; the health coach reads it on every
+turn. ProfileCache serves those reads from memory (a ResponseCache of profile
+JSON, bounded and with a TTL) and only queries the database on a miss. Writes
+go through the cache, so the process that saved a profile never reads a stale
+one; other processes see it once their entry expires.
+
+Saves are idempotent: the idempotency key is stored with the row, a save whose
+key matches the cached profile returns it without a round trip, concurrent
+saves with the same key share one write, and the ``upsert_user_profile``
+function in schema.sql turns any remaining duplicate into a no-op.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.response_cache import ResponseCache
+from app.core.single_flight import coalesce
+from app.db.client import get_user_profile, upsert_user_profile
+from app.db.models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+# cached for users without a profile yet, so their reads skip the database too
+_MISSING = "null"
+
+
+class ProfileCache:
+    """Read-through, write-through cache of UserProfile rows with idempotent saves"""
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        ttl: float = 600.0,
+        loader: Callable[[uuid.UUID], Awaitable[Optional[UserProfile]]] = get_user_profile,
+        writer: Callable[[UserProfile, str], Awaitable[UserProfile]] = upsert_user_profile,
+    ):
+        self._cache = ResponseCache(max_entries=max_entries, ttl=ttl)
+        self._loader = loader
+        self._writer = writer
+        self._saving: Dict[str, "asyncio.Future[UserProfile]"] = {}
+        self.writes = 0
+        self.deduplicated = 0
+
+    async def get(self, user_id: uuid.UUID) -> Optional[UserProfile]:
+        """The user's profile (None if there is none), from memory when possible"""
+        cached = self._cache.get(str(user_id))
+        if cached is not None:
+            return None if cached == _MISSING else UserProfile.model_validate_json(cached)
+        profile = await self._loader(user_id)
+        self._cache.set(str(user_id), profile.model_dump_json() if profile else _MISSING)
+        return profile
+
+    async def save(self, profile: UserProfile, idempotency_key: str) -> UserProfile:
+        """Upsert `profile` once per idempotency key and cache the stored row"""
+        cached = self._cache.get(str(profile.user_id))
+        if cached not in (None, _MISSING):
+            stored = UserProfile.model_validate_json(cached)
+            if stored.idempotency_key == idempotency_key:
+                self.deduplicated += 1
+                return stored
+
+        task, joined = coalesce(self._saving, idempotency_key, lambda: self._write(profile, idempotency_key))
+        if joined:
+            self.deduplicated += 1
+        # shielded: a caller giving up must not cancel a write others wait on
+        return await asyncio.shield(task)
+
+    async def _write(self, profile: UserProfile, idempotency_key: str) -> UserProfile:
+        try:
+            stored = await self._writer(profile, idempotency_key)
+        except Exception:
+            # the write may or may not have landed; read it again next time
+            self._cache.delete(str(profile.user_id))
+            raise
+        self.writes += 1
+        self._cache.set(str(stored.user_id), stored.model_dump_json())
+        logger.info("profile_saved user=%s key=%s", stored.user_id, idempotency_key)
+        return stored
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        self._cache.delete(str(user_id))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.pop("version", None)
+        stats.update(writes=self.writes, deduplicated=self.deduplicated)
+        return stats
+
+
+profile_cache = ProfileCache(
+    max_entries=int(os.environ.get("PROFILE_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("PROFILE_CACHE_TTL", 600)),
+)
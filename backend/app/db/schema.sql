@@ -6,12 +6,27 @@ CREATE TABLE IF NOT EXISTS "chat_sessions" (
     user_id UUID NOT NULL,
     title TEXT NOT NULL DEFAULT 'New Chat',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
-    last_activity_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+    last_activity_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    -- Summary of the session's messages, kept up to date by append_messages so
+    -- a session list with previews is one query instead of one per session
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_message_preview TEXT,
+    last_message_role TEXT,
+    last_message_at TIMESTAMP WITH TIME ZONE
 );
 
+-- Summary columns for tables created before they existed
+ALTER TABLE "chat_sessions" ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE "chat_sessions" ADD COLUMN IF NOT EXISTS last_message_preview TEXT;
+ALTER TABLE "chat_sessions" ADD COLUMN IF NOT EXISTS last_message_role TEXT;
+ALTER TABLE "chat_sessions" ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP WITH TIME ZONE;
+
 -- Create index on user_id for faster querying sessions by user
 CREATE INDEX IF NOT EXISTS chat_sessions_user_id_idx ON "chat_sessions" (user_id);
 
+-- Keyset pagination of a user's sessions by (created_at, id)
+CREATE INDEX IF NOT EXISTS chat_sessions_user_created_idx ON "chat_sessions" (user_id, created_at DESC, id DESC);
+
 -- Messages Table
 CREATE TABLE IF NOT EXISTS "messages" (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -24,9 +39,131 @@ CREATE TABLE IF NOT EXISTS "messages" (
 -- Create index on session_id for faster querying messages by session
 CREATE INDEX IF NOT EXISTS messages_session_id_idx ON "messages" (session_id);
 
+-- Keyset pagination / latest-N reads of a session's messages by (created_at, id)
+CREATE INDEX IF NOT EXISTS messages_session_created_idx ON "messages" (session_id, created_at DESC, id DESC);
+
+-- One-off backfill of the summary columns (a no-op once they are populated)
+UPDATE "chat_sessions" s SET
+  message_count = m.message_count,
+  last_message_preview = m.last_message_preview,
+  last_message_role = m.last_message_role,
+  last_message_at = m.last_message_at
+FROM (
+  SELECT DISTINCT ON (session_id)
+    session_id,
+    count(*) OVER (PARTITION BY session_id) AS message_count,
+    left(content, 120) AS last_message_preview,
+    role AS last_message_role,
+    created_at AS last_message_at
+  FROM "messages"
+  ORDER BY session_id, created_at DESC, id DESC
+) m
+WHERE s.id = m.session_id AND s.last_message_at IS NULL;
+
+-- Insert a batch of messages, bump the session's last_activity_at and update
+-- its message summary in one transaction / one round trip. Rows carry
+-- client-generated ids, so a retried batch is a no-op for the rows that
+-- already landed. The preview only moves forward: a batch older than the
+-- session's last message (e.g. a delayed retry) leaves it as it is.
+CREATE OR REPLACE FUNCTION append_messages(p_session_id UUID, p_messages JSONB)
+RETURNS SETOF "messages"
+LANGUAGE sql
+AS $$
+  WITH inserted AS (
+    INSERT INTO "messages" (id, session_id, role, content, created_at)
+    SELECT
+      COALESCE((m->>'id')::uuid, uuid_generate_v4()),
+      p_session_id,
+      m->>'role',
+      m->>'content',
+      COALESCE((m->>'created_at')::timestamptz, now())
+    FROM jsonb_array_elements(p_messages) AS m
+    ON CONFLICT (id) DO NOTHING
+    RETURNING *
+  ), latest AS (
+    SELECT content, role, created_at FROM inserted ORDER BY created_at DESC, id DESC LIMIT 1
+  ), bumped AS (
+    UPDATE "chat_sessions" s SET
+      last_activity_at = now(),
+      message_count = s.message_count + (SELECT count(*) FROM inserted),
+      last_message_preview = COALESCE(
+        (SELECT left(l.content, 120) FROM latest l WHERE s.last_message_at IS NULL OR l.created_at >= s.last_message_at),
+        s.last_message_preview),
+      last_message_role = COALESCE(
+        (SELECT l.role FROM latest l WHERE s.last_message_at IS NULL OR l.created_at >= s.last_message_at),
+        s.last_message_role),
+      last_message_at = GREATEST((SELECT l.created_at FROM latest l), s.last_message_at)
+    WHERE s.id = p_session_id
+  )
+  SELECT * FROM inserted;
+$$;
+
+-- User profiles, one row per user, written once the onboarding review is confirmed
+CREATE TABLE IF NOT EXISTS "user_profiles" (
+    user_id UUID PRIMARY KEY,
+    display_name TEXT NOT NULL,
+    birthday DATE,
+    sex TEXT CHECK (sex = ANY (ARRAY['male'::text, 'female'::text, 'other'::text])),
+    height_cm NUMERIC,
+    training_experience_years INTEGER,
+    training_style TEXT[] NOT NULL DEFAULT '{}',
+    equipment TEXT[] NOT NULL DEFAULT '{}',
+    availability TEXT,
+    limitations TEXT,
+    idempotency_key TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+-- Insert or update a whole profile in one statement. A call carrying the
+-- idempotency key the row was last written with is a no-op that returns the
+-- stored row, so a retried create_user_profile never writes twice.
+CREATE OR REPLACE FUNCTION upsert_user_profile(p_profile JSONB, p_idempotency_key TEXT)
+RETURNS SETOF "user_profiles"
+LANGUAGE sql
+AS $$
+  WITH upserted AS (
+    INSERT INTO "user_profiles" (
+      user_id, display_name, birthday, sex, height_cm, training_experience_years,
+      training_style, equipment, availability, limitations, idempotency_key
+    )
+    SELECT
+      (p_profile->>'user_id')::uuid,
+      p_profile->>'display_name',
+      (p_profile->>'birthday')::date,
+      p_profile->>'sex',
+      (p_profile->>'height_cm')::numeric,
+      (p_profile->>'training_experience_years')::integer,
+      ARRAY(SELECT jsonb_array_elements_text(COALESCE(p_profile->'training_style', '[]'::jsonb))),
+      ARRAY(SELECT jsonb_array_elements_text(COALESCE(p_profile->'equipment', '[]'::jsonb))),
+      p_profile->>'availability',
+      p_profile->>'limitations',
+      p_idempotency_key
+    ON CONFLICT (user_id) DO UPDATE SET
+      display_name = EXCLUDED.display_name,
+      birthday = EXCLUDED.birthday,
+      sex = EXCLUDED.sex,
+      height_cm = EXCLUDED.height_cm,
+      training_experience_years = EXCLUDED.training_experience_years,
+      training_style = EXCLUDED.training_style,
+      equipment = EXCLUDED.equipment,
+      availability = EXCLUDED.availability,
+      limitations = EXCLUDED.limitations,
+      idempotency_key = EXCLUDED.idempotency_key,
+      updated_at = now()
+    WHERE "user_profiles".idempotency_key IS DISTINCT FROM EXCLUDED.idempotency_key
+    RETURNING *
+  )
+  SELECT * FROM upserted
+  UNION ALL
+  SELECT * FROM "user_profiles"
+  WHERE user_id = (p_profile->>'user_id')::uuid AND NOT EXISTS (SELECT 1 FROM upserted);
+$$;
+
 -- Add RLS (Row Level Security) policies
 ALTER TABLE "chat_sessions" ENABLE ROW LEVEL SECURITY;
 ALTER TABLE "messages" ENABLE ROW LEVEL SECURITY;
+ALTER TABLE "user_profiles" ENABLE ROW LEVEL SECURITY;
 
 -- Policy for chat_sessions (users can only see their own sessions)
 CREATE POLICY "Users can view own sessions" ON "chat_sessions"
@@ -57,3 +194,16 @@ WITH CHECK (
     SELECT id FROM chat_sessions WHERE user_id = auth.uid()
   )
 );
+
+-- Policy for user_profiles (users can only see and write their own profile)
+CREATE POLICY "Users can view own profile" ON "user_profiles"
+FOR SELECT
+USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert own profile" ON "user_profiles"
+FOR INSERT
+WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update own profile" ON "user_profiles"
+FOR UPDATE
+USING (auth.uid() = user_id);
@@ -0,0 +1,174 @@
+"""
+In-process cache of chat session rows.
+
+Session rows are read far more often than they change, so ``get_chat_session``
+and ``get_user_chat_sessions`` read through a SessionCache: an LRU with a TTL
+(a ResponseCache of row JSON) keyed by session id and by user id. Every write
+in ``app.db.client`` that can change a cached row invalidates it - creating,
+updating or deleting a session, and appending messages (which bumps
+``last_activity_at``) - along with the owning user's session list.
+
+Two rules keep reads fresh after writes:
+
+- invalidations bump a generation counter, and a fetch that started before an
+  invalidation does not cache its (possibly older) result;
+- invalidations are published on an InvalidationBus. LocalInvalidationBus
+  delivers them to every cache subscribed in this process; a multi-worker
+  deployment plugs in a shared transport (Redis pub/sub, Postgres
+  LISTEN/NOTIFY) with the same two methods so other workers drop their copies
+  too. Until then the TTL bounds how long another worker can serve a row.
+"""
+
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import TypeAdapter
+
+from app.core.metrics import Counter, REGISTRY
+from app.core.response_cache import ResponseCache
+from app.db.models import ChatSession
+
+SESSION_CACHE_LOOKUPS = Counter(
+    "db_session_cache_lookups_total",
+    "Chat session cache lookups by kind (session, user_sessions) and outcome (hit, miss).",
+    ("kind", "outcome"),
+)
+REGISTRY.append(SESSION_CACHE_LOOKUPS)
+
+_session_list = TypeAdapter(List[ChatSession])
+
+
+class InvalidationBus(ABC):
+    """Delivers cache invalidations to every subscribed cache"""
+
+    @abstractmethod
+    def publish(self, key: str) -> None:
+        """Send an invalidated cache key to every subscriber"""
+
+    @abstractmethod
+    def subscribe(self, callback: Callable[[str], None]) -> None:
+        """Call `callback` with each published key"""
+
+
+class LocalInvalidationBus(InvalidationBus):
+    """In-process bus: each subscriber stands in for one worker's cache"""
+
+    def __init__(self):
+        self._subscribers: List[Callable[[str], None]] = []
+        self.published = 0
+
+    def publish(self, key: str) -> None:
+        self.published += 1
+        for callback in list(self._subscribers):
+            callback(key)
+
+    def subscribe(self, callback: Callable[[str], None]) -> None:
+        self._subscribers.append(callback)
+
+
+def _session_key(session_id: Any) -> str:
+    return f"session:{session_id}"
+
+
+def _user_key(user_id: Any) -> str:
+    return f"user:{user_id}"
+
+
+class SessionCache:
+    """Read-through LRU/TTL cache of chat sessions, invalidated by writes"""
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        ttl: float = 60.0,
+        bus: Optional[InvalidationBus] = None,
+    ):
+        self._cache = ResponseCache(
+            max_entries=max_entries, ttl=ttl, max_bytes=16 * 1024 * 1024, max_entry_bytes=256 * 1024,
+        )
+        self._lock = threading.Lock()
+        self._generation = 0
+        # session id -> owner, so a session write also drops its user's list
+        self._owners: "OrderedDict[str, str]" = OrderedDict()
+        self._max_owners = max_entries * 4
+        self.bus = bus or LocalInvalidationBus()
+        self.bus.subscribe(self._drop)
+
+    # ---- reads ----
+
+    def generation(self) -> int:
+        """Take before fetching and pass to set_*, so a fetch overtaken by an invalidation is not cached"""
+        with self._lock:
+            return self._generation
+
+    def get_session(self, session_id: uuid.UUID) -> Optional[ChatSession]:
+        cached = self._cache.get(_session_key(session_id))
+        SESSION_CACHE_LOOKUPS.inc(1, "session", "miss" if cached is None else "hit")
+        return None if cached is None else ChatSession.model_validate_json(cached)
+
+    def get_user_sessions(self, user_id: uuid.UUID) -> Optional[List[ChatSession]]:
+        cached = self._cache.get(_user_key(user_id))
+        SESSION_CACHE_LOOKUPS.inc(1, "user_sessions", "miss" if cached is None else "hit")
+        return None if cached is None else _session_list.validate_json(cached)
+
+    # ---- fills ----
+
+    def set_session(self, session: ChatSession, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._remember_owner(str(session.id), str(session.user_id))
+            self._cache.set(_session_key(session.id), session.model_dump_json())
+
+    def set_user_sessions(self, user_id: uuid.UUID, sessions: List[ChatSession], generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            for session in sessions:
+                self._remember_owner(str(session.id), str(user_id))
+            self._cache.set(_user_key(user_id), _session_list.dump_json(sessions).decode())
+
+    # ---- invalidation ----
+
+    def invalidate_session(self, session_id: uuid.UUID, user_id: Optional[uuid.UUID] = None) -> None:
+        """Drop a session and its owner's session list, in every subscribed cache"""
+        with self._lock:
+            owner = str(user_id) if user_id else self._owners.get(str(session_id))
+        self.bus.publish(_session_key(session_id))
+        if owner:
+            self.bus.publish(_user_key(owner))
+
+    def invalidate_user(self, user_id: uuid.UUID) -> None:
+        self.bus.publish(_user_key(user_id))
+
+    def _drop(self, key: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._cache.delete(key)
+
+    def _remember_owner(self, session_id: str, user_id: str) -> None:
+        self._owners[session_id] = user_id
+        self._owners.move_to_end(session_id)
+        while len(self._owners) > self._max_owners:
+            self._owners.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._owners.clear()
+            self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.pop("version", None)
+        return stats
+
+
+session_cache = SessionCache(
+    max_entries=int(os.environ.get("SESSION_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("SESSION_CACHE_TTL", 60)),
+)
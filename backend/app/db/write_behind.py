@@ -0,0 +1,197 @@
+"""
+Write-behind buffer for chat messages.
+
+A chat turn produces a user and an assistant message; writing each as it
+happens costs a database round trip on the request path. MessageWriteBuffer
+queues messages in memory and a background task writes them with
+``create_messages`` - one ``append_messages`` call per session - when a batch
+fills up or after ``flush_interval`` seconds, whichever comes first.
+
+Durability: messages get their id and timestamp when queued, so a retried
+batch cannot create duplicates. A failed flush puts the batch back at the
+head of the queue and is retried on the next tick; so does a cancelled one.
+``close()`` (called from the FastAPI lifespan on shutdown) lets a background
+flush in progress finish, then flushes everything still queued, retrying
+before giving up, and ``flush()`` gives read-your-writes to callers that need it.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.db.client import create_messages
+from app.db.models import Message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 100
+DEFAULT_FLUSH_INTERVAL = 0.25
+DEFAULT_CLOSE_RETRIES = 3
+
+
+class MessageWriteBuffer:
+    """Queues messages and writes them in per-session batches in the background"""
+
+    def __init__(
+        self,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        close_retries: int = DEFAULT_CLOSE_RETRIES,
+        writer=create_messages,
+    ):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.close_retries = close_retries
+        self._writer = writer
+
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        # session_id -> queued rows, oldest session first
+        self._pending: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._pending_count = 0
+        self._last_created_at: Optional[datetime] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending_count
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and self._loop is loop and not self._task.done():
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    def _next_timestamp(self) -> datetime:
+        # strictly increasing, so queued messages keep their order in the table
+        now = datetime.now()
+        if self._last_created_at is not None and now <= self._last_created_at:
+            now = self._last_created_at + timedelta(microseconds=1)
+        self._last_created_at = now
+        return now
+
+    def add(self, session_id: uuid.UUID, role: str, content: str) -> Message:
+        """Queue a message for writing and return it as it will be stored"""
+        if role not in ['user', 'assistant']:
+            raise ValueError("Role must be either 'user' or 'assistant'")
+        self._ensure_started()
+
+        message = Message(session_id=session_id, role=role, content=content, created_at=self._next_timestamp())
+        self._pending.setdefault(str(session_id), []).append({
+            "id": str(message.id),
+            "role": role,
+            "content": content,
+            "created_at": message.created_at.isoformat(),
+        })
+        self._pending_count += 1
+        if self._pending_count >= self.max_batch:
+            self._wakeup.set()
+        return message
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending_count:
+                try:
+                    await self.flush()
+                except Exception:
+                    # already logged and re-queued; try again next tick
+                    pass
+
+    async def flush(self) -> None:
+        """Write everything queued so far; raises if a batch fails (it stays queued)"""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            batch, self._pending = self._pending, OrderedDict()
+            self._pending_count = 0
+            while batch:
+                session_id, rows = next(iter(batch.items()))
+                try:
+                    await self._writer(uuid.UUID(session_id), rows)
+                except asyncio.CancelledError:
+                    # the ids make the retry safe even if the write went through
+                    self._requeue(batch)
+                    raise
+                except Exception:
+                    self.failures += 1
+                    logger.exception("Failed to write %d queued messages for session %s", len(rows), session_id)
+                    self._requeue(batch)
+                    raise
+                del batch[session_id]
+                self.flushed += len(rows)
+                self.batches += 1
+
+    def _requeue(self, batch: "OrderedDict[str, List[Dict[str, Any]]]") -> None:
+        # unwritten rows go back in front of anything queued meanwhile
+        for session_id, rows in self._pending.items():
+            batch.setdefault(session_id, []).extend(rows)
+        self._pending = batch
+        self._pending_count = sum(len(rows) for rows in batch.values())
+
+    async def close(self) -> None:
+        """Stop the background task and write out everything still queued"""
+        if self._task is not None:
+            # a background flush in progress finishes its write instead of being cancelled
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+        for attempt in range(self.close_retries):
+            if not self._pending_count:
+                return
+            try:
+                await self.flush()
+            except Exception:
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        if self._pending_count:
+            logger.error("Dropping %d unwritten messages on shutdown", self._pending_count)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._pending_count,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+        }
+
+
+_buffer: Optional[MessageWriteBuffer] = None
+
+
+def get_message_buffer() -> MessageWriteBuffer:
+    """Process-wide write-behind buffer, configured from the environment"""
+    global _buffer
+    if _buffer is None:
+        _buffer = MessageWriteBuffer(
+            max_batch=int(os.environ.get("MESSAGE_WRITE_BATCH", DEFAULT_MAX_BATCH)),
+            flush_interval=float(os.environ.get("MESSAGE_WRITE_INTERVAL", DEFAULT_FLUSH_INTERVAL)),
+        )
+    return _buffer
+
+
+async def close_message_buffer() -> None:
+    """Flush and stop the process-wide buffer (no-op if it was never used)"""
+    global _buffer
+    if _buffer is not None:
+        await _buffer.close()
+        _buffer = None
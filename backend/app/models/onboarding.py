@@ -0,0 +1,136 @@
+from typing import Annotated, Any, Dict, List, Literal, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class EnvelopeModel(BaseModel):
+    """Base for the onboarding envelope models: keys the prompt does not list are kept as-is"""
+    model_config = ConfigDict(extra="allow")
+
+
+class Step(EnvelopeModel):
+    """One entry of the envelope's `steps` array (the STEP MAP progress)"""
+    id: str
+    title: Optional[str] = None
+    stepDisplayName: Optional[str] = None
+    question: Optional[str] = None
+    answer: Optional[str] = None
+    status: Literal["done", "current", "upcoming"]
+
+
+class Option(EnvelopeModel):
+    value: str
+    label: str
+
+
+class TextPayload(EnvelopeModel):
+    kind: Literal["text"]
+    id: str
+    prompt: str
+    placeholder: Optional[str] = None
+    required: Optional[bool] = None
+    minLen: Optional[int] = None
+    maxLen: Optional[int] = None
+
+
+class RadioPayload(EnvelopeModel):
+    kind: Literal["radio"]
+    id: str
+    prompt: str
+    options: List[Option]
+
+
+class CheckboxPayload(EnvelopeModel):
+    kind: Literal["checkbox"]
+    id: str
+    prompt: str
+    options: List[Option]
+    maxSelect: Optional[int] = None
+
+
+class SelectPayload(EnvelopeModel):
+    kind: Literal["select"]
+    id: str
+    prompt: str
+    options: List[Option]
+    multi: Optional[bool] = None
+
+
+class ReviewPayload(EnvelopeModel):
+    kind: Literal["review"]
+    id: str = "review"
+    summary: str
+
+
+QuestionPayload = Annotated[
+    Union[TextPayload, RadioPayload, CheckboxPayload, SelectPayload, ReviewPayload],
+    Field(discriminator="kind"),
+]
+
+
+class ValidationErrorPayload(EnvelopeModel):
+    fieldId: str
+    message: str
+
+
+class CompletePayload(EnvelopeModel):
+    redirect_path: str
+
+
+class EnvelopeBase(EnvelopeModel):
+    # None in cached envelopes shared between sessions
+    sessionId: Optional[str] = None
+    currentStepId: Optional[str] = None
+    steps: List[Step] = Field(default_factory=list)
+    paraphrasedAnswers: Optional[Dict[str, Any]] = None
+
+
+class QuestionEnvelope(EnvelopeBase):
+    status: Literal["question"]
+    payload: QuestionPayload
+
+
+class ValidationErrorEnvelope(EnvelopeBase):
+    status: Literal["validationError"]
+    payload: ValidationErrorPayload
+
+
+class CompleteEnvelope(EnvelopeBase):
+    status: Literal["complete"]
+    payload: CompletePayload
+
+
+# The JSON envelope of ONBOARDING_AGENT_PROMPT, one variant per `status`
+OnboardingEnvelope = Annotated[
+    Union[QuestionEnvelope, ValidationErrorEnvelope, CompleteEnvelope],
+    Field(discriminator="status"),
+]
+
+
+class DeltaBase(EnvelopeModel):
+    currentStepId: Optional[str] = None
+    # answers accepted this turn, paraphrased, keyed by step id
+    answers: Dict[str, str] = Field(default_factory=dict)
+
+
+class QuestionDelta(DeltaBase):
+    status: Literal["question"]
+    payload: QuestionPayload
+
+
+class ValidationErrorDelta(DeltaBase):
+    status: Literal["validationError"]
+    payload: ValidationErrorPayload
+
+
+class CompleteDelta(DeltaBase):
+    status: Literal["complete"]
+    payload: CompletePayload
+
+
+# What the agent sends per turn; the server adds sessionId, steps and
+# paraphrasedAnswers to make the OnboardingEnvelope (see app.core.onboarding_steps)
+OnboardingDelta = Annotated[
+    Union[QuestionDelta, ValidationErrorDelta, CompleteDelta],
+    Field(discriminator="status"),
+]
@@ -1,10 +1,10 @@
-import os
-from supabase import create_client, Client
+from supabase import Client
 
-from dotenv import load_dotenv
+from app.db.pool import get_pooled_client
 
-load_dotenv()
 
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
\ No newline at end of file
+def __getattr__(name: str) -> Client:
+    # `supabase` resolves to the shared pooled client instead of building a new one at import time
+    if name == "supabase":
+        return get_pooled_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
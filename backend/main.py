@@ -1,11 +1,49 @@
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api.onboarding import router as onboarding_router
+from app.api.chat import router as chat_router
+from app.api.coach import router as coach_router
+from app.core.providers import warm_up
+from app.core.metrics import RequestMetricsMiddleware, render_metrics
+from app.core.serialization import ORJSONResponse
+from app.db.pool import init_async_supabase_client, close_async_supabase_client, close_supabase_client
+from app.db.write_behind import close_message_buffer
+
+# Structured `key=value` log lines (per-request timings, token usage) at INFO by default
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s",
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the shared Supabase client (and its connection pool) once per worker
+    if os.environ.get("SUPABASE_URL"):
+        await init_async_supabase_client()
+    # Agents and model clients are built on first use; APP_WARM_UP=1 builds them
+    # now instead, trading a slower start for a fast first request
+    if os.environ.get("APP_WARM_UP", "").lower() in ("1", "true", "yes"):
+        await asyncio.to_thread(warm_up)
+    yield
+    # write out queued messages while the connection pool is still open
+    await close_message_buffer()
+    await close_async_supabase_client()
+    close_supabase_client()
+
 
 app = FastAPI(
     title="AI Health Coach API",
     description="API for the AI Health Coach application",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -16,9 +54,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-request latency with its LLM / DB / serialization breakdown, see /metrics
+app.add_middleware(RequestMetricsMiddleware)
 
 # Include routers
 app.include_router(onboarding_router, prefix="/api")
+app.include_router(chat_router, prefix="/api")
+app.include_router(coach_router, prefix="/api")
 
 @app.get("/")
 def read_root():
@@ -27,3 +69,8 @@ def read_root():
         "status": "active",
         "version": "1.0.0"
     }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics: request latency histograms (total, LLM, DB, serialization) and tokens"""
+    return render_metrics()
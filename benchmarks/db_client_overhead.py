@@ -0,0 +1,72 @@
+"""
+Per-query overhead of a fresh Supabase client vs the shared pooled client.
+
+Runs against a local StubPostgREST, so the numbers isolate client construction
+and connection setup from real database work.
+
+    PYTHONPATH=backend python -m benchmarks.db_client_overhead [--queries 200]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from supabase import create_client
+
+from benchmarks.stubs import StubPostgREST
+
+STUB_KEY = "stub-service-key"
+
+
+def _report(label: str, elapsed: float, queries: int) -> None:
+    print(f"{label:<28} {elapsed / queries * 1000:8.3f} ms/query  ({queries} queries, {elapsed:.2f}s)")
+
+
+def bench_fresh_client(url: str, session_id: str, queries: int) -> float:
+    """Baseline: build a new client for every query, as app.db.client used to"""
+    start = time.perf_counter()
+    for _ in range(queries):
+        supabase = create_client(url, STUB_KEY)
+        supabase.table("messages").select("*").eq("session_id", session_id).execute()
+    return time.perf_counter() - start
+
+
+def bench_pooled_client(session_id: str, queries: int) -> float:
+    """Shared client from app.db.pool, reusing keep-alive connections"""
+    from app.db.client import get_session_messages
+
+    async def run():
+        for _ in range(queries):
+            await get_session_messages(uuid.UUID(session_id))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with StubPostgREST() as stub:
+        os.environ["SUPABASE_URL"] = stub.url
+        os.environ["SUPABASE_KEY"] = STUB_KEY
+        session_id = str(uuid.uuid4())
+
+        # warm up both paths once so imports are excluded
+        bench_fresh_client(stub.url, session_id, 1)
+        bench_pooled_client(session_id, 1)
+
+        fresh = bench_fresh_client(stub.url, session_id, args.queries)
+        pooled = bench_pooled_client(session_id, args.queries)
+
+    _report("fresh client per query", fresh, args.queries)
+    _report("pooled shared client", pooled, args.queries)
+    print(f"speedup: {fresh / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
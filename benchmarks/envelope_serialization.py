@@ -0,0 +1,91 @@
+"""
+Cost of returning an onboarding envelope from the API.
+
+Compares, per response, on a late-onboarding envelope (every step done, long
+paraphrased answers and a review summary):
+
+- ``raw string``: the previous contract, the envelope as an escaped JSON
+  string inside ``{"data": ...}`` (json.dumps of the wrapper; no validation)
+- ``validate + jsonable_encoder``: typed envelope, FastAPI's generic encoder,
+  then json.dumps (what JSONResponse does with a model)
+- ``validate + model_dump + orjson``: typed envelope, model_dump, then orjson
+  (the ORJSONResponse default response class)
+- ``validate + dump_json``: typed envelope serialized by pydantic-core directly
+
+Parsing (``validate_json``) is included in the three typed variants because
+the API now validates every reply; the raw string variant skips it.
+
+    PYTHONPATH=backend python -m benchmarks.envelope_serialization [--steps 30] [--number 2000]
+"""
+
+import argparse
+import json
+import timeit
+from typing import Any, Callable, Dict
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app.core.envelope import envelope_adapter
+from app.core.serialization import dumps, orjson
+from app.models.onboarding import OnboardingEnvelope
+
+
+class Response(BaseModel):
+    data: OnboardingEnvelope
+    conversation_id: str
+
+
+def large_envelope(steps: int) -> str:
+    """Review envelope with `steps` answered steps"""
+    answers = {f"step_{i}": f"A fairly long paraphrased answer for step {i}, " * 4 for i in range(steps)}
+    return json.dumps({
+        "sessionId": "3f0c1d9e-7a51-4c36-a3e1-4a0c2b7d9e11",
+        "status": "question",
+        "currentStepId": "review",
+        "steps": [
+            {
+                "id": step_id,
+                "title": step_id.replace("_", " ").title(),
+                "stepDisplayName": step_id.replace("_", " "),
+                "question": f"What is your {step_id}?",
+                "answer": answer,
+                "status": "done",
+            }
+            for step_id, answer in answers.items()
+        ] + [{"id": "review", "status": "current"}],
+        "paraphrasedAnswers": answers,
+        "payload": {"kind": "review", "id": "review", "summary": " ".join(answers.values())},
+    })
+
+
+def variants(text: str) -> Dict[str, Callable[[], Any]]:
+    conversation_id = "3f0c1d9e-7a51-4c36-a3e1-4a0c2b7d9e11"
+
+    def typed() -> Response:
+        return Response(data=envelope_adapter.validate_json(text), conversation_id=conversation_id)
+
+    return {
+        "raw string": lambda: json.dumps({"data": text, "conversation_id": conversation_id}).encode(),
+        "validate + jsonable_encoder": lambda: json.dumps(jsonable_encoder(typed(), exclude_unset=True)).encode(),
+        "validate + model_dump + orjson": lambda: dumps(typed().model_dump(mode="json", exclude_unset=True)),
+        "validate + dump_json": lambda: typed().model_dump_json(exclude_unset=True).encode(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    text = large_envelope(args.steps)
+    print(f"envelope: {len(text) / 1024:.1f} KiB, {args.steps} steps, orjson {'on' if orjson else 'off (json fallback)'}")
+    print(f"\n{'variant':<34} {'us/response':>12} {'bytes':>8}")
+    for name, run in variants(text).items():
+        seconds = min(timeit.repeat(run, number=args.number, repeat=3)) / args.number
+        print(f"{name:<34} {seconds * 1e6:>12.1f} {len(run()):>8}")
+
+
+if __name__ == "__main__":
+    main()
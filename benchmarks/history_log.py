@@ -0,0 +1,76 @@
+"""
+Per-turn write cost of the CLI health agent's history as the conversation grows.
+
+The old save_history rewrote the whole history.txt on every step, so each turn
+cost O(history). ConversationLog appends the new messages only. This writes
+--turns turns with both and prints the per-turn cost at a few checkpoints.
+
+    PYTHONPATH=backend python -m benchmarks.history_log [--turns 3000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core.conversation_log import ConversationLog
+
+
+def legacy_save_history(messages, filename):
+    """The previous implementation: rewrite the whole file"""
+    with open(filename, "w") as f:
+        for message in messages:
+            if isinstance(message, AIMessage):
+                f.write(f"Agent: {message.content}\n")
+            elif isinstance(message, HumanMessage):
+                f.write(f"User: {message.content}\n")
+
+
+def _turn(i):
+    return [
+        HumanMessage(content=f"Question {i}: what should I train today? " * 3),
+        AIMessage(content=f"Answer {i}: squats, rows and a short run. " * 10),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=3000)
+    parser.add_argument("--window", type=int, default=100, help="turns averaged per checkpoint")
+    args = parser.parse_args()
+
+    checkpoints = [c for c in (100, 1000, args.turns) if c <= args.turns]
+    print(f"{'turn':>6} {'rewrite (ms/turn)':>18} {'append (ms/turn)':>17}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "history.txt")
+        log = ConversationLog(os.path.join(tmp, "history.jsonl"))
+        messages = []
+        legacy_time = append_time = 0.0
+        for i in range(1, args.turns + 1):
+            turn = _turn(i)
+            messages += turn
+
+            start = time.perf_counter()
+            legacy_save_history(messages, legacy_path)
+            legacy_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            log.append(turn)
+            append_time += time.perf_counter() - start
+
+            if i % args.window == 0:
+                if any(i - args.window < c <= i for c in checkpoints):
+                    print(f"{i:>6} {legacy_time / args.window * 1000:>18.3f} {append_time / args.window * 1000:>17.3f}")
+                legacy_time = append_time = 0.0
+
+        start = time.perf_counter()
+        tail = log.load_last(20)
+        print(f"load last {len(tail)} of {len(log)} messages: {(time.perf_counter() - start) * 1000:.3f} ms")
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Cold-start import cost of the API.
+
+Runs ``python -X importtime -c "import main"`` in fresh interpreters (no
+OPENAI_API_KEY or SUPABASE_URL, like a freshly scaled-out instance before its
+secrets matter) and reports the total import time and the slowest top-level
+imports by cumulative time. Also checks that the modules the app builds lazily
+(see app.core.providers) are not imported with it.
+
+tests/test_import_time.py runs the same measurement against a budget.
+
+    PYTHONPATH=backend python -m benchmarks.import_time [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+# imported on first use by the providers, never by `import main`
+LAZY_MODULES = ("langchain_openai", "openai", "langgraph.prebuilt", "supabase")
+
+
+def _env() -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "SUPABASE_URL", "SUPABASE_KEY")}
+    env["PYTHONPATH"] = BACKEND_DIR
+    return env
+
+
+def measure(module: str = "main") -> Tuple[float, Dict[str, float]]:
+    """Total import time of `module` (ms) and cumulative ms per imported module, in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total_us, name = line.split("|")
+        cumulative[name.strip()] = int(total_us) / 1000
+    return cumulative[module], cumulative
+
+
+def eagerly_imported(module: str = "main") -> List[str]:
+    """Lazily built dependencies that importing `module` pulls in anyway"""
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+def _top_level(cumulative: Dict[str, float], module: str) -> List[Tuple[str, float]]:
+    # third-party packages and app modules, without their submodules
+    roots = {}
+    for name, ms in cumulative.items():
+        if name == module:
+            continue
+        root = name if name.startswith("app.") else name.split(".")[0]
+        if name == root:
+            roots[root] = max(roots.get(root, 0.0), ms)
+    return sorted(roots.items(), key=lambda item: item[1], reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals = [total for total, _ in runs]
+    print(f"import {args.module}: median {statistics.median(totals):.0f} ms, "
+          f"min {min(totals):.0f} ms over {args.runs} runs")
+
+    _, cumulative = min(runs, key=lambda run: run[0])
+    print(f"\n{'module':<40} {'cumulative ms':>14}")
+    for name, ms in _top_level(cumulative, args.module)[:args.top]:
+        print(f"{name:<40} {ms:>14.1f}")
+
+    eager = eagerly_imported(args.module)
+    print(f"\nlazy dependencies imported eagerly: {', '.join(eager) if eager else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
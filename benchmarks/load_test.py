@@ -0,0 +1,351 @@
+"""
+Offline end-to-end load test of the API.
+
+Boots ``main:app`` under uvicorn (``--workers N``) against local stand-ins for
+every external service - StubOpenAI for the OpenAI API and StubPostgREST for
+Supabase - so the real request path runs (LangGraph agent, ChatOpenAI client,
+checkpointer, limiter, db client) without network access or API keys. Then
+drives it with concurrent simulated users, each walking a multi-turn
+conversation, and reports p50/p95/p99 latency, requests/sec, status codes and
+resident memory per worker before and after the run.
+
+Scenarios (--endpoint):
+  onboarding         POST /api/onboarding/chat, answers the STEP MAP in order
+  onboarding-stream  POST /api/onboarding/chat/stream, also reports time to first token
+  coach              POST /api/coach/chat, one chat session per user
+
+The fake model's time to first token, generation speed and reply size are
+flags, so runs model a realistic LLM share of the latency. The onboarding
+response cache is off unless --cache is given, so every turn reaches the
+model. Each worker keeps its own in-memory checkpoints; with several workers a
+follow-up turn may land on a worker that has not seen the conversation, which
+costs it nothing extra here.
+
+--max-p95 and --max-error-rate make the run exit non-zero when exceeded, for
+use as a regression gate.
+
+    PYTHONPATH=backend python -m benchmarks.load_test [--users 50] [--turns 4] [--workers 2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.core.onboarding_validation import STEP_IDS
+from benchmarks.stubs import StubOpenAI, StubPostgREST
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+# answers that pass validation for the first steps of the STEP MAP
+ANSWERS: Dict[str, str] = {
+    "display_name": "Alex",
+    "birthday": "1990-05-01",
+    "sex": "female",
+    "height": "172",
+    "training_experience": "3",
+    "training_style": "strength, running",
+    "equipment": "dumbbells",
+    "availability": "Mon, Wed and Fri evenings",
+    "limitations": "None",
+    "review": "Looks good",
+}
+COACH_MESSAGES = [
+    "hi!",
+    "How many grams of protein should I eat?",
+    "Can you make me a 3-day workout plan for strength?",
+    "thanks",
+]
+
+
+def onboarding_reply(body: Dict[str, Any]) -> str:
+    """Question delta for the step after the user's latest answer"""
+    user_messages = [m for m in body.get("messages", []) if m.get("role") == "user"]
+    answered = len(user_messages) - 1
+    step_id = STEP_IDS[min(max(answered, 0), len(STEP_IDS) - 1)]
+    answers = {STEP_IDS[min(answered, len(STEP_IDS)) - 1]: str(user_messages[-1].get("content"))} if answered > 0 else {}
+    return json.dumps({
+        "status": "question",
+        "currentStepId": step_id,
+        "answers": answers,
+        "payload": {"kind": "text", "id": step_id, "prompt": f"Please enter your {step_id.replace('_', ' ')}."},
+    })
+
+
+def coach_reply(body: Dict[str, Any]) -> str:
+    return "Here is some coaching advice. " * 8
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ---- memory ----
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid: int) -> List[int]:
+    children: List[int] = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def worker_pids(server_pid: int, workers: int) -> List[int]:
+    """Processes serving requests: the server itself, or its spawned workers"""
+    if workers <= 1:
+        return [server_pid]
+    pids = []
+    for pid in _children(server_pid):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"spawn_main" in f.read():
+                    pids.append(pid)
+        except OSError:
+            continue
+    return pids
+
+
+def memory_mb(pids: List[int]) -> List[float]:
+    return [_rss_kb(pid) / 1024 for pid in pids]
+
+
+# ---- server ----
+
+def start_server(args, openai: StubOpenAI, postgrest: StubPostgREST, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PYTHONPATH": BACKEND_DIR,
+        "OPENAI_BASE_URL": openai.url,
+        "OPENAI_API_KEY": "load-test",
+        "SUPABASE_URL": postgrest.url,
+        "SUPABASE_KEY": "load-test",
+        # per-request log lines would drown the report; LOG_LEVEL=INFO shows them
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        "ONBOARDING_CHECKPOINT_DB": ":memory:",
+        "HEALTH_COACH_CHECKPOINT_DB": ":memory:",
+        "ONBOARDING_CACHE_SIZE": os.environ.get("ONBOARDING_CACHE_SIZE", "2048") if args.cache else "0",
+        # measure the service, not the admission limits
+        "ONBOARDING_MAX_CONCURRENCY": str(args.max_concurrency),
+        "ONBOARDING_MAX_QUEUE": str(args.max_concurrency * 4),
+        "HEALTH_COACH_MAX_CONCURRENCY": str(args.max_concurrency),
+        "HEALTH_COACH_MAX_QUEUE": str(args.max_concurrency * 4),
+        "ONBOARDING_RATE_LIMIT_RPM": "1e9",
+        "ONBOARDING_RATE_LIMIT_BURST": "1e9",
+        "ONBOARDING_RATE_LIMIT_TPM": "1e12",
+        "HEALTH_COACH_RATE_LIMIT_RPM": "1e9",
+        "HEALTH_COACH_RATE_LIMIT_BURST": "1e9",
+        "HEALTH_COACH_RATE_LIMIT_TPM": "1e12",
+    }
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers),
+        "--log-level", "warning", "--no-access-log",
+    ]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+def wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.send_signal(signal.SIGINT)
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+# ---- simulated users ----
+
+class Results:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_token: List[float] = []
+        self.statuses: Counter = Counter()
+
+    def record(self, status: Any, elapsed: float, first_token: Optional[float] = None) -> None:
+        self.statuses[status] += 1
+        if status == 200:
+            self.latencies.append(elapsed)
+            if first_token is not None:
+                self.first_token.append(first_token)
+
+
+async def onboarding_user(client: httpx.AsyncClient, user: int, turns: int, results: Results, stream: bool) -> None:
+    conversation_id = None
+    messages = ["Hello"] + [ANSWERS[step] for step in STEP_IDS]
+    for turn in range(turns):
+        body = {"message": messages[min(turn, len(messages) - 1)], "conversation_id": conversation_id}
+        if turn:
+            body["step_id"] = STEP_IDS[min(turn - 1, len(STEP_IDS) - 1)]
+        headers = {"X-User-Id": f"load-user-{user}"}
+        start = time.perf_counter()
+        try:
+            if stream:
+                first_token = None
+                status = None
+                async with client.stream("POST", "/api/onboarding/chat/stream", json=body, headers=headers) as r:
+                    status = r.status_code
+                    async for line in r.aiter_lines():
+                        if first_token is None and line.startswith("event:"):
+                            first_token = time.perf_counter() - start
+                        if line.startswith("event: error"):
+                            status = "stream-error"
+                        if line.startswith("data:") and '"conversation_id"' in line:
+                            conversation_id = json.loads(line[5:]).get("conversation_id", conversation_id)
+                results.record(status, time.perf_counter() - start, first_token)
+            else:
+                r = await client.post("/api/onboarding/chat", json=body, headers=headers)
+                results.record(r.status_code, time.perf_counter() - start)
+                if r.status_code == 200:
+                    conversation_id = r.json()["conversation_id"]
+        except httpx.HTTPError as e:
+            results.record(type(e).__name__, time.perf_counter() - start)
+
+
+async def coach_user(client: httpx.AsyncClient, user: int, turns: int, results: Results) -> None:
+    session_id = None
+    headers = {"X-User-Id": str(uuid.uuid5(uuid.NAMESPACE_OID, f"load-user-{user}"))}
+    for turn in range(turns):
+        body = {"message": COACH_MESSAGES[turn % len(COACH_MESSAGES)], "session_id": session_id}
+        start = time.perf_counter()
+        try:
+            r = await client.post("/api/coach/chat", json=body, headers=headers)
+        except httpx.HTTPError as e:
+            results.record(type(e).__name__, time.perf_counter() - start)
+            continue
+        results.record(r.status_code, time.perf_counter() - start)
+        if r.status_code == 200:
+            session_id = r.json()["session_id"]
+
+
+async def drive(base_url: str, endpoint: str, users: int, turns: int) -> Dict[str, Any]:
+    results = Results()
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        def user(i: int):
+            if endpoint == "coach":
+                return coach_user(client, i, turns, results)
+            return onboarding_user(client, i, turns, results, stream=endpoint == "onboarding-stream")
+
+        start = time.perf_counter()
+        await asyncio.gather(*[user(i) for i in range(users)])
+        elapsed = time.perf_counter() - start
+    return {"results": results, "elapsed": elapsed}
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=["onboarding", "onboarding-stream", "coach"], default="onboarding")
+    parser.add_argument("--users", type=int, default=50, help="concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=4, help="requests per user, sent back to back")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--first-token-latency", type=float, default=0.3, help="fake model time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0, help="fake model generation speed")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="fake PostgREST delay per request (s)")
+    parser.add_argument("--max-concurrency", type=int, default=512, help="limiter capacity given to the server")
+    parser.add_argument("--cache", action="store_true", help="keep the onboarding response cache on")
+    parser.add_argument("--max-p95", type=float, help="fail if p95 latency (s) is above this")
+    parser.add_argument("--max-error-rate", type=float, help="fail if the share of non-200 responses is above this")
+    args = parser.parse_args()
+
+    reply = coach_reply if args.endpoint == "coach" else onboarding_reply
+    openai = StubOpenAI(
+        reply=reply,
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+    ).start()
+    postgrest = StubPostgREST(latency=args.db_latency).start()
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(args, openai, postgrest, port)
+    try:
+        wait_ready(base_url, server)
+        pids = worker_pids(server.pid, args.workers)
+        idle = memory_mb(pids)
+        run = drive(base_url, args.endpoint, args.users, args.turns)
+        outcome = asyncio.run(run)
+        loaded = memory_mb(pids)
+    finally:
+        stop_server(server)
+        openai.stop()
+        postgrest.stop()
+
+    results: Results = outcome["results"]
+    total = sum(results.statuses.values())
+    ok = results.statuses[200]
+    error_rate = (total - ok) / total if total else 0.0
+    p95 = percentile(results.latencies, 0.95)
+
+    print(f"{args.endpoint}: {args.users} users x {args.turns} turns, {args.workers} worker(s), "
+          f"model ttft {args.first_token_latency * 1000:.0f} ms @ {args.tokens_per_second:.0f} tok/s")
+    print(f"requests      {total} in {outcome['elapsed']:.2f}s ({ok / outcome['elapsed']:.1f} ok req/s), "
+          f"{openai.request_count} model calls")
+    print(f"statuses      {dict(results.statuses)}")
+    print(f"latency (ms)  p50 {percentile(results.latencies, 0.50) * 1000:.0f}  "
+          f"p95 {p95 * 1000:.0f}  p99 {percentile(results.latencies, 0.99) * 1000:.0f}")
+    if results.first_token:
+        print(f"first event   p50 {percentile(results.first_token, 0.50) * 1000:.0f}  "
+              f"p95 {percentile(results.first_token, 0.95) * 1000:.0f}  "
+              f"p99 {percentile(results.first_token, 0.99) * 1000:.0f}")
+    for i, (before, after) in enumerate(zip(idle, loaded)):
+        print(f"worker {i} RSS  {before:.0f} MB idle -> {after:.0f} MB after load")
+
+    failed = False
+    if args.max_p95 is not None and p95 > args.max_p95:
+        print(f"FAIL: p95 {p95:.3f}s > {args.max_p95}s")
+        failed = True
+    if args.max_error_rate is not None and error_rate > args.max_error_rate:
+        print(f"FAIL: error rate {error_rate:.3f} > {args.max_error_rate}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Reading a long chat session: full load vs keyset pages vs latest-N.
+
+Seeds a StubPostgREST with one synthetic session of --messages messages and
+times the ways app.db.client can read it. The stub has no indexes, so each
+request scans and sorts the whole table; against Postgres the keyset queries
+are range scans on messages_session_created_idx and a page costs the same at
+any depth. Walking every page is therefore pessimistic here.
+
+    PYTHONPATH=backend python -m benchmarks.message_paging [--messages 10000]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from benchmarks.stubs import StubPostgREST
+
+STUB_KEY = "stub-service-key"
+
+
+def _seed(stub: StubPostgREST, session_id: str, count: int) -> None:
+    stub.tables["messages"] = [
+        {
+            "id": str(uuid.uuid4()),
+            "session_id": session_id,
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"Synthetic coaching message {i}. " * 8,
+            "created_at": f"2025-01-01T{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+            # extra columns a select("*") would drag along
+            "metadata": {"tokens": 64, "model": "gpt-4o-mini", "trace": "x" * 200},
+        }
+        for i in range(count)
+    ]
+
+
+async def _timed(label: str, runs: int, call) -> None:
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = await call()
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"{label:<36} {elapsed * 1000:9.2f} ms   {result} messages")
+
+
+async def run(session_id: str, runs: int) -> None:
+    from app.db.client import (
+        get_async_supabase_client, get_latest_messages, get_session_messages, get_session_messages_page,
+    )
+
+    sid = uuid.UUID(session_id)
+    supabase = await get_async_supabase_client()
+
+    async def select_star():
+        result = await supabase.table("messages").select("*").eq("session_id", session_id).order("created_at").execute()
+        return len(result.data)
+
+    async def full_projected():
+        return len(await get_session_messages(sid))
+
+    async def first_page():
+        return len((await get_session_messages_page(sid, limit=50)).messages)
+
+    async def latest_20():
+        return len(await get_latest_messages(sid, 20))
+
+    async def walk_all_pages():
+        total, cursor = 0, None
+        while True:
+            page = await get_session_messages_page(sid, limit=200, before=cursor)
+            total += len(page.messages)
+            cursor = page.next_cursor
+            if cursor is None:
+                return total
+
+    await _timed("full load, select(*)", runs, select_star)
+    await _timed("full load, projected", runs, full_projected)
+    await _timed("latest page (50)", runs, first_page)
+    await _timed("latest 20 for LLM context", runs, latest_20)
+    await _timed("walk every page (200/page)", 1, walk_all_pages)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubPostgREST() as stub:
+        os.environ["SUPABASE_URL"] = stub.url
+        os.environ["SUPABASE_KEY"] = STUB_KEY
+        session_id = str(uuid.uuid4())
+        _seed(stub, session_id, args.messages)
+        asyncio.run(run(session_id, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Offline evaluation of the model router: quality vs latency vs cost per policy.
+
+Replays a labelled set of health coach turns through ModelRouter under each
+policy, with StubChatModel standing in for gpt-4o and gpt-4o-mini (latency
+profiles below, scaled by --time-scale so the run takes seconds). Reports
+classifier accuracy and, per policy, mean/p95 latency, estimated cost and a
+mean quality score.
+
+Quality comes from QUALITY, a per (model, route) score table. The defaults are
+placeholders; replace them with judged scores from a sample of real
+transcripts (--quality path/to/scores.json, same shape) before drawing
+conclusions about a policy.
+
+    PYTHONPATH=backend python -m benchmarks.model_routing_eval [--time-scale 0.02]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.core.model_router import CLARIFICATION, PLAN, POLICIES, SMALL_TALK, ModelRouter, classify_turn
+from benchmarks.stubs import StubChatModel
+
+DATASET: List[Tuple[str, str]] = [
+    ("hi!", SMALL_TALK),
+    ("Thanks coach", SMALL_TALK),
+    ("ok got it", SMALL_TALK),
+    ("good morning", SMALL_TALK),
+    ("thank you so much!", SMALL_TALK),
+    ("sounds good", SMALL_TALK),
+    ("What's a superset?", CLARIFICATION),
+    ("Is it ok to train legs two days in a row?", CLARIFICATION),
+    ("How many grams of protein should I eat?", CLARIFICATION),
+    ("My knee hurts when I squat, what should I do?", CLARIFICATION),
+    ("Should I do cardio before or after lifting?", CLARIFICATION),
+    ("What does RPE 8 mean?", CLARIFICATION),
+    ("How long should I rest between sets?", CLARIFICATION),
+    ("Is creatine safe?", CLARIFICATION),
+    ("thanks, but why deadlifts on Monday instead of Friday?", CLARIFICATION),
+    ("Can you make me a 4-day workout plan for strength?", PLAN),
+    ("Create a meal plan for cutting at 2000 kcal", PLAN),
+    ("Plan my week: I can train Mon, Wed, Fri for 45 minutes", PLAN),
+    ("I need a 12 week program to run a half marathon", PLAN),
+    ("Give me a push/pull/legs split", PLAN),
+    ("Design a home workout routine with just dumbbells", PLAN),
+    ("Write me a weekly diet with vegetarian meals", PLAN),
+    ("Suggest a beginner routine for building muscle", PLAN),
+]
+
+# time to first token (s), tokens per second
+LATENCY_PROFILES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (0.55, 70.0),
+    "gpt-4o-mini": (0.35, 110.0),
+}
+REPLY_TOKENS = {SMALL_TALK: 25, CLARIFICATION: 150, PLAN: 700}
+
+# placeholder judge scores in [0, 1] per model and route (see module docstring)
+QUALITY: Dict[str, Dict[str, float]] = {
+    "gpt-4o": {SMALL_TALK: 0.97, CLARIFICATION: 0.93, PLAN: 0.92},
+    "gpt-4o-mini": {SMALL_TALK: 0.97, CLARIFICATION: 0.90, PLAN: 0.78},
+}
+
+SYSTEM = SystemMessage(content="You are a helpful health coach assistant. " * 20)
+
+
+def _stub_factory(time_scale: float):
+    def reply_tokens(messages):
+        return REPLY_TOKENS[classify_turn(messages[-1].content)]
+
+    def factory(name: str) -> StubChatModel:
+        first_token, speed = LATENCY_PROFILES[name]
+        return StubChatModel(
+            name,
+            first_token_latency=first_token * time_scale,
+            tokens_per_second=speed / time_scale,
+            reply_tokens=reply_tokens,
+        )
+
+    return factory
+
+
+async def evaluate(policy_name: str, time_scale: float, quality: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    policy = POLICIES[policy_name]
+    router = ModelRouter(policy=policy, model_factory=_stub_factory(time_scale))
+    latencies, scores = [], []
+    for message, expected in DATASET:
+        start = time.perf_counter()
+        await router.ainvoke([SYSTEM, HumanMessage(content=message)])
+        latencies.append((time.perf_counter() - start) / time_scale)
+        # quality is judged on the route the turn really needed
+        scores.append(quality[policy[router.route([HumanMessage(content=message)])]][expected])
+
+    stats = router.stats()
+    return {
+        "latency_mean": statistics.mean(latencies),
+        "latency_p95": sorted(latencies)[int(0.95 * (len(latencies) - 1))],
+        "cost_per_1k_turns": sum(s["estimated_cost_usd"] for s in stats.values()) / len(DATASET) * 1000,
+        "quality": statistics.mean(scores),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--time-scale", type=float, default=0.02, help="fraction of real latency to sleep")
+    parser.add_argument("--quality", help="JSON file with {model: {route: score}}")
+    args = parser.parse_args()
+
+    quality = QUALITY
+    if args.quality:
+        with open(args.quality) as f:
+            quality = json.load(f)
+
+    correct = sum(classify_turn(message) == expected for message, expected in DATASET)
+    print(f"classifier accuracy: {correct}/{len(DATASET)}")
+    for message, expected in DATASET:
+        predicted = classify_turn(message)
+        if predicted != expected:
+            print(f"  misrouted: {message!r} -> {predicted} (expected {expected})")
+
+    print(f"\n{'policy':<10} {'mean s':>8} {'p95 s':>8} {'$/1k turns':>11} {'quality':>8}")
+    for policy_name in POLICIES:
+        result = asyncio.run(evaluate(policy_name, args.time_scale, quality))
+        print(
+            f"{policy_name:<10} {result['latency_mean']:>8.2f} {result['latency_p95']:>8.2f} "
+            f"{result['cost_per_1k_turns']:>11.3f} {result['quality']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
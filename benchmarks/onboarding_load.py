@@ -0,0 +1,111 @@
+"""
+Load test for /api/onboarding/chat with a simulated LLM.
+
+Each simulated user sends requests back to back; the fake agent takes
+--latency seconds per call. Compares the async, concurrency-bounded handler in
+main.app against the previous sync handler, which ran `invoke` on Starlette's
+threadpool and therefore plateaued at the pool size (40 threads).
+
+    PYTHONPATH=backend python -m benchmarks.onboarding_load [--latency 0.2]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+from fastapi import FastAPI
+from langchain_core.messages import AIMessage
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+ENVELOPE = (
+    '{"status":"question","currentStepId":"display_name",'
+    '"payload":{"kind":"text","id":"display_name","prompt":"What would you like us to call you?"}}'
+)
+
+
+class SimulatedAgent:
+    """Stands in for the onboarding agent; every call takes `latency` seconds"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def invoke(self, state, config=None):
+        time.sleep(self.latency)
+        return {"messages": [AIMessage(content=ENVELOPE)]}
+
+    async def ainvoke(self, state, config=None):
+        await asyncio.sleep(self.latency)
+        return {"messages": [AIMessage(content=ENVELOPE)]}
+
+
+def build_threadpool_app(agent: SimulatedAgent) -> FastAPI:
+    """The pre-async handler: a plain def calling the blocking invoke"""
+    legacy = FastAPI()
+
+    @legacy.post("/api/onboarding/chat")
+    def chat(request: dict):
+        response = agent.invoke({"messages": [{"role": "user", "content": request["message"]}]})
+        return {"data": response["messages"][-1].content}
+
+    return legacy
+
+
+async def drive(app, users: int, requests_per_user: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    statuses = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def user(i: int):
+            for _ in range(requests_per_user):
+                r = await client.post(
+                    "/api/onboarding/chat",
+                    json={"message": "Hello"},
+                    headers={"X-User-Id": f"user-{i}"},
+                )
+                statuses.append(r.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[user(i) for i in range(users)])
+        elapsed = time.perf_counter() - start
+
+    ok = statuses.count(200)
+    return {"rps": ok / elapsed, "ok": ok, "rejected": statuses.count(429)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated LLM latency (s)")
+    parser.add_argument("--requests-per-user", type=int, default=3)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 40, 100, 200])
+    parser.add_argument("--max-concurrency", type=int, default=256)
+    args = parser.parse_args()
+
+    import app.api.onboarding as onboarding
+    from app.core.concurrency import ConcurrencyLimiter
+    from app.core.rate_limit import RateLimiter
+    from main import app
+
+    agent = SimulatedAgent(args.latency)
+    onboarding.get_onboarding_agent = lambda: agent
+    legacy = build_threadpool_app(agent)
+
+    print(f"simulated LLM latency {args.latency * 1000:.0f} ms, {args.requests_per_user} requests/user")
+    print(f"{'users':>6} {'threadpool rps':>15} {'async rps':>10} {'429s':>6}")
+    for users in args.users:
+        onboarding.onboarding_limiter = ConcurrencyLimiter(
+            max_concurrent=args.max_concurrency, max_per_user=2, max_queue=1024
+        )
+        # measure throughput, not the per-user budgets
+        onboarding.onboarding_rate_limiter = RateLimiter(
+            "onboarding", requests_per_minute=1e9, request_burst=1e9, tokens_per_minute=1e12
+        )
+        before = asyncio.run(drive(legacy, users, args.requests_per_user))
+        after = asyncio.run(drive(app, users, args.requests_per_user))
+        print(f"{users:>6} {before['rps']:>15.1f} {after['rps']:>10.1f} {after['rejected']:>6}")
+
+
+if __name__ == "__main__":
+    main()
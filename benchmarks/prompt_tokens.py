@@ -0,0 +1,120 @@
+"""
+Prompt tokens per onboarding turn, and how many of them are cacheable.
+
+Replays a scripted onboarding conversation through the prompt assembly used by
+the onboarding agent and, for each turn, reports total prompt tokens and the
+part that is a byte-identical prefix of an earlier request (what OpenAI's
+prompt cache can serve: prompts >= 1024 tokens, matched in 128-token steps).
+For comparison, the "inlined" layout puts the session details at the top of
+the system prompt, which breaks the shared prefix for every new session.
+
+Also compares the agent's output per turn: the full envelope with every step
+it used to re-emit, against the delta the server now assembles it from
+(app.core.onboarding_steps). Output tokens are generated one by one, so they
+dominate a turn's latency.
+
+    PYTHONPATH=backend python -m benchmarks.prompt_tokens
+"""
+
+import json
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.core.prompt import ONBOARDING_AGENT_PROMPT, build_onboarding_system_messages
+from app.core.tokens import MESSAGE_OVERHEAD_TOKENS, count_tokens
+
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+ANSWERS = ["Hello", "WJ", "1990-05-10", "male", "180", "5", "CrossFit", "Dumbbells", "Weekday evenings, 1 hour", "None", "yes"]
+STEP_IDS = ["display_name", "birthday", "sex", "height", "training_experience",
+            "training_style", "equipment", "availability", "limitations", "review"]
+# the previous assistant reply: the full JSON envelope with every step
+ENVELOPE = json.dumps({
+    "sessionId": "session",
+    "status": "question",
+    "currentStepId": "height",
+    "steps": [
+        {"id": step, "stepDisplayName": step.replace("_", " ").title(), "title": step.replace("_", " ").title(),
+         "question": f"What is your {step.replace('_', ' ')}?", "answer": None, "status": "upcoming"}
+        for step in STEP_IDS
+    ],
+    "payload": {"kind": "text", "id": "height", "prompt": "How tall are you (cm)?", "required": True},
+}, indent=2)
+# the assistant reply now: only what changed this turn
+DELTA = json.dumps({
+    "status": "question",
+    "currentStepId": "height",
+    "answers": {"sex": "Male"},
+    "payload": {"kind": "text", "id": "height", "prompt": "How tall are you (cm)?", "required": True},
+}, indent=2)
+
+
+def _serialize(messages):
+    """Per-message token counts, in prompt order"""
+    return [count_tokens(m.content) + MESSAGE_OVERHEAD_TOKENS for m in messages]
+
+
+def _cacheable(tokens, previous_prompts):
+    """Longest prefix (in whole messages) shared with an earlier prompt, cache-rounded"""
+    best = 0
+    for earlier in previous_prompts:
+        shared = 0
+        for (content, size), (other_content, _) in zip(tokens, earlier):
+            if content != other_content:
+                break
+            shared += size
+        best = max(best, shared)
+    if best < CACHE_MIN_TOKENS:
+        return 0
+    return best - best % CACHE_BLOCK_TOKENS
+
+
+def replay(layout, session_id, history_prompts, reply=DELTA):
+    """Run one session; returns per-turn (prompt tokens, cacheable tokens)"""
+    conversation = []
+    rows = []
+    for answer in ANSWERS:
+        conversation.append(HumanMessage(content=answer))
+        if layout == "split":
+            system = build_onboarding_system_messages(session_id)
+        else:
+            system = [SystemMessage(content=f"sessionId: {session_id}\n" + ONBOARDING_AGENT_PROMPT)]
+        messages = system + conversation
+        sized = list(zip([m.content for m in messages], _serialize(messages)))
+        total = sum(size for _, size in sized)
+        rows.append((total, _cacheable(sized, history_prompts)))
+        history_prompts.append(sized)
+        conversation.append(AIMessage(content=reply))
+    return rows
+
+
+def main() -> None:
+    print(f"static prompt: {count_tokens(ONBOARDING_AGENT_PROMPT)} tokens")
+    for layout in ["inlined", "split"]:
+        history = []
+        replay(layout, "session-a", history)  # another user's session warms the cache
+        rows = replay(layout, "session-b", history)
+        total = sum(r[0] for r in rows)
+        cached = sum(r[1] for r in rows)
+        print(f"\n{layout} layout, new session after another session:")
+        print(f"{'turn':>4} {'prompt':>8} {'cacheable':>10} {'uncached':>9}")
+        for turn, (prompt, cacheable) in enumerate(rows, 1):
+            print(f"{turn:>4} {prompt:>8} {cacheable:>10} {prompt - cacheable:>9}")
+        print(f"total {total} prompt tokens, {cached} cacheable ({cached / total:.0%}), {total - cached} uncached")
+
+    print("\nagent reply per turn (split layout, new session):")
+    print(f"{'reply':>8} {'output':>8} {'prompt total':>13} {'uncached':>9}")
+    for name, reply in [("envelope", ENVELOPE), ("delta", DELTA)]:
+        history = []
+        replay("split", "session-a", history, reply)
+        rows = replay("split", "session-b", history, reply)
+        total = sum(r[0] for r in rows)
+        print(f"{name:>8} {count_tokens(reply):>8} {total:>13} {total - sum(r[1] for r in rows):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Loading the session sidebar: N+1 message reads vs one summary query.
+
+Seeds a StubPostgREST with --sessions sessions of --messages messages each,
+written through create_messages so append_messages maintains the summary
+columns, then times two ways of listing sessions with a preview and a message
+count: the session list followed by get_session_messages per session, and
+get_user_chat_session_summaries_page. --latency adds a fixed delay per stub
+request to stand in for the network round trip to Supabase.
+
+    PYTHONPATH=backend python -m benchmarks.session_list [--sessions 20] [--latency 0.005]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from benchmarks.stubs import StubPostgREST
+
+STUB_KEY = "stub-service-key"
+
+
+async def _seed(user_id: uuid.UUID, sessions: int, messages: int) -> None:
+    from app.db.client import create_chat_session, create_messages
+
+    for i in range(sessions):
+        session = await create_chat_session(user_id, f"Session {i}")
+        await create_messages(session.id, [
+            {"role": "user" if j % 2 == 0 else "assistant", "content": f"Synthetic coaching message {j}. " * 8}
+            for j in range(messages)
+        ])
+
+
+async def _timed(stub: StubPostgREST, label: str, runs: int, call) -> None:
+    requests = stub.request_count
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = await call()
+    elapsed = (time.perf_counter() - start) / runs
+    per_run = (stub.request_count - requests) // runs
+    print(f"{label:<32} {elapsed * 1000:9.2f} ms   {per_run:4d} requests   {result} sessions")
+
+
+async def run(stub: StubPostgREST, sessions: int, messages: int, runs: int) -> None:
+    from app.db.client import get_session_messages, get_user_chat_session_summaries_page, get_user_chat_sessions_page
+
+    user_id = uuid.uuid4()
+    await _seed(user_id, sessions, messages)
+
+    async def n_plus_one():
+        page = await get_user_chat_sessions_page(user_id, limit=sessions)
+        for session in page.sessions:
+            history = await get_session_messages(session.id)
+            _ = (len(history), history[-1].content[:120] if history else None)
+        return len(page.sessions)
+
+    async def summaries():
+        return len((await get_user_chat_session_summaries_page(user_id, limit=sessions)).sessions)
+
+    await _timed(stub, "list + messages per session", runs, n_plus_one)
+    await _timed(stub, "summary query", runs, summaries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubPostgREST(latency=args.latency) as stub:
+        os.environ["SUPABASE_URL"] = stub.url
+        os.environ["SUPABASE_KEY"] = STUB_KEY
+        asyncio.run(run(stub, args.sessions, args.messages, args.runs))
+
+
+if __name__ == "__main__":
+    main()
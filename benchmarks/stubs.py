@@ -0,0 +1,544 @@
+"""
+Local stand-ins for external services used by the benchmarks and tests.
+
+StubPostgREST speaks enough of the PostgREST wire protocol (the API behind
+Supabase's ``/rest/v1``) for ``app.db.client``: in-memory tables, ``eq``/``gt``/
+``lt``-style filters (also inside ``or``/``and`` groups), ``order``, ``limit``
+and ``select`` projection, plus the ``append_messages`` and ``upsert_user_profile``
+RPCs from schema.sql. An optional per-request delay simulates network
+round-trip time.
+
+StubOpenAI is an OpenAI-compatible ``/v1/chat/completions`` server (plain,
+streaming and structured output) with configurable latency, generation speed
+and token counts, for exercising the real ChatOpenAI client end to end. It can
+also fail its first requests and slow down chosen ones, to exercise retries,
+deadlines and hedging.
+
+StubChatModel stands in for a chat model (``invoke``/``ainvoke``) with a
+latency profile of time-to-first-token plus generation speed, and reports
+token usage like the real client does.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+REST_PREFIX = "/rest/v1/"
+
+_OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a is not None and a > b,
+    "gte": lambda a, b: a is not None and a >= b,
+    "lt": lambda a, b: a is not None and a < b,
+    "lte": lambda a, b: a is not None and a <= b,
+}
+
+
+def _coerce(value: str) -> Any:
+    if value == "null":
+        return None
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _split_top_level(expression: str) -> List[str]:
+    """Split a logic-tree list on commas that are not nested in parentheses or quotes"""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+
+def _matches_tree(row: Dict[str, Any], combine: str, expression: str) -> bool:
+    """Evaluate ``or=(...)`` / ``and=(...)`` filters"""
+    results = []
+    for term in _split_top_level(expression[1:-1]):
+        if term.startswith(("or(", "and(")):
+            nested, _, inner = term.partition("(")
+            results.append(_matches_tree(row, nested, "(" + inner))
+        else:
+            column, _, condition = term.partition(".")
+            results.append(_matches(row, column, condition))
+    return any(results) if combine == "or" else all(results)
+
+
+def _matches(row: Dict[str, Any], column: str, expression: str) -> bool:
+    if column in ("or", "and"):
+        return _matches_tree(row, column, expression)
+    op, _, raw = expression.partition(".")
+    if op == "in":
+        values = [v.strip('"') for v in raw.strip("()").split(",")]
+        return str(row.get(column)) in values
+    if op == "is":
+        return row.get(column) is None if raw == "null" else str(row.get(column)).lower() == raw
+    compare = _OPERATORS.get(op)
+    if compare is None:
+        raise ValueError(f"Unsupported operator: {op}")
+    cell = row.get(column)
+    return compare(None if cell is None else str(cell), _coerce(raw))
+
+
+class _Server(ThreadingHTTPServer):
+    # the default backlog of 5 drops connects when many clients open at once,
+    # which stalls them for a SYN retransmit (~1s)
+    request_queue_size = 128
+
+
+# column defaults from schema.sql that rows inserted through the API rely on
+_TABLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "chat_sessions": {"message_count": 0},
+}
+
+
+class StubPostgREST:
+    """In-memory PostgREST server running on a background thread"""
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.request_count = 0
+        self.profile_writes = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubPostgREST":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubPostgREST":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ---- query evaluation ----
+
+    def _select(self, table: str, params: List[tuple]) -> List[Dict[str, Any]]:
+        rows = list(self.tables.get(table, []))
+        order = None
+        limit = None
+        columns = None
+        for name, value in params:
+            if name == "select":
+                columns = None if value == "*" else value.split(",")
+            elif name == "order":
+                order = value
+            elif name == "limit":
+                limit = int(value)
+            elif name == "offset":
+                rows = rows[int(value):]
+            else:
+                rows = [row for row in rows if _matches(row, name, value)]
+
+        if order:
+            for clause in reversed(order.split(",")):
+                parts = clause.split(".")
+                column, desc = parts[0], "desc" in parts[1:]
+                rows.sort(key=lambda row: (row.get(column) is None, str(row.get(column))), reverse=desc)
+        if limit is not None:
+            rows = rows[:limit]
+        if columns:
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+        return rows
+
+    def _insert(self, table: str, body: Any) -> List[Dict[str, Any]]:
+        records = body if isinstance(body, list) else [body]
+        inserted = []
+        for record in records:
+            row = {"id": str(uuid.uuid4()), "created_at": datetime.now().isoformat()}
+            row.update(_TABLE_DEFAULTS.get(table, {}))
+            row.update(record)
+            self.tables.setdefault(table, []).append(row)
+            inserted.append(dict(row))
+        return inserted
+
+    def _append_messages(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Stand-in for the append_messages SQL function"""
+        session_id = body["p_session_id"]
+        existing = {row["id"] for row in self.tables.get("messages", [])}
+        records = [
+            {**message, "session_id": session_id}
+            for message in body["p_messages"] if message.get("id") not in existing
+        ]
+        inserted = self._insert("messages", records)
+        now = datetime.now().isoformat()
+        for row in self.tables.get("chat_sessions", []):
+            if row["id"] == session_id:
+                row["last_activity_at"] = now
+                row["message_count"] = row.get("message_count", 0) + len(inserted)
+                if inserted:
+                    latest = max(inserted, key=lambda message: message["created_at"])
+                    if latest["created_at"] >= (row.get("last_message_at") or ""):
+                        row["last_message_preview"] = latest["content"][:120]
+                        row["last_message_role"] = latest["role"]
+                        row["last_message_at"] = latest["created_at"]
+        return inserted
+
+    def _upsert_user_profile(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Stand-in for the upsert_user_profile SQL function"""
+        profile, key = body["p_profile"], body["p_idempotency_key"]
+        now = datetime.now().isoformat()
+        rows = self.tables.setdefault("user_profiles", [])
+        for row in rows:
+            if row["user_id"] == profile["user_id"]:
+                if row.get("idempotency_key") != key:
+                    row.update(profile, idempotency_key=key, updated_at=now)
+                    self.profile_writes += 1
+                return [dict(row)]
+        row = {**profile, "idempotency_key": key, "created_at": now, "updated_at": now}
+        rows.append(row)
+        self.profile_writes += 1
+        return [dict(row)]
+
+    def _rpc(self, name: str, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if name == "append_messages":
+            return self._append_messages(body)
+        if name == "upsert_user_profile":
+            return self._upsert_user_profile(body)
+        raise ValueError(f"Unknown function: {name}")
+
+    def _filtered(self, table: str, params: List[tuple]) -> List[Dict[str, Any]]:
+        filters = [(n, v) for n, v in params if n not in ("select", "order", "limit", "offset")]
+        return [
+            row for row in self.tables.get(table, [])
+            if all(_matches(row, n, v) for n, v in filters)
+        ]
+
+    def _update(self, table: str, params: List[tuple], body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows = self._filtered(table, params)
+        for row in rows:
+            row.update(body)
+        return [dict(row) for row in rows]
+
+    def _delete(self, table: str, params: List[tuple]) -> List[Dict[str, Any]]:
+        rows = self._filtered(table, params)
+        ids = {id(row) for row in rows}
+        self.tables[table] = [row for row in self.tables.get(table, []) if id(row) not in ids]
+        return rows
+
+    def handle(self, method: str, path: str, body: Any) -> List[Dict[str, Any]]:
+        parts = urlsplit(path)
+        table = parts.path[len(REST_PREFIX):].strip("/")
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        with self._lock:
+            self.request_count += 1
+            if method == "GET":
+                return self._select(table, params)
+            if method == "POST" and table.startswith("rpc/"):
+                return self._rpc(table[len("rpc/"):], body)
+            if method == "POST":
+                return self._insert(table, body)
+            if method == "PATCH":
+                return self._update(table, params, body)
+            if method == "DELETE":
+                return self._delete(table, params)
+        raise ValueError(f"Unsupported method: {method}")
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _respond(self, method: str) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if stub.latency:
+                    time.sleep(stub.latency)
+                try:
+                    data = stub.handle(method, self.path, json.loads(raw) if raw else None)
+                    status, payload = 200, json.dumps(data).encode()
+                except Exception as e:
+                    status, payload = 400, json.dumps({"message": str(e), "code": "stub"}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def do_PATCH(self):
+                self._respond("PATCH")
+
+            def do_DELETE(self):
+                self._respond("DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class StubChatModel:
+    """Offline chat model with a fixed latency profile and canned replies"""
+
+    def __init__(
+        self,
+        name: str,
+        first_token_latency: float = 0.0,
+        tokens_per_second: float = 0.0,
+        reply_tokens=50,
+    ):
+        self.name = name
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        # fixed count, or a callable deciding the reply length from the prompt
+        self.reply_tokens = reply_tokens
+        self.calls = 0
+
+    def _reply(self, messages) -> tuple:
+        from langchain_core.messages import AIMessage
+
+        from app.core.tokens import count_message_tokens
+
+        self.calls += 1
+        reply_tokens = self.reply_tokens(messages) if callable(self.reply_tokens) else self.reply_tokens
+        prompt_tokens = count_message_tokens(messages)
+        delay = self.first_token_latency
+        if self.tokens_per_second:
+            delay += reply_tokens / self.tokens_per_second
+        message = AIMessage(
+            content="ok " * reply_tokens,
+            response_metadata={"model_name": self.name},
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": reply_tokens,
+                "total_tokens": prompt_tokens + reply_tokens,
+            },
+        )
+        return message, delay
+
+    def invoke(self, messages, **kwargs):
+        message, delay = self._reply(messages)
+        time.sleep(delay)
+        return message
+
+    async def ainvoke(self, messages, **kwargs):
+        message, delay = self._reply(messages)
+        await asyncio.sleep(delay)
+        return message
+
+
+class StubOpenAI:
+    """OpenAI-compatible chat completions server running on a background thread"""
+
+    def __init__(
+        self,
+        reply=None,
+        first_token_latency: float = 0.0,
+        tokens_per_second: float = 0.0,
+        chunk_tokens: int = 4,
+        cached_prompt_tokens: int = 0,
+        failures: int = 0,
+        failure_status: int = 503,
+        extra_latency=None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        # reply(request_body) -> assistant text; defaults to a short fixed answer
+        self.reply = reply or (lambda body: "Sure, here is a short answer.")
+        # the first `failures` requests are answered with `failure_status`
+        self.failures = failures
+        self.failure_status = failure_status
+        # extra_latency(request_number) -> seconds added before answering (numbers start at 1)
+        self.extra_latency = extra_latency or (lambda number: 0.0)
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = chunk_tokens
+        self.cached_prompt_tokens = cached_prompt_tokens
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as OPENAI_BASE_URL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubOpenAI":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOpenAI":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ---- completions ----
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        # ~4 characters per token, keeping whitespace so chunks re-join exactly
+        return [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+
+    def _usage(self, body: Dict[str, Any], completion_tokens: int) -> Dict[str, Any]:
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in body.get("messages", []))
+        prompt_tokens = prompt_chars // 4 + 4 * len(body.get("messages", []))
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": min(self.cached_prompt_tokens, prompt_tokens)},
+        }
+
+    def _forced_tool(self, body: Dict[str, Any]) -> Optional[str]:
+        """Tool the request forces (structured output via function calling)"""
+        choice = body.get("tool_choice")
+        if isinstance(choice, dict):
+            return choice.get("function", {}).get("name")
+        tools = body.get("tools") or []
+        if choice == "required" and tools:
+            return tools[0]["function"]["name"]
+        return None
+
+    def _content(self, body: Dict[str, Any]) -> str:
+        """Reply text, wrapped as {"result": ...} when a JSON response format is requested"""
+        text = self.reply(body)
+        if (body.get("response_format") or {}).get("type") in ("json_schema", "json_object"):
+            return json.dumps({"result": text})
+        return text
+
+    def completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        tool = self._forced_tool(body)
+        text = self.reply(body) if tool else self._content(body)
+        message: Dict[str, Any] = {"role": "assistant", "content": text}
+        finish_reason = "stop"
+        if tool:
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": tool, "arguments": json.dumps({"result": text})},
+                }],
+            }
+            finish_reason = "tool_calls"
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+            "usage": self._usage(body, len(self._tokens(text))),
+        }
+
+    def _delay(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _send_json(self, status: int, data: Any) -> None:
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, body: Dict[str, Any]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                base = {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                }
+                tokens = stub._tokens(stub._content(body))
+                time.sleep(stub.first_token_latency)
+                for i in range(0, len(tokens), stub.chunk_tokens):
+                    piece = "".join(tokens[i:i + stub.chunk_tokens])
+                    delta = {"content": piece, **({"role": "assistant"} if i == 0 else {})}
+                    chunk = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                    self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                    time.sleep(stub._delay(stub.chunk_tokens))
+                done = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                self._send_chunk(f"data: {json.dumps(done)}\n\n".encode())
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    usage = {**base, "choices": [], "usage": stub._usage(body, len(tokens))}
+                    self._send_chunk(f"data: {json.dumps(usage)}\n\n".encode())
+                self._send_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                with stub._lock:
+                    stub.request_count += 1
+                    number = stub.request_count
+                time.sleep(stub.extra_latency(number))
+                if number <= stub.failures:
+                    self._send_json(stub.failure_status, {"error": {"message": "Injected failure", "type": "server_error"}})
+                    return
+                if body.get("stream"):
+                    self._stream(body)
+                    return
+                response = stub.completion(body)
+                time.sleep(stub.first_token_latency + stub._delay(response["usage"]["completion_tokens"]))
+                self._send_json(200, response)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
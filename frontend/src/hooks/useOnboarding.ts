@@ -40,7 +40,7 @@ const useOnboarding = () => {
                 }),
             });
             const { data } = await response.json();
-            setData(JSON.parse(data));
+            setData(data);
         }
         fetchData();
     }, []);
@@ -0,0 +1,98 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.stubs import StubPostgREST
+from main import app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Main app talking to a local PostgREST stub"""
+    with StubPostgREST() as stub:
+        monkeypatch.setenv("SUPABASE_URL", stub.url)
+        monkeypatch.setenv("SUPABASE_KEY", "stub-service-key")
+        with TestClient(app) as test_client:
+            yield test_client, stub
+
+
+def _session_row(session_id, user_id):
+    return {"id": session_id, "user_id": user_id, "title": "Chat",
+            "created_at": "2025-01-01T00:00:00", "last_activity_at": "2025-01-01T00:00:00"}
+
+
+def test_message_history_pages_backwards(client):
+    test_client, stub = client
+    user_id = str(uuid.uuid4())
+    session_id = str(uuid.uuid4())
+    stub.tables["chat_sessions"] = [_session_row(session_id, user_id)]
+    stub.tables["messages"] = [
+        {"id": str(uuid.uuid4()), "session_id": session_id, "role": "user",
+         "content": f"message {i}", "created_at": f"2025-01-01T00:00:{i:02d}"}
+        for i in range(5)
+    ]
+
+    latest = test_client.get(
+        f"/api/chat/sessions/{session_id}/messages", params={"limit": 3}, headers={"X-User-Id": user_id},
+    ).json()
+    older = test_client.get(
+        f"/api/chat/sessions/{session_id}/messages",
+        params={"limit": 3, "before": latest["next_cursor"]},
+        headers={"X-User-Id": user_id},
+    ).json()
+
+    assert [m["content"] for m in latest["messages"]] == ["message 2", "message 3", "message 4"]
+    assert [m["content"] for m in older["messages"]] == ["message 0", "message 1"]
+    assert older["next_cursor"] is None
+
+
+def test_messages_are_only_listed_for_the_session_owner(client):
+    test_client, stub = client
+    owner = str(uuid.uuid4())
+    session_id = str(uuid.uuid4())
+    stub.tables["chat_sessions"] = [_session_row(session_id, owner)]
+    url = f"/api/chat/sessions/{session_id}/messages"
+
+    assert test_client.get(url).status_code == 422
+    assert test_client.get(url, headers={"X-User-Id": str(uuid.uuid4())}).status_code == 403
+    assert test_client.get(
+        f"/api/chat/sessions/{uuid.uuid4()}/messages", headers={"X-User-Id": owner},
+    ).status_code == 404
+    assert test_client.get(url, headers={"X-User-Id": owner}).status_code == 200
+
+
+def test_sessions_require_user_and_valid_cursor(client):
+    test_client, _ = client
+
+    assert test_client.get("/api/chat/sessions").status_code == 422
+    assert test_client.get("/api/chat/sessions", headers={"X-User-Id": "not-a-uuid"}).status_code == 422
+    response = test_client.get(
+        "/api/chat/sessions",
+        params={"before": "bogus"},
+        headers={"X-User-Id": str(uuid.uuid4())},
+    )
+    assert response.status_code == 400
+
+
+def test_session_list_has_previews_in_one_query(client):
+    """Each page of the session list is one database request, however many sessions it holds"""
+    test_client, stub = client
+    user_id = str(uuid.uuid4())
+    stub.tables["chat_sessions"] = [
+        {"id": str(uuid.uuid4()), "user_id": user_id, "title": f"session {i}",
+         "created_at": f"2025-01-01T00:00:{i:02d}", "last_activity_at": f"2025-01-01T00:01:{i:02d}",
+         "message_count": 2,
+         "last_message_preview": f"answer {i}", "last_message_role": "assistant",
+         "last_message_at": f"2025-01-01T00:01:{i:02d}"}
+        for i in range(10)
+    ]
+
+    response = test_client.get("/api/chat/sessions", params={"limit": 10}, headers={"X-User-Id": user_id})
+
+    assert stub.request_count == 1
+    newest = response.json()["sessions"][0]
+    assert newest["title"] == "session 9"
+    assert newest["message_count"] == 2
+    assert newest["last_message_preview"] == "answer 9"
+    assert newest["last_message_role"] == "assistant"
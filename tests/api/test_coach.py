@@ -0,0 +1,127 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+
+import app.core.health_agent as health_agent
+from benchmarks.stubs import StubPostgREST
+from main import app
+
+LLM_LATENCY = 0.2
+
+
+class EchoLLM:
+    """Fake chat model: answers after LLM_LATENCY with the history length it was sent"""
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(LLM_LATENCY)
+        return AIMessage(content=f"re: {messages[-1].content} ({len(messages)} messages)")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Main app with a fake coach model and a local PostgREST stub"""
+    monkeypatch.setattr(health_agent, "llm", EchoLLM())
+    with StubPostgREST() as stub:
+        monkeypatch.setenv("SUPABASE_URL", stub.url)
+        monkeypatch.setenv("SUPABASE_KEY", "stub-service-key")
+        with TestClient(app, headers={"X-User-Id": str(uuid.uuid4())}) as test_client:
+            yield test_client, stub
+
+
+def test_turns_keep_session_state_and_are_persisted(client):
+    test_client, stub = client
+
+    first = test_client.post("/api/coach/chat", json={"message": "I want to get stronger"}).json()
+    second = test_client.post(
+        "/api/coach/chat", json={"message": "Plan my week", "session_id": first["session_id"]},
+    ).json()
+
+    # system prompt + history: the second turn sees the first one
+    assert first["reply"] == "re: I want to get stronger (2 messages)"
+    assert second["reply"] == "re: Plan my week (4 messages)"
+    assert second["session_id"] == first["session_id"]
+    assert [m["content"] for m in stub.tables["messages"]] == [
+        "I want to get stronger", first["reply"], "Plan my week", second["reply"],
+    ]
+    assert len(stub.tables["chat_sessions"]) == 1
+
+
+def _session_row(session_id, user_id):
+    return {"id": session_id, "user_id": user_id, "title": "Earlier chat",
+            "created_at": "2025-01-01T00:00:00", "last_activity_at": "2025-01-01T00:00:00"}
+
+
+def test_history_is_restored_from_the_database(client):
+    """A session without a checkpoint (e.g. after a restart) continues from its stored messages"""
+    test_client, stub = client
+    session_id = str(uuid.uuid4())
+    stub.tables["chat_sessions"] = [_session_row(session_id, test_client.headers["X-User-Id"])]
+    stub.tables["messages"] = [
+        {"id": str(uuid.uuid4()), "session_id": session_id, "role": role, "content": content,
+         "created_at": f"2025-01-01T00:00:0{i}"}
+        for i, (role, content) in enumerate([("user", "hi"), ("assistant", "hello")])
+    ]
+
+    response = test_client.post("/api/coach/chat", json={"message": "again", "session_id": session_id}).json()
+
+    assert response["reply"] == "re: again (4 messages)"
+
+
+def test_sessions_are_served_concurrently(client):
+    """Many users' turns overlap on one worker instead of queueing behind each other"""
+    sessions = 20
+
+    async def run():
+        import httpx
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            # warm up this loop's database client first
+            await http.post("/api/coach/chat", json={"message": "warm up"}, headers={"X-User-Id": str(uuid.uuid4())})
+            start = time.perf_counter()
+            responses = await asyncio.gather(*[
+                http.post("/api/coach/chat", json={"message": f"user {i}"}, headers={"X-User-Id": str(uuid.uuid4())})
+                for i in range(sessions)
+            ])
+            return responses, time.perf_counter() - start
+
+    responses, elapsed = asyncio.run(run())
+
+    assert all(r.status_code == 200 for r in responses)
+    assert len({r.json()["session_id"] for r in responses}) == sessions
+    assert elapsed < LLM_LATENCY * 5, f"{sessions} sessions took {elapsed:.2f}s"
+
+
+def test_websocket_conversation(client):
+    test_client, _ = client
+
+    with test_client.websocket_connect("/api/coach/ws") as ws:
+        ws.send_json({"message": "hi"})
+        first = ws.receive_json()
+        ws.send_json({"message": "and now?"})
+        second = ws.receive_json()
+
+    assert first["reply"] == "re: hi (2 messages)"
+    assert second == {"reply": "re: and now? (4 messages)", "session_id": first["session_id"]}
+
+
+def test_sessions_of_other_users_are_refused(client):
+    """A turn names a session: unknown ids are 404, another user's session is 403 and left untouched"""
+    test_client, stub = client
+    session_id = str(uuid.uuid4())
+    stub.tables["chat_sessions"] = [_session_row(session_id, str(uuid.uuid4()))]
+
+    missing = test_client.post("/api/coach/chat", json={"message": "hi", "session_id": str(uuid.uuid4())})
+    foreign = test_client.post("/api/coach/chat", json={"message": "hi", "session_id": session_id})
+    with test_client.websocket_connect("/api/coach/ws") as ws:
+        ws.send_json({"message": "hi", "session_id": session_id})
+        refused = ws.receive_json()
+
+    assert missing.status_code == 404
+    assert foreign.status_code == 403
+    assert refused == {"error": "Chat session belongs to another user"}
+    assert stub.tables.get("messages", []) == []
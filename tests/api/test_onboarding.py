@@ -0,0 +1,518 @@
+import asyncio
+import json
+import uuid
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langgraph.prebuilt import create_react_agent
+
+import app.api.onboarding as onboarding
+from app.core.checkpointer import ConversationCheckpointer
+from app.core.concurrency import ConcurrencyLimiter
+from app.core import onboarding_steps
+from app.core.onboarding_steps import OnboardingProgress
+from app.core.onboarding_tools import ONBOARDING_TOOLS
+from app.core.rate_limit import RateLimiter
+from app.core.response_cache import ResponseCache
+from app.db import profiles
+from app.db.profiles import ProfileCache
+from main import app
+
+# what the agent sends: a delta the server turns into the full envelope
+ENVELOPE = json.dumps({
+    "status": "question",
+    "currentStepId": "display_name",
+    "answers": {},
+    "payload": {"kind": "text", "id": "display_name", "prompt": "What would you like us to call you?"},
+})
+
+
+def _assert_first_question(envelope, conversation_id):
+    """`envelope` is the server-assembled envelope for the ENVELOPE delta"""
+    assert envelope["sessionId"] == conversation_id
+    assert envelope["status"] == "question"
+    assert envelope["currentStepId"] == "display_name"
+    assert envelope["payload"] == json.loads(ENVELOPE)["payload"]
+    assert [step["status"] for step in envelope["steps"]] == ["current"] + ["upcoming"] * 9
+    assert envelope["paraphrasedAnswers"] == {}
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture(autouse=True)
+def empty_response_cache(monkeypatch):
+    """Each test starts without cached envelopes from earlier tests"""
+    monkeypatch.setattr(onboarding, "onboarding_cache", ResponseCache(version=onboarding.ONBOARDING_PROMPT_VERSION))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Main app with the onboarding agent backed by a fake streaming model"""
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=ENVELOPE)]))
+    agent = create_react_agent(model, tools=[])
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_chat_returns_envelope(client):
+    """The non-streaming endpoint still returns the whole envelope as `data`"""
+    response = client.post("/api/onboarding/chat", json={"message": "Hello"})
+
+    assert response.status_code == 200
+    _assert_first_question(response.json()["data"], response.json()["conversation_id"])
+
+
+def test_chat_stream_emits_tokens_then_done(client):
+    """The SSE endpoint streams partial tokens followed by the full envelope"""
+    response = client.post("/api/onboarding/chat/stream", json={"message": "Hello"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_sse(response.text)
+    tokens = [data["delta"] for event, data in events if event == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == ENVELOPE
+    assert events[-1][0] == "done"
+    _assert_first_question(events[-1][1]["data"], events[-1][1]["conversation_id"])
+
+
+def test_conversation_id_restores_history(monkeypatch):
+    """Turns sharing a conversation_id see the earlier messages, streamed or not"""
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=ENVELOPE) for _ in range(3)]))
+    agent = create_react_agent(model, tools=[], checkpointer=ConversationCheckpointer())
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+
+    with TestClient(app) as client:
+        first = client.post("/api/onboarding/chat", json={"message": "Hello"}).json()
+        conversation_id = first["conversation_id"]
+        client.post("/api/onboarding/chat/stream", json={"message": "WJ", "conversation_id": conversation_id})
+        client.post("/api/onboarding/chat", json={"message": "1990-05-10", "conversation_id": conversation_id})
+
+    state = agent.get_state({"configurable": {"thread_id": conversation_id}})
+    assert [m.content for m in state.values["messages"] if m.type == "human"] == ["Hello", "WJ", "1990-05-10"]
+    assert len(state.values["messages"]) == 6
+
+
+def test_chat_stream_reports_errors(client, monkeypatch):
+    """Agent failures surface as an `error` event instead of a broken stream"""
+    class FailingAgent:
+        async def astream(self, *args, **kwargs):
+            raise RuntimeError("upstream unavailable")
+            yield
+
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: FailingAgent())
+    response = client.post("/api/onboarding/chat/stream", json={"message": "Hello"})
+
+    assert _parse_sse(response.text) == [("error", {"detail": "upstream unavailable"})]
+
+
+class BlockingAgent:
+    """Agent whose calls stay in flight until `release` is set"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.started = 0
+
+    async def ainvoke(self, state, config=None):
+        self.started += 1
+        await self.release.wait()
+        return {"messages": [AIMessage(content=ENVELOPE)]}
+
+
+async def _saturate(monkeypatch, limiter, first_user, second_user):
+    agent = BlockingAgent()
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+    monkeypatch.setattr(onboarding, "onboarding_limiter", limiter)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = asyncio.create_task(
+            client.post("/api/onboarding/chat", json={"message": "Hi"}, headers={"X-User-Id": first_user})
+        )
+        while agent.started == 0:
+            await asyncio.sleep(0.01)
+        second = await client.post(
+            "/api/onboarding/chat", json={"message": "Hi"}, headers={"X-User-Id": second_user}
+        )
+        agent.release.set()
+        return await first, second
+
+
+@pytest.mark.asyncio
+async def test_chat_returns_429_when_saturated(monkeypatch):
+    """With every slot busy and no queue room, new calls get 429 + Retry-After"""
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_per_user=1, max_queue=0)
+
+    first, second = await _saturate(monkeypatch, limiter, "alice", "bob")
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert int(second.headers["Retry-After"]) >= 1
+    assert second.headers["X-Queue-Depth"] == "0"
+    assert limiter.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_chat_enforces_per_user_limit(monkeypatch):
+    """A user at their concurrency limit is rejected even when global slots are free"""
+    limiter = ConcurrencyLimiter(max_concurrent=10, max_per_user=1)
+
+    first, second = await _saturate(monkeypatch, limiter, "alice", "alice")
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+
+
+def test_chat_rate_limits_each_client(monkeypatch):
+    """A client over its request budget gets 429 + Retry-After; other clients are unaffected"""
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=ENVELOPE) for _ in range(2)]))
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: create_react_agent(model, tools=[]))
+    monkeypatch.setattr(onboarding, "onboarding_rate_limiter", RateLimiter("onboarding", request_burst=1, max_wait=0))
+
+    with TestClient(app) as client:
+        first = client.post("/api/onboarding/chat", json={"message": "Hi"}, headers={"X-User-Id": "alice"})
+        again = client.post("/api/onboarding/chat", json={"message": "Hi"}, headers={"X-User-Id": "alice"})
+        other = client.post("/api/onboarding/chat", json={"message": "Hi"}, headers={"X-User-Id": "bob"})
+        capacity = client.get("/api/onboarding/capacity").json()
+
+    assert (first.status_code, again.status_code, other.status_code) == (200, 429, 200)
+    assert int(again.headers["Retry-After"]) >= 1
+    assert capacity["rate_limit"]["rejected"] == 1
+    assert capacity["in_flight"] == 0
+
+
+class CountingAgent:
+    """Agent that answers ENVELOPE after a short delay and counts its runs"""
+
+    def __init__(self):
+        self.runs = 0
+
+    async def ainvoke(self, state, config=None):
+        self.runs += 1
+        await asyncio.sleep(0.05)
+        return {"messages": [AIMessage(content=ENVELOPE)]}
+
+
+async def _post_turns(turns):
+    """POST the (json, headers) turns to /chat concurrently"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*[
+            client.post("/api/onboarding/chat", json=body, headers=headers) for body, headers in turns
+        ])
+
+
+@pytest.mark.asyncio
+async def test_duplicate_submits_share_one_agent_call(monkeypatch):
+    """A double submit in a running conversation gets the first submit's reply"""
+    agent = CountingAgent()
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+    turn = {"message": "WJ", "conversation_id": "conversation-1"}
+
+    first, second = await _post_turns([(turn, {}), (turn, {})])
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert agent.runs == 1
+
+
+@pytest.mark.asyncio
+async def test_only_idempotent_retries_are_replayed(monkeypatch):
+    """A retry with the same Idempotency-Key gets the stored reply; a repeated answer without one runs again"""
+    agent = CountingAgent()
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+    keyed = {"Idempotency-Key": "submit-1"}
+
+    first, = await _post_turns([({"message": "Hello"}, keyed)])
+    retry, = await _post_turns([({"message": "Hello"}, keyed)])
+    assert retry.json()["conversation_id"] == first.json()["conversation_id"]
+    assert agent.runs == 1
+
+    turn = {"message": "None", "conversation_id": first.json()["conversation_id"]}
+    await _post_turns([(turn, {})])
+    await _post_turns([(turn, {})])
+    assert agent.runs == 3
+
+
+@pytest.mark.asyncio
+async def test_new_conversations_without_a_key_are_not_coalesced(monkeypatch):
+    """Clients behind one IP opening onboarding together get their own conversations"""
+    agent = CountingAgent()
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+
+    first, second = await _post_turns([({"message": "Hello"}, {}), ({"message": "Hello"}, {})])
+
+    assert first.json()["conversation_id"] != second.json()["conversation_id"]
+    assert agent.runs == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_duplicates_get_an_error_when_the_leader_disconnects(monkeypatch):
+    class StallingAgent:
+        async def astream(self, *args, **kwargs):
+            yield "messages", (AIMessageChunk(content="{"), {"langgraph_node": "agent"})
+            await asyncio.Event().wait()
+
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: StallingAgent())
+    flights = onboarding.onboarding_flights
+    flight = flights.start("turn")
+    joined = flights.join("turn")
+
+    tokens_before = await onboarding._acquire_onboarding_slot("alice")
+    leader = onboarding._stream_onboarding_events(
+        "WJ", "conversation-1", "alice", "cache-key", OnboardingProgress(), None, tokens_before, flight,
+    )
+    assert (await leader.__anext__()).startswith("event: token")
+    await leader.aclose()  # the leader's client went away
+
+    events = [event async for event in onboarding._shared_events(joined)]
+    assert len(events) == 1 and events[0].startswith("event: error")
+    assert onboarding.onboarding_limiter.stats()["in_flight"] == 0
+
+
+class FailingAgent:
+    """Agent stand-in that fails the test if the LLM would be called"""
+
+    async def ainvoke(self, state, config=None):
+        raise AssertionError("agent should not be called")
+
+    async def astream(self, *args, **kwargs):
+        raise AssertionError("agent should not be called")
+        yield
+
+
+def test_invalid_answer_is_rejected_without_llm_call(monkeypatch):
+    """Answers failing the STEP MAP rules get a validationError envelope locally"""
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: FailingAgent())
+
+    with TestClient(app) as client:
+        response = client.post("/api/onboarding/chat", json={"message": "I'm 300 cm", "step_id": "height"})
+        streamed = client.post("/api/onboarding/chat/stream", json={"message": "robot", "step_id": "sex"})
+
+    envelope = response.json()["data"]
+    assert envelope["status"] == "validationError"
+    assert envelope["payload"]["fieldId"] == "height"
+    assert envelope["sessionId"] == response.json()["conversation_id"]
+
+    events = _parse_sse(streamed.text)
+    assert [event for event, _ in events] == ["done"]
+    assert events[0][1]["data"]["currentStepId"] == "sex"
+
+
+def test_step_id_is_read_from_conversation_history(monkeypatch):
+    """Without an explicit step_id the last envelope's currentStepId is validated against"""
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=ENVELOPE)]))
+    agent = create_react_agent(model, tools=[], checkpointer=ConversationCheckpointer())
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+
+    with TestClient(app) as client:
+        conversation_id = client.post("/api/onboarding/chat", json={"message": "Hello"}).json()["conversation_id"]
+        response = client.post("/api/onboarding/chat", json={"message": "W", "conversation_id": conversation_id})
+
+    envelope = response.json()["data"]
+    assert envelope["status"] == "validationError"
+    assert envelope["currentStepId"] == "display_name"
+
+
+def test_repeated_turn_is_served_from_cache(monkeypatch):
+    """A turn seen before skips the LLM but still lands in the conversation history"""
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=ENVELOPE), AIMessage(content=ENVELOPE)]))
+    agent = create_react_agent(model, tools=[], checkpointer=ConversationCheckpointer())
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+
+    with TestClient(app) as client:
+        first = client.post("/api/onboarding/chat", json={"message": "Hello"}).json()
+        second = client.post("/api/onboarding/chat", json={"message": "  hello "}).json()
+        streamed = client.post("/api/onboarding/chat/stream", json={"message": "Hello"})
+        stats = client.get("/api/onboarding/cache").json()
+        # a new answer on the replayed conversation goes to the model with the full history
+        client.post("/api/onboarding/chat", json={"message": "WJ", "conversation_id": second["conversation_id"]})
+
+    assert first["conversation_id"] != second["conversation_id"]
+    assert second["data"]["sessionId"] == second["conversation_id"]
+    assert second["data"]["payload"] == json.loads(ENVELOPE)["payload"]
+    assert [event for event, _ in _parse_sse(streamed.text)] == ["done"]
+    assert stats["hits"] == 2
+
+    state = agent.get_state({"configurable": {"thread_id": second["conversation_id"]}})
+    assert [m.type for m in state.values["messages"]] == ["human", "ai", "human", "ai"]
+
+
+def _delta(step_id, answers=None):
+    return json.dumps({
+        "status": "question",
+        "currentStepId": step_id,
+        "answers": answers or {},
+        "payload": {"kind": "text", "id": step_id, "prompt": onboarding_steps.STEP_MAP[step_id][1]},
+    })
+
+
+def test_step_answer_is_cached_across_users(monkeypatch):
+    """Users with different earlier answers share the cached reply to the same `sex` answer"""
+    model = GenericFakeChatModel(messages=iter([
+        AIMessage(content=_delta("sex", {"display_name": "Alice"})),
+        AIMessage(content=_delta("height", {"sex": "Female"})),
+        AIMessage(content=_delta("sex", {"display_name": "Bob"})),
+    ]))
+    agent = create_react_agent(model, tools=[], checkpointer=ConversationCheckpointer())
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+
+    with TestClient(app) as client:
+        alice = client.post("/api/onboarding/chat", json={"message": "Alice"}).json()["conversation_id"]
+        client.post("/api/onboarding/chat", json={"message": "female", "conversation_id": alice})
+        bob = client.post("/api/onboarding/chat", json={"message": "Bob"}).json()["conversation_id"]
+        # the model has no reply left: this turn must come from the cache
+        response = client.post("/api/onboarding/chat", json={"message": "Female ", "conversation_id": bob})
+
+    envelope = response.json()["data"]
+    assert envelope["currentStepId"] == "height"
+    assert envelope["paraphrasedAnswers"] == {"display_name": "Bob", "sex": "Female"}
+    assert onboarding.onboarding_cache.stats()["hits"] == 1
+
+
+def test_review_reply_is_keyed_on_earlier_answers():
+    """The review summary repeats earlier answers, so it is only shared by identical progress"""
+    alice = OnboardingProgress({"display_name": "Alice"}, "review")
+    bob = OnboardingProgress({"display_name": "Bob"}, "review")
+
+    assert onboarding._response_cache_key("yes", "review", alice) != onboarding._response_cache_key("yes", "review", bob)
+    assert onboarding._response_cache_key("male", "sex", alice) == onboarding._response_cache_key("male", "sex", bob)
+
+
+def test_prompt_change_invalidates_cache(monkeypatch):
+    """Cached envelopes are dropped when the onboarding prompt version changes"""
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=ENVELOPE) for _ in range(2)]))
+    agent = create_react_agent(model, tools=[])
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+
+    with TestClient(app) as client:
+        client.post("/api/onboarding/chat", json={"message": "Hello"})
+        monkeypatch.setattr(onboarding, "ONBOARDING_PROMPT_VERSION", "edited")
+        client.post("/api/onboarding/chat", json={"message": "Hello"})
+
+    stats = onboarding.onboarding_cache.stats()
+    assert stats["hits"] == 0
+    assert stats["invalidations"] == 1
+    assert stats["version"] == "edited"
+
+
+def test_malformed_envelope_is_repaired(monkeypatch):
+    """A fenced envelope with a trailing comma is fixed locally, without asking the model again"""
+    broken = "```json\n" + ENVELOPE[:-1] + ",}\n```"
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=broken)]))
+    agent = create_react_agent(model, tools=[])
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+
+    with TestClient(app) as client:
+        response = client.post("/api/onboarding/chat", json={"message": "Hello"})
+
+    assert response.status_code == 200
+    _assert_first_question(response.json()["data"], response.json()["conversation_id"])
+
+
+def test_invalid_envelope_is_corrected_by_the_agent(monkeypatch):
+    """An unrepairable reply is sent back to the agent once, on the same conversation"""
+    model = GenericFakeChatModel(messages=iter([
+        AIMessage(content="Sure! What should we call you?"),
+        AIMessage(content=ENVELOPE),
+        AIMessage(content="Sorry, no envelope today."),
+        AIMessage(content="Still no envelope."),
+    ]))
+    agent = create_react_agent(model, tools=[], checkpointer=ConversationCheckpointer())
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+
+    with TestClient(app) as client:
+        corrected = client.post("/api/onboarding/chat", json={"message": "Hello"})
+        failed = client.post("/api/onboarding/chat", json={"message": "Hi"})
+
+    assert corrected.status_code == 200
+    _assert_first_question(corrected.json()["data"], corrected.json()["conversation_id"])
+    state = agent.get_state({"configurable": {"thread_id": corrected.json()["conversation_id"]}})
+    assert "not a valid JSON reply" in state.values["messages"][2].content
+
+    assert failed.status_code == 502
+    assert onboarding.onboarding_limiter.stats()["in_flight"] == 0
+
+
+def test_envelope_accumulates_answers_across_turns(monkeypatch):
+    """Answers from earlier deltas stay in the assembled steps without the agent repeating them"""
+    second = json.dumps({
+        "status": "question",
+        "currentStepId": "birthday",
+        "answers": {"display_name": "WJ"},
+        "payload": {"kind": "text", "id": "birthday", "prompt": "When were you born?"},
+    })
+    third = json.dumps({
+        "status": "question",
+        "currentStepId": "sex",
+        "answers": {"birthday": "10 May 1990"},
+        "payload": {"kind": "radio", "id": "sex", "prompt": "Sex / gender",
+                    "options": [{"value": "male", "label": "Male"}]},
+    })
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=m) for m in (ENVELOPE, second, third)]))
+    agent = create_react_agent(model, tools=[], checkpointer=ConversationCheckpointer())
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+
+    with TestClient(app) as client:
+        conversation_id = client.post("/api/onboarding/chat", json={"message": "Hello"}).json()["conversation_id"]
+        client.post("/api/onboarding/chat", json={"message": "WJ", "conversation_id": conversation_id})
+        streamed = client.post(
+            "/api/onboarding/chat/stream", json={"message": "1990-05-10", "conversation_id": conversation_id}
+        )
+
+    envelope = _parse_sse(streamed.text)[-1][1]["data"]
+    assert envelope["sessionId"] == conversation_id
+    assert envelope["paraphrasedAnswers"] == {"display_name": "WJ", "birthday": "10 May 1990"}
+    assert [(s["id"], s["status"]) for s in envelope["steps"][:3]] == [
+        ("display_name", "done"), ("birthday", "done"), ("sex", "current"),
+    ]
+
+
+class ToolCallingModel(GenericFakeChatModel):
+    """Fake model that accepts tools; its scripted replies carry the tool calls"""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def test_confirmed_review_saves_profile_and_completes(monkeypatch):
+    """`yes` on the review card runs both tools for the signed-in user, then answers `complete`"""
+    saved = []
+
+    async def writer(profile, idempotency_key):
+        saved.append(profile)
+        return profile.model_copy(update={"idempotency_key": idempotency_key})
+
+    async def loader(user_id):
+        return None
+
+    monkeypatch.setattr(profiles, "profile_cache", ProfileCache(loader=loader, writer=writer))
+    profile = {"display_name": "WJ", "sex": "male", "height_cm": 180}
+    complete = json.dumps({"status": "complete", "payload": {"redirect_path": "/dashboard"}})
+    model = ToolCallingModel(messages=iter([
+        AIMessage(content="", tool_calls=[{"name": "create_user_profile", "args": {"profile": profile}, "id": "call-1"}]),
+        AIMessage(content="", tool_calls=[{"name": "finish_onboarding", "args": {}, "id": "call-2"}]),
+        AIMessage(content=complete),
+    ]))
+    agent = create_react_agent(model, tools=ONBOARDING_TOOLS)
+    monkeypatch.setattr(onboarding, "get_onboarding_agent", lambda: agent)
+    user_id = str(uuid.uuid4())
+
+    with TestClient(app) as client:
+        response = client.post("/api/onboarding/chat", json={"message": "yes"}, headers={"X-User-Id": user_id})
+
+    envelope = response.json()["data"]
+    assert envelope["status"] == "complete"
+    assert envelope["payload"] == {"redirect_path": "/dashboard"}
+    assert [(str(p.user_id), p.display_name, p.height_cm) for p in saved] == [(user_id, "WJ", 180)]
@@ -1,6 +1,16 @@
+import os
+import sys
+
 import pytest
 from fastapi.testclient import TestClient
 
+# Make the backend package (`app`, `main`) importable from the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+# The agents build their OpenAI clients on import; tests never reach the real API
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ONBOARDING_CHECKPOINT_DB", ":memory:")
+os.environ.setdefault("HEALTH_COACH_CHECKPOINT_DB", ":memory:")
+
 from tests.test_app import app
 
 @pytest.fixture
@@ -8,3 +18,20 @@ def test_client():
     """Create a test client for FastAPI"""
     with TestClient(app) as client:
         yield client
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits(monkeypatch):
+    """Each test starts with full rate-limit buckets"""
+    from app.api import coach, onboarding
+    from app.core.rate_limit import InMemoryRateLimitBackend
+
+    for limiter in (onboarding.onboarding_rate_limiter, coach.coach_rate_limiter):
+        monkeypatch.setattr(limiter, "backend", InMemoryRateLimitBackend())
+
+@pytest.fixture(autouse=True)
+def fresh_single_flight(monkeypatch):
+    """Each test starts without in-flight or replayable onboarding turns"""
+    from app.api import onboarding
+    from app.core.single_flight import SingleFlight
+
+    monkeypatch.setattr(onboarding, "onboarding_flights", SingleFlight("onboarding"))
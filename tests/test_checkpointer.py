@@ -0,0 +1,88 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langgraph.prebuilt import create_react_agent
+
+from app.core.checkpointer import ConversationCheckpointer
+
+
+class CountingSerde:
+    """Wraps a serializer and counts how many messages it serializes"""
+
+    def __init__(self, serde):
+        self.serde = serde
+        self.messages_serialized = 0
+
+    def dumps_typed(self, obj):
+        if isinstance(obj, BaseMessage):
+            self.messages_serialized += 1
+        return self.serde.dumps_typed(obj)
+
+    def loads_typed(self, data):
+        return self.serde.loads_typed(data)
+
+
+def _agent(checkpointer, replies=5):
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=f"reply {i}") for i in range(replies)]))
+    return create_react_agent(model, tools=[], checkpointer=checkpointer)
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+@pytest.mark.asyncio
+async def test_history_is_restored_per_conversation():
+    """Each conversation id sees only its own earlier turns"""
+    agent = _agent(ConversationCheckpointer())
+
+    await agent.ainvoke({"messages": [("user", "hi")]}, _config("a"))
+    await agent.ainvoke({"messages": [("user", "other")]}, _config("b"))
+    result = await agent.ainvoke({"messages": [("user", "again")]}, _config("a"))
+
+    assert [m.content for m in result["messages"]] == ["hi", "reply 0", "again", "reply 2"]
+
+
+@pytest.mark.asyncio
+async def test_turn_only_serializes_new_messages():
+    """A turn appends its own messages instead of re-serializing the transcript"""
+    checkpointer = ConversationCheckpointer()
+    counting = CountingSerde(checkpointer.serde)
+    checkpointer.serde = counting
+    agent = _agent(checkpointer)
+
+    for text in ["one", "two", "three"]:
+        await agent.ainvoke({"messages": [("user", text)]}, _config("a"))
+    before = counting.messages_serialized
+    await agent.ainvoke({"messages": [("user", "four")]}, _config("a"))
+
+    assert counting.messages_serialized - before == 2
+    rows = checkpointer.conn.execute("SELECT COUNT(*) FROM checkpoint_messages").fetchone()[0]
+    assert rows == 8
+
+
+@pytest.mark.asyncio
+async def test_history_survives_restart(tmp_path):
+    """A fresh checkpointer (cold cache) reloads the conversation from SQLite"""
+    path = str(tmp_path / "checkpoints.sqlite3")
+    first = ConversationCheckpointer(path)
+    await _agent(first).ainvoke({"messages": [("user", "hi")]}, _config("a"))
+    first.close()
+
+    restarted = ConversationCheckpointer(path)
+    result = await _agent(restarted).ainvoke({"messages": [("user", "again")]}, _config("a"))
+
+    assert [m.content for m in result["messages"]] == ["hi", "reply 0", "again", "reply 0"]
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded():
+    """The in-memory front keeps at most cache_size conversations"""
+    checkpointer = ConversationCheckpointer(cache_size=2)
+    agent = _agent(checkpointer)
+
+    for thread_id in ["a", "b", "c"]:
+        await agent.ainvoke({"messages": [("user", "hi")]}, _config(thread_id))
+
+    assert [key[0] for key in checkpointer._cache] == ["b", "c"]
+    assert checkpointer.get_tuple(_config("a")) is not None
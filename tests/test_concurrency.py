@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.core.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
+
+
+@pytest.mark.asyncio
+async def test_waiters_get_slots_in_order():
+    """Callers beyond the global limit queue and are served FIFO"""
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_per_user=5, max_queue=5)
+    order = []
+
+    async def worker(name):
+        async with limiter.slot(name):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[worker(f"user-{i}") for i in range(4)])
+
+    assert order == ["user-0", "user-1", "user-2", "user-3"]
+    assert limiter.stats()["in_flight"] == 0
+    assert limiter.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected():
+    """Once the queue is full, new callers are rejected immediately"""
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_per_user=5, max_queue=1)
+    await limiter.acquire("a")
+    waiting = asyncio.create_task(limiter.acquire("b"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ConcurrencyLimitExceeded) as exc:
+        await limiter.acquire("c")
+
+    assert exc.value.queue_depth == 1
+    assert exc.value.retry_after >= 1
+    limiter.release("a")
+    await waiting
+    limiter.release("b")
+    assert limiter.stats() == {**limiter.stats(), "in_flight": 0, "queued": 0, "rejected": 1}
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_frees_user_slot():
+    """A caller that times out in the queue does not keep its per-user reservation"""
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_per_user=1, queue_timeout=0.01)
+    await limiter.acquire("a")
+
+    with pytest.raises(ConcurrencyLimitExceeded):
+        await limiter.acquire("b")
+
+    limiter.release("a")
+    await limiter.acquire("b")
+    assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_freed_slots_go_to_users_in_turn():
+    """A user with several queued calls does not get ahead of users who queued after them"""
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_per_user=5, max_queue=10)
+    await limiter.acquire("holder")
+    order = []
+
+    async def worker(name):
+        await limiter.acquire(name)
+        order.append(name)
+        limiter.release(name)
+
+    tasks = [asyncio.create_task(worker(name)) for name in ["a", "a", "a", "b", "c"]]
+    await asyncio.sleep(0)
+    limiter.release("holder")
+    await asyncio.gather(*tasks)
+
+    assert order == ["a", "b", "c", "a", "a"]
+    assert limiter.queued == 0
+    assert limiter.in_flight == 0
@@ -0,0 +1,87 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.core.context_window import ContextWindow
+from app.core.tokens import count_message_tokens
+
+SYSTEM = [SystemMessage(content="You are a helpful health coach. " * 10)]
+
+
+class CountingSummarizer:
+    """Stand-in summarizer that returns an over-long summary to exercise truncation"""
+
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, messages):
+        self.calls.append(messages)
+        return AIMessage(content=f"summary v{len(self.calls)} " + "goal: strength. " * 400)
+
+
+def _turn(i):
+    return [
+        HumanMessage(content=f"Question {i} about my training plan. " * (1 + i % 5)),
+        AIMessage(content=f"Answer {i}: do squats and rows. " * (2 + i % 7)),
+    ]
+
+
+def test_prompt_stays_within_budget_over_a_long_conversation():
+    summarizer = CountingSummarizer()
+    window = ContextWindow(summarizer, max_tokens=1000, summary_max_tokens=200)
+    messages, summary, summarized = [], "", 0
+
+    for i in range(300):
+        user, reply = _turn(i)
+        context = window.prepare(SYSTEM, messages + [user], summary, summarized)
+        assert count_message_tokens(context.prompt) <= 1000
+        assert context.prompt[-1] is user
+        messages += [user, reply]
+        summary, summarized = context.summary, context.summarized
+
+    # summaries are batched, and each one only sees the new messages
+    assert 0 < len(summarizer.calls) < 100
+    assert count_message_tokens(summarizer.calls[-1]) < 2000
+    assert summary.startswith(f"summary v{len(summarizer.calls)}")
+
+
+def test_short_conversation_is_sent_verbatim():
+    summarizer = CountingSummarizer()
+    window = ContextWindow(summarizer, max_tokens=1000)
+    messages = _turn(0) + [HumanMessage(content="and tomorrow?")]
+
+    context = window.prepare(SYSTEM, messages)
+
+    assert context.prompt == SYSTEM + messages
+    assert context.summarized == 0
+    assert summarizer.calls == []
+
+
+def test_window_starts_at_a_user_message():
+    window = ContextWindow(CountingSummarizer(), max_tokens=400, summary_max_tokens=50)
+    messages = [m for i in range(20) for m in _turn(i)] + [HumanMessage(content="next?")]
+
+    context = window.prepare(SYSTEM, messages)
+    verbatim = context.prompt[2:]
+
+    assert verbatim[0].type == "human"
+    assert context.summarized + len(verbatim) == len(messages)
+
+
+def test_health_agent_does_not_duplicate_history(monkeypatch):
+    """Each turn appends exactly one user and one assistant message"""
+    from app.core import health_agent
+
+    replies = iter([AIMessage(content=f"reply {i}") for i in range(3)])
+    monkeypatch.setattr(health_agent, "llm", GenericFakeChatModel(messages=replies))
+
+    state = {"messages": []}
+    for text in ["hi", "plan my week", "thanks"]:
+        state = asyncio.run(health_agent.agent.ainvoke(
+            {**state, "messages": list(state["messages"]) + [HumanMessage(content=text)]}
+        ))
+
+    assert [m.content for m in state["messages"]] == [
+        "hi", "reply 0", "plan my week", "reply 1", "thanks", "reply 2",
+    ]
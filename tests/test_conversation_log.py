@@ -0,0 +1,72 @@
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.core.conversation_log import ConversationLog
+
+
+def _turns(count):
+    messages = []
+    for i in range(count):
+        messages += [HumanMessage(content=f"question {i}"), AIMessage(content=f"answer {i}\nwith a second line")]
+    return messages
+
+
+def test_round_trip_and_last_n(tmp_path):
+    """Multi-line messages survive; load_last returns only the tail"""
+    path = str(tmp_path / "history.jsonl")
+    with ConversationLog(path) as log:
+        assert log.append(_turns(10) + [SystemMessage(content="not stored")]) == 20
+
+    with ConversationLog(path) as log:
+        assert len(log) == 20
+        assert log.load_last() == _turns(10)
+        assert [m.content for m in log.load_last(3)] == ["answer 8\nwith a second line", "question 9", "answer 9\nwith a second line"]
+        assert log.load_last(0) == []
+
+
+def test_fsync_is_batched(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(fd))
+
+    log = ConversationLog(str(tmp_path / "history.jsonl"), fsync_every=10, fsync_interval=3600)
+    for message in _turns(10):
+        log.append([message])
+    assert log.fsyncs == 2
+    log.append(_turns(1))
+    log.close()
+
+    assert log.fsyncs == 3
+    assert len(synced) == 6  # log + index per sync
+
+
+def test_recovers_from_torn_write_and_stale_index(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    with ConversationLog(path) as log:
+        log.append(_turns(3))
+
+    # crash after two more records reached the log but before the index, mid-way through a third
+    with open(path, "ab") as f:
+        f.write(b'{"role": "user", "content": "late 1"}\n{"role": "assistant", "content": "late 2"}\n{"role": "us')
+
+    with ConversationLog(path) as log:
+        assert len(log) == 8
+        assert [m.content for m in log.load_last(2)] == ["late 1", "late 2"]
+        log.append([HumanMessage(content="after recovery")])
+
+    with ConversationLog(path) as log:
+        assert log.load_last(1) == [HumanMessage(content="after recovery")]
+
+
+def test_health_agent_imports_legacy_history(tmp_path):
+    from app.core import health_agent
+
+    legacy = tmp_path / "history.txt"
+    legacy.write_text("User: hi\nAgent: hello\n")
+    path = str(tmp_path / "history.jsonl")
+
+    with health_agent.open_history(path) as log:
+        assert len(log) == 2
+    with health_agent.open_history(path) as log:
+        assert len(log) == 2
+    assert health_agent.load_history(path, last_n=1) == [AIMessage(content="hello")]
@@ -0,0 +1,79 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+import pytest_asyncio
+
+from app.db import client as db_client
+from app.db import pool
+from benchmarks.stubs import StubPostgREST
+
+STUB_LATENCY = 0.2
+
+
+@pytest_asyncio.fixture
+async def stub(monkeypatch):
+    """Local PostgREST stub that takes STUB_LATENCY seconds per request"""
+    with StubPostgREST(latency=STUB_LATENCY) as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("SUPABASE_KEY", "stub-service-key")
+        yield server
+        await pool.close_async_supabase_client()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_complete_in_one_round_trip(stub):
+    """N concurrent DB calls should overlap instead of blocking the event loop"""
+    session_id = uuid.uuid4()
+    await db_client.get_async_supabase_client()
+    calls = 10
+
+    start = time.perf_counter()
+    messages = await asyncio.gather(*[
+        db_client.create_message(session_id, "user", f"message {i}")
+        for i in range(calls)
+    ])
+    elapsed = time.perf_counter() - start
+
+    assert len(messages) == calls
+    assert elapsed < STUB_LATENCY * 3, f"{calls} calls took {elapsed:.2f}s"
+
+
+@pytest.mark.asyncio
+async def test_event_loop_stays_responsive(stub):
+    """Other coroutines keep running while a DB call is in flight"""
+    await db_client.get_async_supabase_client()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    await db_client.get_session_messages(uuid.uuid4())
+    task.cancel()
+
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_session_round_trip(stub):
+    """Sessions and messages can be written and read back through the async client"""
+    stub.latency = 0
+    user_id = uuid.uuid4()
+
+    session = await db_client.create_chat_session(user_id, "Leg day")
+    await db_client.create_message(session.id, "user", "Hi coach")
+    await db_client.create_message(session.id, "assistant", "Hi! What's your goal?")
+    updated = await db_client.update_chat_session(session.id, {"title": "Leg day plan"})
+
+    messages = await db_client.get_session_messages(session.id)
+    sessions = await db_client.get_user_chat_sessions(user_id)
+
+    assert updated.title == "Leg day plan"
+    assert [m.role for m in messages] == ["user", "assistant"]
+    assert [s.id for s in sessions] == [session.id]
+    assert await db_client.delete_chat_session(session.id) is True
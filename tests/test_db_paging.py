@@ -0,0 +1,102 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+
+from app.db import client as db_client
+from app.db import pool
+from benchmarks.stubs import StubPostgREST
+
+
+@pytest_asyncio.fixture
+async def stub(monkeypatch):
+    with StubPostgREST() as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("SUPABASE_KEY", "stub-service-key")
+        yield server
+        await pool.close_async_supabase_client()
+
+
+def _seed_messages(stub, session_id, count, same_timestamp_every=3):
+    """Messages with increasing timestamps, several sharing one to exercise the id tiebreak"""
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "session_id": str(session_id),
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"message {i}",
+            "created_at": f"2025-01-01T00:{i // same_timestamp_every // 60:02d}:{i // same_timestamp_every % 60:02d}",
+        }
+        for i in range(count)
+    ]
+    stub.tables.setdefault("messages", []).extend(rows)
+    return sorted(rows, key=lambda r: (r["created_at"], r["id"]))
+
+
+@pytest.mark.asyncio
+async def test_paging_walks_all_messages_once(stub):
+    """Following next_cursor visits every message exactly once, newest page first"""
+    session_id = uuid.uuid4()
+    expected = _seed_messages(stub, session_id, 25)
+    _seed_messages(stub, uuid.uuid4(), 5)
+
+    pages, cursor = [], None
+    while True:
+        page = await db_client.get_session_messages_page(session_id, limit=7, before=cursor)
+        pages.append(page.messages)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert [len(p) for p in pages] == [7, 7, 7, 4]
+    seen = [str(m.id) for p in reversed(pages) for m in p]
+    assert seen == [r["id"] for r in expected]
+
+
+@pytest.mark.asyncio
+async def test_latest_messages_are_chronological(stub):
+    session_id = uuid.uuid4()
+    expected = _seed_messages(stub, session_id, 10)
+
+    latest = await db_client.get_latest_messages(session_id, 4)
+
+    assert [str(m.id) for m in latest] == [r["id"] for r in expected[-4:]]
+
+
+@pytest.mark.asyncio
+async def test_sessions_page_and_invalid_cursor(stub):
+    user_id = uuid.uuid4()
+    for i in range(5):
+        await db_client.create_chat_session(user_id, f"session {i}")
+
+    first = await db_client.get_user_chat_sessions_page(user_id, limit=3)
+    second = await db_client.get_user_chat_sessions_page(user_id, limit=3, before=first.next_cursor)
+
+    titles = [s.title for s in first.sessions + second.sessions]
+    assert titles == [f"session {i}" for i in reversed(range(5))]
+    assert second.next_cursor is None
+
+    with pytest.raises(ValueError):
+        await db_client.get_user_chat_sessions_page(user_id, before="not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_session_summaries_follow_message_writes(stub):
+    """append_messages keeps the message count and latest-message preview current"""
+    user_id = uuid.uuid4()
+    empty = await db_client.create_chat_session(user_id, "empty")
+    chat = await db_client.create_chat_session(user_id, "chat")
+    await db_client.create_message(chat.id, "user", "How many rest days?")
+    await db_client.create_messages(chat.id, [
+        {"role": "user", "content": "And deloads?"},
+        {"role": "assistant", "content": "Every fourth week. " + "x" * 200},
+    ])
+
+    page = await db_client.get_user_chat_session_summaries_page(user_id)
+
+    summaries = {s.id: s for s in page.sessions}
+    assert summaries[empty.id].message_count == 0
+    assert summaries[empty.id].last_message_preview is None
+    assert summaries[chat.id].message_count == 3
+    assert summaries[chat.id].last_message_role == "assistant"
+    assert summaries[chat.id].last_message_preview == ("Every fourth week. " + "x" * 200)[:120]
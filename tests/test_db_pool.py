@@ -0,0 +1,43 @@
+import pytest
+
+from app.db import client as db_client
+from app.db import pool
+from benchmarks.stubs import StubPostgREST
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Point the shared Supabase client at a local PostgREST stub"""
+    with StubPostgREST() as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("SUPABASE_KEY", "stub-service-key")
+        pool.close_supabase_client()
+        yield server
+        pool.close_supabase_client()
+
+
+def test_client_is_shared(stub):
+    """Every db call should get the same client instance"""
+    first = db_client.get_supabase_client()
+    second = db_client.get_supabase_client()
+
+    assert first is second
+
+
+def test_pool_size_is_configurable(stub, monkeypatch):
+    """SUPABASE_POOL_SIZE controls the connection pool limits"""
+    monkeypatch.setenv("SUPABASE_POOL_SIZE", "3")
+
+    pool.init_supabase_client()
+
+    assert pool.get_pool_size() == 3
+    assert pool._http_client._transport._pool._max_connections == 3
+
+
+def test_close_releases_client(stub):
+    """Closing the registry drops the client so the next call rebuilds it"""
+    first = db_client.get_supabase_client()
+    pool.close_supabase_client()
+
+    assert pool._client is None
+    assert db_client.get_supabase_client() is not first
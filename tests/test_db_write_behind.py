@@ -0,0 +1,143 @@
+import asyncio
+import uuid
+
+import pytest
+import pytest_asyncio
+
+from app.db import client as db_client
+from app.db import pool
+from app.db.write_behind import MessageWriteBuffer
+from benchmarks.stubs import StubPostgREST
+
+
+@pytest_asyncio.fixture
+async def stub(monkeypatch):
+    with StubPostgREST() as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("SUPABASE_KEY", "stub-service-key")
+        await db_client.get_async_supabase_client()
+        yield server
+        await pool.close_async_supabase_client()
+
+
+@pytest.mark.asyncio
+async def test_create_messages_is_one_round_trip(stub):
+    """A whole turn plus the session bump costs a single request"""
+    session = await db_client.create_chat_session(uuid.uuid4(), "Coaching")
+    before = stub.request_count
+
+    messages = await db_client.create_messages(session.id, [
+        {"role": "user", "content": "How do I squat?"},
+        {"role": "assistant", "content": "Feet shoulder-width apart..."},
+    ])
+
+    assert stub.request_count - before == 1
+    assert [m.role for m in messages] == ["user", "assistant"]
+    assert [m.content for m in await db_client.get_session_messages(session.id)] == [
+        "How do I squat?", "Feet shoulder-width apart...",
+    ]
+    assert stub.tables["chat_sessions"][0]["last_activity_at"] > session.last_activity_at.isoformat()
+
+    with pytest.raises(ValueError):
+        await db_client.create_messages(session.id, [{"role": "system", "content": "x"}])
+
+
+@pytest.mark.asyncio
+async def test_buffer_flushes_on_size_and_on_close(stub):
+    buffer = MessageWriteBuffer(max_batch=4, flush_interval=60)
+    session_a, session_b = uuid.uuid4(), uuid.uuid4()
+    for i in range(2):
+        buffer.add(session_a, "user", f"a{i}")
+        buffer.add(session_b, "user", f"b{i}")
+    await asyncio.sleep(0.1)
+
+    assert len(stub.tables["messages"]) == 4
+    assert buffer.stats()["batches"] == 2
+
+    buffer.add(session_a, "assistant", "a2")
+    await buffer.close()
+    assert [m.content for m in await db_client.get_session_messages(session_a)] == ["a0", "a1", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_buffer_flushes_on_interval():
+    written = []
+
+    async def writer(session_id, rows):
+        written.extend(row["content"] for row in rows)
+
+    buffer = MessageWriteBuffer(max_batch=100, flush_interval=0.05, writer=writer)
+    buffer.add(uuid.uuid4(), "user", "hello")
+    await asyncio.sleep(0.2)
+
+    assert written == ["hello"]
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_in_order():
+    attempts, written = 0, []
+
+    async def flaky_writer(session_id, rows):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ConnectionError("database unavailable")
+        written.extend(row["content"] for row in rows)
+
+    buffer = MessageWriteBuffer(max_batch=100, flush_interval=60, writer=flaky_writer)
+    session_id = uuid.uuid4()
+    buffer.add(session_id, "user", "first")
+    with pytest.raises(ConnectionError):
+        await buffer.flush()
+    buffer.add(session_id, "assistant", "second")
+    await buffer.close()
+
+    assert written == ["first", "second"]
+    assert buffer.stats() == {"pending": 0, "flushed": 2, "batches": 1, "failures": 1}
+
+
+@pytest.mark.asyncio
+async def test_close_during_background_flush_writes_everything():
+    """Shutting down while the background task is mid-write loses nothing"""
+    started, written = asyncio.Event(), []
+
+    async def slow_writer(session_id, rows):
+        started.set()
+        await asyncio.sleep(0.1)
+        written.extend(row["content"] for row in rows)
+
+    buffer = MessageWriteBuffer(max_batch=100, flush_interval=0.01, writer=slow_writer)
+    session_id = uuid.uuid4()
+    buffer.add(session_id, "user", "first")
+    buffer.add(session_id, "assistant", "second")
+    await started.wait()
+    await buffer.close()
+
+    assert written == ["first", "second"]
+    assert buffer.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_keeps_its_batch_queued():
+    calls, written = 0, []
+
+    async def hanging_then_ok_writer(session_id, rows):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(60)
+        written.extend(row["content"] for row in rows)
+
+    buffer = MessageWriteBuffer(max_batch=100, flush_interval=60, writer=hanging_then_ok_writer)
+    buffer.add(uuid.uuid4(), "user", "hello")
+    flush = asyncio.ensure_future(buffer.flush())
+    await asyncio.sleep(0.01)
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+
+    assert buffer.pending == 1
+    await buffer.close()
+    assert written == ["hello"]
+    assert buffer.pending == 0
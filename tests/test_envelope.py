@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from app.core.envelope import EnvelopeParseError, envelope_json, parse_envelope, parse_or_repair, repair_json
+from app.core.serialization import dumps
+from app.models.onboarding import CompleteEnvelope, QuestionEnvelope, RadioPayload
+
+QUESTION = {
+    "sessionId": "abc",
+    "status": "question",
+    "currentStepId": "sex",
+    "steps": [{"id": "display_name", "answer": "WJ", "status": "done"}, {"id": "sex", "status": "current"}],
+    "payload": {
+        "kind": "radio",
+        "id": "sex",
+        "prompt": "What is your sex?",
+        "options": [{"value": "male", "label": "Male"}, {"value": "female", "label": "Female"}],
+    },
+}
+
+
+def test_envelope_variants_are_picked_by_status_and_kind():
+    """`status` selects the envelope model and `payload.kind` the question payload"""
+    envelope = parse_envelope(json.dumps(QUESTION))
+    assert isinstance(envelope, QuestionEnvelope)
+    assert isinstance(envelope.payload, RadioPayload)
+
+    complete = parse_envelope(json.dumps({"status": "complete", "payload": {"redirect_path": "/dashboard"}}))
+    assert isinstance(complete, CompleteEnvelope)
+
+
+def test_envelope_round_trips_without_added_keys():
+    """Serializing keeps the agent's keys, including unknown ones, and adds no null defaults"""
+    sent = {**QUESTION, "note": "extra"}
+    envelope = parse_envelope(json.dumps(sent))
+
+    assert json.loads(envelope_json(envelope)) == sent
+    assert json.loads(dumps({"data": json.loads(envelope_json(envelope))})) == {"data": sent}
+
+
+@pytest.mark.parametrize("text", [
+    '{"status": "question", "payload": {"kind": "slider", "id": "x", "prompt": "?"}}',
+    '{"status": "pending", "payload": {}}',
+    '{"status": "question", "steps": [{"id": "sex", "status": "skipped"}], '
+    '"payload": {"kind": "text", "id": "x", "prompt": "?"}}',
+])
+def test_invalid_envelopes_are_rejected(text):
+    with pytest.raises(EnvelopeParseError):
+        parse_envelope(text)
+
+
+@pytest.mark.parametrize("text", [
+    "```json\n" + json.dumps(QUESTION) + "\n```",
+    "Here is the next question:\n" + json.dumps(QUESTION) + "\nThanks!",
+    json.dumps(QUESTION)[:-1] + ",}",
+    json.dumps(QUESTION).replace('"answer": "WJ"', '"answer": "WJ", "skipped": False'),
+])
+def test_common_llm_slips_are_repaired(text):
+    envelope, repaired = parse_or_repair(text)
+
+    assert repaired
+    assert envelope.currentStepId == "sex"
+
+
+def test_unrepairable_text_raises():
+    assert repair_json("I could not decide on a question.") is None
+    with pytest.raises(EnvelopeParseError):
+        parse_or_repair("I could not decide on a question.")
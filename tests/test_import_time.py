@@ -0,0 +1,18 @@
+import os
+
+from benchmarks.import_time import eagerly_imported, measure
+
+# Cold-start budget for `import main`; ~1s locally, ~2.5s before model clients,
+# agents and the Supabase SDK became lazy. Override for slow CI machines.
+IMPORT_TIME_BUDGET_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", 2000))
+
+
+def test_app_imports_without_credentials_or_heavy_clients():
+    """Importing the app needs no OPENAI_API_KEY and builds no model/db clients"""
+    assert eagerly_imported("main") == []
+
+
+def test_import_time_within_budget():
+    # best of a few runs, so one noisy run does not fail the suite
+    best = min(measure("main")[0] for _ in range(3))
+    assert best <= IMPORT_TIME_BUDGET_MS, f"import main took {best:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)"
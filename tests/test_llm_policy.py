@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+from langchain_openai import ChatOpenAI
+
+from app.core.llm_policy import (
+    LLM_DEADLINE_EXCEEDED,
+    LLM_HEDGES,
+    LLM_RETRIES,
+    LLMCallPolicy,
+    PolicyTransport,
+)
+from benchmarks.stubs import StubOpenAI
+
+REPLY = "Drink water and get some sleep."
+
+
+class RecordingTransport(httpx.AsyncHTTPTransport):
+    """Real transport that counts requests cancelled while waiting for a response"""
+
+    def __init__(self):
+        super().__init__()
+        self.cancelled = 0
+
+    async def handle_async_request(self, request):
+        try:
+            return await super().handle_async_request(request)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def _model(stub, name, policy, transport=None, **kwargs):
+    client = httpx.AsyncClient(transport=PolicyTransport(policy, name, transport=transport))
+    return ChatOpenAI(
+        model="gpt-4o-mini", base_url=stub.url, api_key="stub", http_async_client=client, max_retries=0, **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_retryable_failures_are_retried():
+    with StubOpenAI(reply=lambda body: REPLY, failures=2) as stub:
+        model = _model(stub, "retry", LLMCallPolicy(max_retries=2, backoff_base=0.01))
+        response = await model.ainvoke("hi")
+
+    assert response.content == REPLY
+    assert stub.request_count == 3
+    assert LLM_RETRIES.value("retry", "503") == 2
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_at_max_retries():
+    with StubOpenAI(reply=lambda body: REPLY, failures=5) as stub:
+        model = _model(stub, "retry-limit", LLMCallPolicy(max_retries=1, backoff_base=0.01))
+        with pytest.raises(openai.InternalServerError):
+            await model.ainvoke("hi")
+
+    assert stub.request_count == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged_and_loser_cancelled():
+    """The first request stalls; the hedge answers and the stalled one is cancelled"""
+    transport = RecordingTransport()
+    with StubOpenAI(reply=lambda body: REPLY, extra_latency=lambda n: 2.0 if n == 1 else 0.0) as stub:
+        model = _model(stub, "hedge", LLMCallPolicy(hedge=True, hedge_after=0.1), transport)
+        start = time.perf_counter()
+        response = await model.ainvoke("hi")
+        elapsed = time.perf_counter() - start
+
+    assert response.content == REPLY
+    assert elapsed < 1.0
+    assert stub.request_count == 2
+    assert transport.cancelled == 1
+    assert LLM_HEDGES.value("hedge", "fired") == 1
+    assert LLM_HEDGES.value("hedge", "won") == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_waits_for_p95_of_recent_latencies():
+    """No hedging before enough samples; a request slower than their p95 is hedged"""
+    slow = {4}
+    with StubOpenAI(reply=lambda body: REPLY, extra_latency=lambda n: 1.0 if n in slow else 0.0) as stub:
+        policy = LLMCallPolicy(hedge=True, hedge_min_samples=3)
+        model = _model(stub, "hedge-p95", policy)
+        for _ in range(3):
+            await model.ainvoke("hi")
+        assert LLM_HEDGES.value("hedge-p95", "fired") == 0
+
+        # request 4 is slow, so request 5 (the hedge) answers
+        start = time.perf_counter()
+        await model.ainvoke("hi")
+        assert time.perf_counter() - start < 0.8
+
+    assert LLM_HEDGES.value("hedge-p95", "fired") == 1
+    assert LLM_HEDGES.value("hedge-p95", "won") == 1
+
+
+@pytest.mark.asyncio
+async def test_fast_first_response_is_not_hedged():
+    with StubOpenAI(reply=lambda body: REPLY) as stub:
+        model = _model(stub, "no-hedge", LLMCallPolicy(hedge=True, hedge_after=0.5))
+        await model.ainvoke("hi")
+
+    assert stub.request_count == 1
+    assert LLM_HEDGES.value("no-hedge", "fired") == 0
+
+
+@pytest.mark.asyncio
+async def test_deadline_covers_retries_and_slow_responses():
+    with StubOpenAI(reply=lambda body: REPLY, extra_latency=lambda n: 2.0) as stub:
+        model = _model(stub, "deadline", LLMCallPolicy(deadline=0.3, max_retries=3, backoff_base=0.01))
+        start = time.perf_counter()
+        with pytest.raises(openai.APITimeoutError):
+            await model.ainvoke("hi")
+
+    assert time.perf_counter() - start < 1.0
+    assert LLM_DEADLINE_EXCEEDED.value("deadline") == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_cuts_off_a_slow_stream():
+    with StubOpenAI(reply=lambda body: REPLY * 20, tokens_per_second=40, chunk_tokens=1) as stub:
+        model = _model(stub, "stream-deadline", LLMCallPolicy(deadline=0.3))
+        chunks = []
+        # the SDK reports the transport's deadline error as a timeout
+        with pytest.raises(openai.APITimeoutError):
+            async for chunk in model.astream("hi"):
+                chunks.append(chunk)
+
+    assert chunks
+    assert LLM_DEADLINE_EXCEEDED.value("stream-deadline") == 1
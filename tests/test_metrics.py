@@ -0,0 +1,125 @@
+import asyncio
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.core import metrics
+from app.core.metrics import RequestMetricsMiddleware, TimedJSONResponse, db_timed
+
+LLM_DELAY = 0.05
+DB_DELAY = 0.02
+
+
+class SlowChatModel(FakeListChatModel):
+    """Fake chat model that takes LLM_DELAY seconds and reports token usage"""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(LLM_DELAY)
+        message = AIMessage(
+            content="ok",
+            usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@db_timed
+async def fake_query():
+    await asyncio.sleep(DB_DELAY)
+    return {"rows": 1}
+
+
+def build_app() -> FastAPI:
+    app = FastAPI(default_response_class=TimedJSONResponse)
+    app.add_middleware(RequestMetricsMiddleware)
+    model = SlowChatModel(responses=["ok"])
+
+    @app.get("/turn/{item_id}")
+    async def turn(item_id: str):
+        reply = await model.ainvoke("hi")
+        await fake_query()
+        await fake_query()
+        return {"reply": reply.content, "items": list(range(100))}
+
+    return app
+
+
+def test_request_breakdown_is_recorded(caplog):
+    route = "/turn/{item_id}"
+    before = {
+        "requests": metrics.REQUEST_DURATION.count("GET", route, "200"),
+        "llm": metrics.REQUEST_LLM.sum(route),
+        "db": metrics.REQUEST_DB.sum(route),
+        "db_calls": metrics.DB_CALL_DURATION.count("fake_query"),
+        "tokens_in": metrics.LLM_TOKENS.value(route, "in"),
+        "tokens_out": metrics.LLM_TOKENS.value(route, "out"),
+    }
+
+    with caplog.at_level(logging.INFO, logger="app.core.metrics"):
+        response = TestClient(build_app()).get("/turn/42")
+
+    assert response.status_code == 200
+    assert metrics.REQUEST_DURATION.count("GET", route, "200") == before["requests"] + 1
+    assert metrics.REQUEST_LLM.sum(route) - before["llm"] >= LLM_DELAY
+    assert metrics.REQUEST_DB.sum(route) - before["db"] >= 2 * DB_DELAY
+    assert metrics.DB_CALL_DURATION.count("fake_query") == before["db_calls"] + 2
+    assert metrics.LLM_TOKENS.value(route, "in") == before["tokens_in"] + 12
+    assert metrics.LLM_TOKENS.value(route, "out") == before["tokens_out"] + 3
+    assert metrics.REQUEST_SERIALIZATION.count(route) >= 1
+
+    line = next(r.getMessage() for r in caplog.records if r.getMessage().startswith("request "))
+    assert "route=/turn/{item_id}" in line
+    assert "llm_calls=1" in line and "db_calls=2" in line
+    assert "prompt_tokens=12" in line and "completion_tokens=3" in line
+
+
+def test_db_calls_outside_a_request_are_still_timed():
+    before = metrics.DB_CALL_DURATION.count("fake_query")
+    assert asyncio.run(fake_query()) == {"rows": 1}
+    assert metrics.DB_CALL_DURATION.count("fake_query") == before + 1
+
+
+def test_histogram_exposition_format():
+    histogram = metrics.Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+
+    lines = histogram.render()
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{route="/a"} 3' in lines
+
+
+def test_main_app_serves_metrics():
+    from main import app
+
+    client = TestClient(app)
+    client.get("/")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert "# TYPE http_request_llm_seconds histogram" in response.text
+
+
+def test_route_label_includes_router_prefix():
+    from fastapi import APIRouter
+
+    router = APIRouter(prefix="/coach")
+
+    @router.get("/sessions/{session_id}")
+    def session(session_id: str):
+        return {"id": session_id}
+
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+    app.include_router(router, prefix="/api")
+
+    TestClient(app).get("/api/coach/sessions/abc")
+    assert metrics.REQUEST_DURATION.count("GET", "/api/coach/sessions/{session_id}", "200") == 1
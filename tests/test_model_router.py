@@ -0,0 +1,50 @@
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.core.model_router import CLARIFICATION, PLAN, SMALL_TALK, ModelRouter, classify_turn, load_policy
+from benchmarks.stubs import StubChatModel
+
+
+@pytest.mark.parametrize("message, route", [
+    ("hey", SMALL_TALK),
+    ("Thanks coach!", SMALL_TALK),
+    ("What's a good rep range for hypertrophy?", CLARIFICATION),
+    ("thanks, but why so many sets on Monday?", CLARIFICATION),
+    ("Can you create a 3-day workout plan for me?", PLAN),
+    ("Plan my meals for next week", PLAN),
+    ("x" * 700, PLAN),
+])
+def test_classify_turn(message, route):
+    assert classify_turn(message) == route
+
+
+def test_policy_presets_and_json():
+    assert load_policy("quality")[SMALL_TALK] == "gpt-4o"
+    assert load_policy('{"plan": "gpt-4o-mini"}') == {
+        SMALL_TALK: "gpt-4o-mini", CLARIFICATION: "gpt-4o-mini", PLAN: "gpt-4o-mini",
+    }
+    with pytest.raises(ValueError):
+        load_policy("fastest")
+
+
+@pytest.mark.asyncio
+async def test_router_dispatches_by_route_and_records_metrics():
+    models = {}
+
+    def factory(name):
+        models[name] = StubChatModel(name, reply_tokens=10)
+        return models[name]
+
+    router = ModelRouter(policy=load_policy("cost"), model_factory=factory)
+    system = SystemMessage(content="You are a health coach.")
+
+    small_talk = await router.ainvoke([system, HumanMessage(content="hi")])
+    plan = await router.ainvoke([system, HumanMessage(content="Build me a 5-day training split")])
+
+    assert small_talk.response_metadata["model_name"] == "gpt-4o-mini"
+    assert plan.response_metadata["model_name"] == "gpt-4o"
+    stats = router.stats()
+    assert stats[SMALL_TALK]["calls"] == 1 and stats[PLAN]["calls"] == 1
+    assert stats[CLARIFICATION]["calls"] == 0
+    assert stats[PLAN]["completion_tokens"] == 10
+    assert stats[PLAN]["estimated_cost_usd"] > stats[SMALL_TALK]["estimated_cost_usd"]
@@ -0,0 +1,84 @@
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core.envelope import delta_adapter
+from app.core.onboarding_steps import STEP_MAP, OnboardingProgress
+from app.core.onboarding_validation import STEP_IDS
+
+
+def _delta(status="question", current="sex", answers=None, payload=None):
+    return delta_adapter.validate_python({
+        "status": status,
+        "currentStepId": current,
+        "answers": answers or {},
+        "payload": payload or {"kind": "radio", "id": current, "prompt": "Sex / gender",
+                               "options": [{"value": "male", "label": "Male"}]},
+    })
+
+
+def test_step_map_matches_validation_steps():
+    assert list(STEP_MAP) == STEP_IDS
+
+
+def test_envelope_is_assembled_from_delta():
+    """The full steps list and every answer so far are added to the agent's delta"""
+    progress = OnboardingProgress({"display_name": "WJ"}, "birthday")
+
+    envelope = progress.envelope(_delta(answers={"birthday": "10 May 1990"}), "abc").model_dump(exclude_unset=True)
+
+    assert envelope["sessionId"] == "abc"
+    assert envelope["currentStepId"] == "sex"
+    assert envelope["paraphrasedAnswers"] == {"display_name": "WJ", "birthday": "10 May 1990"}
+    assert [(s["id"], s["status"], s["answer"]) for s in envelope["steps"][:4]] == [
+        ("display_name", "done", "WJ"),
+        ("birthday", "done", "10 May 1990"),
+        ("sex", "current", None),
+        ("height", "upcoming", None),
+    ]
+    assert len(envelope["steps"]) == len(STEP_MAP)
+    assert "answers" not in envelope
+
+
+def test_validation_error_keeps_the_current_step():
+    progress = OnboardingProgress({"display_name": "WJ", "birthday": "10 May 1990"}, "sex")
+    error = delta_adapter.validate_python({
+        "status": "validationError", "currentStepId": "sex",
+        "payload": {"fieldId": "sex", "message": "Please choose one of: male, female or other."},
+    })
+
+    envelope = progress.envelope(error, "abc")
+
+    assert envelope.status == "validationError"
+    assert [s.status for s in envelope.steps[:3]] == ["done", "done", "current"]
+
+
+def test_progress_is_rebuilt_from_history():
+    """Agent deltas are folded in order; later answers replace earlier ones, junk is skipped"""
+    messages = [
+        HumanMessage(content="Hello"),
+        AIMessage(content=json.dumps(_delta(current="display_name").model_dump(mode="json"))),
+        HumanMessage(content="WJ"),
+        AIMessage(content="not json"),
+        AIMessage(content="```json\n" + json.dumps({
+            "status": "question", "currentStepId": "birthday", "answers": {"display_name": "WJ"},
+            "payload": {"kind": "text", "id": "birthday", "prompt": "When were you born?"},
+        }) + "\n```"),
+        HumanMessage(content="Call me Won instead"),
+        AIMessage(content=_delta(current="birthday", answers={"display_name": "Won"}).model_dump_json()),
+    ]
+
+    progress = OnboardingProgress.from_history(messages)
+
+    assert progress.current_step_id == "birthday"
+    assert progress.answers == {"display_name": "Won"}
+
+
+def test_complete_marks_every_step_done():
+    progress = OnboardingProgress({step: "x" for step in STEP_IDS[:-1]}, "review")
+    complete = delta_adapter.validate_python({"status": "complete", "payload": {"redirect_path": "/dashboard"}})
+
+    envelope = progress.envelope(complete, "abc")
+
+    assert envelope.payload.redirect_path == "/dashboard"
+    assert {s.status for s in envelope.steps} == {"done"}
@@ -0,0 +1,53 @@
+from datetime import date
+
+import pytest
+
+from app.core.onboarding_validation import validate_answer, validation_error_envelope
+
+TODAY = date(2025, 6, 1)
+
+
+@pytest.mark.parametrize("step_id, answer", [
+    ("display_name", "W"),
+    ("display_name", "WJ 💪"),
+    ("birthday", "2030-01-01"),
+    ("birthday", "2020-01-01"),
+    ("sex", "robot"),
+    ("height", "I'm 300 cm"),
+    ("height", "tall"),
+    ("training_experience", "2.5"),
+    ("training_experience", "55 years"),
+    ("availability", "Mon"),
+    ("limitations", "x" * 201),
+])
+def test_invalid_answers_are_rejected(step_id, answer):
+    assert validate_answer(step_id, answer, TODAY)
+
+
+@pytest.mark.parametrize("step_id, answer", [
+    ("display_name", "WJ"),
+    ("birthday", "1990-05-10"),
+    ("birthday", "the tenth of May, ninety"),
+    ("sex", "Female"),
+    ("height", "180"),
+    ("height", "5 ft 11"),
+    ("training_experience", "3 years"),
+    ("training_experience", "a couple of years"),
+    ("equipment", "none"),
+    ("availability", "Mon/Wed/Fri 45min"),
+    ("limitations", "None"),
+    (None, "Hello"),
+])
+def test_valid_or_ambiguous_answers_go_to_the_agent(step_id, answer):
+    assert validate_answer(step_id, answer, TODAY) is None
+
+
+def test_validation_error_envelope_shape():
+    envelope = validation_error_envelope("abc", "height", "Too tall")
+
+    assert envelope == {
+        "sessionId": "abc",
+        "status": "validationError",
+        "currentStepId": "height",
+        "payload": {"fieldId": "height", "message": "Too tall"},
+    }
@@ -0,0 +1,39 @@
+import pytest
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel
+
+from benchmarks.stubs import StubOpenAI
+
+REPLY = "Drink water and get some sleep."
+
+
+class Answer(BaseModel):
+    result: str
+
+
+@pytest.fixture
+def stub():
+    with StubOpenAI(reply=lambda body: REPLY) as server:
+        yield server
+
+
+def _model(stub, **kwargs):
+    return ChatOpenAI(model="gpt-4o-mini", base_url=stub.url, api_key="stub", **kwargs)
+
+
+def test_plain_and_streamed_completions(stub):
+    """The real client gets the reply and token usage, streamed or not"""
+    response = _model(stub).invoke("hi")
+    assert response.content == REPLY
+    assert response.usage_metadata["output_tokens"] > 0
+
+    chunks = list(_model(stub, stream_usage=True).stream("hi"))
+    assert "".join(c.content for c in chunks) == REPLY
+    assert sum((c.usage_metadata or {}).get("output_tokens", 0) for c in chunks) > 0
+    assert stub.request_count == 2
+
+
+@pytest.mark.parametrize("method", ["json_schema", "function_calling"])
+def test_structured_output(stub, method):
+    assert _model(stub).with_structured_output(Answer, method=method).invoke("hi") == Answer(result=REPLY)
+
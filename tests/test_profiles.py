@@ -0,0 +1,151 @@
+import asyncio
+import uuid
+
+import pytest
+import pytest_asyncio
+
+from app.core import onboarding_tools
+from app.db import client as db_client
+from app.db import pool, profiles
+from app.db.models import UserProfile
+from app.db.profiles import ProfileCache
+from benchmarks.stubs import StubPostgREST
+
+USER_ID = uuid.uuid4()
+PROFILE = {
+    "display_name": "WJ",
+    "birthday": "1990-05-10",
+    "sex": "male",
+    "height_cm": 180,
+    "training_experience_years": 5,
+    "training_style": ["CrossFit"],
+    "equipment": ["Dumbbells"],
+    "availability": "Weekday evenings, 1 hour",
+    "limitations": None,
+}
+
+
+class FakeProfileStore:
+    """In-memory loader/writer pair that counts database calls"""
+
+    def __init__(self, delay: float = 0.0):
+        self.rows = {}
+        self.reads = 0
+        self.writes = 0
+        self.delay = delay
+
+    async def load(self, user_id):
+        self.reads += 1
+        return self.rows.get(user_id)
+
+    async def write(self, profile, idempotency_key):
+        await asyncio.sleep(self.delay)
+        self.writes += 1
+        stored = profile.model_copy(update={"idempotency_key": idempotency_key})
+        self.rows[profile.user_id] = stored
+        return stored
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeProfileStore(delay=0.01)
+    monkeypatch.setattr(profiles, "profile_cache", ProfileCache(loader=store.load, writer=store.write))
+    return store
+
+
+@pytest.mark.asyncio
+async def test_reads_go_through_the_cache():
+    """Repeated reads, including of a missing profile, query the database once"""
+    store = FakeProfileStore()
+    cache = ProfileCache(loader=store.load, writer=store.write)
+
+    assert await cache.get(USER_ID) is None
+    assert await cache.get(USER_ID) is None
+    saved = await cache.save(UserProfile(user_id=USER_ID, **PROFILE), "key-1")
+
+    assert await cache.get(USER_ID) == saved
+    assert store.reads == 1
+
+
+@pytest.mark.asyncio
+async def test_saves_are_idempotent():
+    """Retried and concurrent saves with one key write once; a new key writes again"""
+    store = FakeProfileStore(delay=0.01)
+    cache = ProfileCache(loader=store.load, writer=store.write)
+    profile = UserProfile(user_id=USER_ID, **PROFILE)
+
+    await asyncio.gather(*[cache.save(profile, "key-1") for _ in range(5)])
+    await cache.save(profile, "key-1")
+    assert store.writes == 1
+
+    await cache.save(profile.model_copy(update={"height_cm": 181}), "key-2")
+    assert store.writes == 2
+    assert (await cache.get(USER_ID)).height_cm == 181
+
+
+@pytest.mark.asyncio
+async def test_failed_save_is_not_cached():
+    async def failing_writer(profile, idempotency_key):
+        raise RuntimeError("database unavailable")
+
+    store = FakeProfileStore()
+    cache = ProfileCache(loader=store.load, writer=failing_writer)
+    await cache.get(USER_ID)
+
+    with pytest.raises(RuntimeError):
+        await cache.save(UserProfile(user_id=USER_ID, **PROFILE), "key-1")
+    await cache.get(USER_ID)
+
+    assert store.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_create_user_profile_tool_writes_once_per_profile(store):
+    """A retried tool call in the same conversation is not written again"""
+    config = {"configurable": {"thread_id": "conversation-1", "user_id": str(USER_ID)}}
+
+    first = await onboarding_tools.create_user_profile.ainvoke({"profile": PROFILE}, config=config)
+    retry = await onboarding_tools.create_user_profile.ainvoke({"profile": PROFILE}, config=config)
+    finished = await onboarding_tools.finish_onboarding.ainvoke({}, config=config)
+
+    assert first == retry == {"success": True}
+    assert finished == {"redirect_path": onboarding_tools.ONBOARDING_REDIRECT_PATH}
+    assert store.writes == 1
+    assert store.rows[USER_ID].training_style == ["CrossFit"]
+
+
+@pytest.mark.asyncio
+async def test_tools_need_a_user(store):
+    config = {"configurable": {"thread_id": "conversation-1"}}
+
+    created = await onboarding_tools.create_user_profile.ainvoke({"profile": PROFILE}, config=config)
+    finished = await onboarding_tools.finish_onboarding.ainvoke({}, config=config)
+
+    assert created["success"] is False
+    assert finished["success"] is False
+    assert store.writes == 0
+
+
+@pytest_asyncio.fixture
+async def postgrest(monkeypatch):
+    with StubPostgREST() as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("SUPABASE_KEY", "stub-service-key")
+        yield server
+        await pool.close_async_supabase_client()
+
+
+@pytest.mark.asyncio
+async def test_upsert_skips_rows_written_with_the_same_key(postgrest):
+    """The upsert_user_profile function is a no-op for a key it has already applied"""
+    profile = UserProfile(user_id=USER_ID, **PROFILE)
+
+    first = await db_client.upsert_user_profile(profile, "key-1")
+    again = await db_client.upsert_user_profile(profile, "key-1")
+    updated = await db_client.upsert_user_profile(profile.model_copy(update={"display_name": "Won"}), "key-2")
+
+    assert postgrest.profile_writes == 2
+    assert first.idempotency_key == again.idempotency_key == "key-1"
+    assert updated.display_name == "Won"
+    assert (await db_client.get_user_profile(USER_ID)).display_name == "Won"
+    assert await db_client.get_user_profile(uuid.uuid4()) is None
@@ -0,0 +1,68 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, SystemMessage
+from langgraph.prebuilt import create_react_agent
+
+from app.core.onboarding_agent import onboarding_prompt
+from app.core.prompt import ONBOARDING_AGENT_PROMPT, build_onboarding_system_messages
+from app.core.token_usage import TokenUsageTracker
+
+
+class RecordingModel(GenericFakeChatModel):
+    """Fake chat model that remembers the prompts it was sent"""
+    prompts: list = []
+
+    def _generate(self, messages, *args, **kwargs):
+        self.prompts.append(messages)
+        return super()._generate(messages, *args, **kwargs)
+
+
+def test_static_prompt_is_shared_prefix():
+    """Every session starts with the identical static system prompt"""
+    first = build_onboarding_system_messages("session-a")
+    second = build_onboarding_system_messages("session-b")
+
+    assert first[0] == second[0] == SystemMessage(content=ONBOARDING_AGENT_PROMPT)
+    assert "session-a" in first[1].content
+    assert "session-a" not in first[0].content
+
+
+def test_agent_prompt_keeps_history_after_session_suffix():
+    """The agent sends static prefix, session suffix, then the conversation"""
+    model = RecordingModel(messages=iter([AIMessage(content="one"), AIMessage(content="two")]), prompts=[])
+    agent = create_react_agent(model, tools=[], prompt=onboarding_prompt)
+    config = {"configurable": {"thread_id": "conversation-1"}}
+
+    agent.invoke({"messages": [("user", "Hello")]}, config)
+
+    sent = model.prompts[0]
+    assert sent[0].content == ONBOARDING_AGENT_PROMPT
+    assert "conversation-1" in sent[1].content
+    assert [m.content for m in sent[2:]] == ["Hello"]
+
+
+@pytest.mark.asyncio
+async def test_usage_tracker_splits_cached_tokens():
+    """Cached prompt tokens reported by the provider are accounted separately"""
+    tracker = TokenUsageTracker("test")
+    reply = AIMessage(
+        content="ok",
+        usage_metadata={
+            "input_tokens": 1500,
+            "output_tokens": 40,
+            "total_tokens": 1540,
+            "input_token_details": {"cache_read": 1280},
+        },
+    )
+    model = GenericFakeChatModel(messages=iter([reply]), callbacks=[tracker])
+
+    await model.ainvoke("Hello")
+
+    assert tracker.stats() == {
+        "calls": 1,
+        "prompt_tokens": 1500,
+        "cached_prompt_tokens": 1280,
+        "uncached_prompt_tokens": 220,
+        "completion_tokens": 40,
+        "cache_hit_ratio": pytest.approx(1280 / 1500),
+    }
@@ -0,0 +1,58 @@
+import threading
+
+from app.core import providers
+from app.core.providers import Provider, provider, warm_up
+
+
+def test_value_is_built_once_and_shared_across_threads():
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    lazy = Provider("test.shared", factory)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(lazy())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_reset_rebuilds():
+    lazy = Provider("test.reset", object)
+    first = lazy()
+    lazy.reset()
+    assert not lazy.initialized
+    assert lazy() is not first
+
+
+def test_warm_up_builds_registered_providers(monkeypatch):
+    monkeypatch.setattr(providers, "_registry", {})
+
+    @provider("test.warm")
+    def get_thing():
+        return "thing"
+
+    assert not get_thing.initialized
+    timings = warm_up()
+    assert list(timings) == ["test.warm"]
+    assert get_thing.initialized and get_thing() == "thing"
+
+
+def test_app_agents_are_registered():
+    import app.core.health_agent  # noqa: F401
+    import app.core.onboarding_agent  # noqa: F401
+
+    names = providers.registered()
+    assert {"onboarding.agent", "health_agent.coach_agent"} <= set(names)
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.core.rate_limit import InMemoryRateLimitBackend, RateLimiter, RateLimitExceeded
+
+
+@pytest.mark.asyncio
+async def test_request_bucket_allows_a_burst_then_rejects():
+    limiter = RateLimiter("test", requests_per_minute=6, request_burst=3, max_wait=0)
+
+    for _ in range(3):
+        await limiter.admit("alice")
+    with pytest.raises(RateLimitExceeded) as exc:
+        await limiter.admit("alice")
+    await limiter.admit("bob")
+
+    assert exc.value.retry_after == 10
+    assert limiter.stats()["admitted"] == 4
+    assert limiter.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_short_waits_queue_one_call_per_client():
+    """A call whose bucket refills within max_wait waits; a second one from the same client does not"""
+    limiter = RateLimiter("test", requests_per_minute=600, request_burst=1, max_wait=1)
+    await limiter.admit("alice")
+
+    waiting = asyncio.create_task(limiter.admit("alice"))
+    await asyncio.sleep(0)
+    assert limiter.queued == 1
+    with pytest.raises(RateLimitExceeded):
+        await limiter.admit("alice")
+
+    await waiting
+    assert limiter.queued == 0
+    assert limiter.stats()["queued_total"] == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_tokens_are_charged_after_the_call():
+    """An expensive call leaves the bucket in debt and blocks the next one until it refills"""
+    limiter = RateLimiter("test", request_burst=100, tokens_per_minute=6000, token_burst=1000, max_wait=0)
+
+    await limiter.admit("alice")
+    await limiter.charge_tokens("alice", 1500)
+    with pytest.raises(RateLimitExceeded) as exc:
+        await limiter.admit("alice")
+
+    assert "token" in exc.value.reason
+    assert exc.value.retry_after == 5  # 500 tokens of debt at 100 tokens/s
+
+
+@pytest.mark.asyncio
+async def test_backend_is_shared_between_limiters():
+    """Limiters on one backend (workers on a shared store) enforce one budget"""
+    backend = InMemoryRateLimitBackend()
+    workers = [RateLimiter("test", request_burst=2, max_wait=0, backend=backend) for _ in range(2)]
+
+    await workers[0].admit("alice")
+    await workers[1].admit("alice")
+    with pytest.raises(RateLimitExceeded):
+        await workers[0].admit("alice")
@@ -0,0 +1,46 @@
+import time
+
+from app.core.response_cache import ResponseCache, make_cache_key, normalize_answer
+
+
+def test_normalized_answers_share_a_key():
+    assert normalize_answer("  Male\n") == normalize_answer("male")
+    assert make_cache_key("v1", "sex", normalize_answer("Male")) == make_cache_key("v1", "sex", "male")
+    assert make_cache_key("v1", "sex", "male") != make_cache_key("v2", "sex", "male")
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.set("a", "1111")
+    cache.set("b", "2222")
+    cache.get("a")
+    cache.set("c", "3333")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1111"
+
+    cache.set("d", "4444444")
+    assert len(cache) == 1
+    assert cache.stats()["evictions"] == 3
+    assert not cache.set("e", "x" * (cache.max_entry_bytes + 1))
+
+
+def test_entries_expire_after_ttl():
+    cache = ResponseCache(ttl=0.01)
+    cache.set("a", "1")
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_version_change_drops_entries():
+    cache = ResponseCache(version="v1")
+    cache.set("a", "1")
+    cache.ensure_version("v1")
+    assert cache.get("a") == "1"
+
+    cache.ensure_version("v2")
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["hit_ratio"] == 0.5
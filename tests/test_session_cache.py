@@ -0,0 +1,93 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+
+from app.db import client as db_client
+from app.db import pool
+from app.db.models import ChatSession
+from app.db.session_cache import LocalInvalidationBus, SessionCache
+from benchmarks.stubs import StubPostgREST
+
+
+@pytest_asyncio.fixture
+async def stub(monkeypatch):
+    """Local PostgREST stub and an empty session cache"""
+    monkeypatch.setattr(db_client, "session_cache", SessionCache())
+    with StubPostgREST() as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("SUPABASE_KEY", "stub-service-key")
+        yield server
+        await pool.close_async_supabase_client()
+
+
+@pytest.mark.asyncio
+async def test_repeated_reads_skip_the_database(stub):
+    user_id = uuid.uuid4()
+    session = await db_client.create_chat_session(user_id, "Strength")
+    await db_client.get_user_chat_sessions(user_id)
+    requests = stub.request_count
+
+    for _ in range(5):
+        assert await db_client.get_chat_session(session.id) == session
+        assert await db_client.get_user_chat_sessions(user_id) == [session]
+
+    assert stub.request_count == requests
+    assert db_client.session_cache.stats()["hits"] == 10
+
+
+@pytest.mark.asyncio
+async def test_no_stale_reads_after_writes(stub):
+    """Every write is visible to the next read, from the cache or not"""
+    user_id = uuid.uuid4()
+    first = await db_client.create_chat_session(user_id, "First")
+    assert [s.id for s in await db_client.get_user_chat_sessions(user_id)] == [first.id]
+    before = await db_client.get_chat_session(first.id)
+
+    second = await db_client.create_chat_session(user_id, "Second")
+    assert {s.id for s in await db_client.get_user_chat_sessions(user_id)} == {first.id, second.id}
+
+    await db_client.update_chat_session(first.id, {"title": "Renamed"})
+    assert (await db_client.get_chat_session(first.id)).title == "Renamed"
+    assert "Renamed" in [s.title for s in await db_client.get_user_chat_sessions(user_id)]
+
+    await db_client.create_messages(first.id, [{"role": "user", "content": "hi"}])
+    bumped = await db_client.get_chat_session(first.id)
+    assert bumped.last_activity_at > before.last_activity_at
+    assert bumped in await db_client.get_user_chat_sessions(user_id)
+
+    await db_client.delete_chat_session(second.id)
+    assert [s.id for s in await db_client.get_user_chat_sessions(user_id)] == [first.id]
+    with pytest.raises(Exception):
+        await db_client.get_chat_session(second.id)
+
+
+def _session(title: str, user_id: uuid.UUID = None, session_id: uuid.UUID = None) -> ChatSession:
+    return ChatSession(id=session_id or uuid.uuid4(), user_id=user_id or uuid.uuid4(), title=title)
+
+
+def test_fetch_overtaken_by_an_invalidation_is_not_cached():
+    cache = SessionCache()
+    old = _session("Old")
+
+    generation = cache.generation()   # a read starts fetching...
+    cache.invalidate_session(old.id)  # ...a write lands meanwhile...
+    cache.set_session(old, generation)  # ...and the read returns the older row
+
+    assert cache.get_session(old.id) is None
+
+
+def test_invalidations_reach_every_worker():
+    """Caches sharing a bus (one per worker) drop a row written through any of them"""
+    bus = LocalInvalidationBus()
+    workers = [SessionCache(bus=bus) for _ in range(3)]
+    session = _session("Shared")
+    for cache in workers:
+        cache.set_session(session)
+        cache.set_user_sessions(session.user_id, [session])
+
+    workers[0].invalidate_session(session.id)
+
+    for cache in workers:
+        assert cache.get_session(session.id) is None
+        assert cache.get_user_sessions(session.user_id) is None
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.core.single_flight import SingleFlight
+
+
+class CountingCall:
+    """Async call that counts runs and can be made slow or failing"""
+
+    def __init__(self, result="reply", delay=0.01, error=None):
+        self.result = result
+        self.delay = delay
+        self.error = error
+        self.runs = 0
+
+    async def __call__(self):
+        self.runs += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_call():
+    flights = SingleFlight("test")
+    call = CountingCall()
+
+    results = await asyncio.gather(*[flights.do("turn", call) for _ in range(5)])
+
+    assert results == ["reply"] * 5
+    assert call.runs == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4, "replayed": 0}
+
+
+@pytest.mark.asyncio
+async def test_results_are_replayed_only_when_asked_and_within_the_window():
+    flights = SingleFlight("test", window=0.05)
+    call = CountingCall()
+
+    await flights.do("turn", call, replay=True)
+    assert await flights.do("turn", call, replay=True) == "reply"
+    assert call.runs == 1
+
+    await flights.do("other", call)
+    await flights.do("other", call)
+    assert call.runs == 3
+
+    await asyncio.sleep(0.06)
+    await flights.do("turn", call, replay=True)
+    assert call.runs == 4
+    assert flights.replayed == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_reach_waiters_but_are_not_replayed():
+    flights = SingleFlight("test")
+    failing = CountingCall(error=RuntimeError("upstream unavailable"))
+
+    results = await asyncio.gather(
+        *[flights.do("turn", failing, replay=True) for _ in range(3)], return_exceptions=True
+    )
+    assert [str(r) for r in results] == ["upstream unavailable"] * 3
+
+    assert await flights.do("turn", CountingCall(), replay=True) == "reply"
+    assert failing.runs == 1
+
+
+@pytest.mark.asyncio
+async def test_a_caller_giving_up_does_not_cancel_the_shared_call():
+    flights = SingleFlight("test")
+    call = CountingCall(delay=0.05)
+
+    leader = asyncio.create_task(flights.do("turn", call))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flights.do("turn", call))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "reply"
+    assert call.runs == 1